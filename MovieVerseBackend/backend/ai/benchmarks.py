@@ -0,0 +1,173 @@
+"""
+In-process latency benchmarks for the recommendation paths, on synthetic catalogs.
+
+Used by `manage.py benchmark_recommendations`; results are plain dicts so
+they can be written as JSON and compared between commits.
+"""
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .feature_store import Catalog
+from .registry import ModelBundle
+
+WORDS = (
+    'a young man woman family city war love crime secret journey friend '
+    'mission past future small town island night school ship dream'
+).split()
+
+
+def synthetic_catalog(size, genres, rng):
+    """
+    Movie catalog shaped like cleaned_movies.csv, with genre names sprinkled
+    into the descriptions so the mood index has something to match
+    """
+    ids = np.arange(1, size + 1) * 3
+    words = rng.choice(WORDS, size=(size, 12))
+    genre_names = np.asarray(genres, dtype=object)[rng.integers(0, len(genres), size=size)]
+    mentions_genre = rng.random(size) < 0.3
+    descriptions = [
+        ' '.join(row) + (f' {genre.lower()}' if mention else '')
+        for row, genre, mention in zip(words, genre_names, mentions_genre)
+    ]
+    return pd.DataFrame({
+        'id': ids,
+        'title': [f'Movie {movie_id}' for movie_id in ids],
+        'description': descriptions,
+        'director': [f'Director {n}' for n in rng.integers(0, max(1, size // 20), size=size)],
+        'star1': '',
+        'star2': '',
+        'poster_url': [f'/poster{movie_id}.jpg' for movie_id in ids],
+        'imdb_rating': np.round(rng.uniform(1, 10, size=size), 1),
+    })
+
+
+def synthetic_features(size, dim, density, rng):
+    """
+    Sparse-ish binary feature matrix, like the one-hot columns in features.pkl
+    """
+    return (rng.random((size, dim), dtype=np.float32) < density).astype(np.float32)
+
+
+def synthetic_bundle(size, dim, model, vectorizer, density=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    movies = synthetic_catalog(size, list(model.classes_), rng)
+    features = synthetic_features(size, dim, density, rng)
+    return ModelBundle(model, vectorizer, Catalog.from_frame(movies), features, version=f'synthetic-{size}')
+
+
+def latency_stats(samples):
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        'runs': len(samples_ms),
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 4),
+        'mean_ms': round(float(samples_ms.mean()), 4),
+    }
+
+
+def measure(call, inputs, memory_runs=5):
+    """
+    Time `call(x)` for each input, then measure peak traced memory on a
+    few extra runs (tracemalloc is kept out of the timed runs)
+    """
+    samples = []
+    for value in inputs:
+        started = time.perf_counter()
+        call(value)
+        samples.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    for value in inputs[:memory_runs]:
+        call(value)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = latency_stats(samples)
+    stats['peak_memory_mib'] = round(peak / 2**20, 3)
+    return stats
+
+
+def run_scenarios(bundle, profile_sizes, runs, seed=0):
+    """
+    Benchmark the three recommendation paths against one bundle
+    """
+    rng = np.random.default_rng(seed)
+    size = len(bundle.catalog)
+    titles = np.array(bundle.catalog.title.take(range(size)), dtype=object)
+    ids = bundle.movie_ids
+    results = []
+
+    for profile_size in profile_sizes:
+        profile_size = min(profile_size, size - 1)
+        n_liked = max(1, profile_size * 2 // 3)
+
+        picks = [rng.choice(size, size=profile_size, replace=False) for _ in range(runs)]
+
+        # get_recommendations: titles in, cards out
+        title_inputs = [(list(titles[rows[:n_liked]]), list(titles[rows[n_liked:]])) for rows in picks]
+        stats = measure(lambda args: bundle.recommend_titles(*args, k=10), title_inputs)
+        results.append({'scenario': 'get_recommendations', 'catalog_size': size,
+                        'profile_size': profile_size, **stats})
+
+        # Ratings-based path: stored taste vector in, ids out (DB hydration not included)
+        def ratings_based(rows):
+            profile = bundle.engine.build_profile(rows[:n_liked], rows[n_liked:])
+            return bundle.recommend_ids_for_profile(profile, ids[rows], k=10)
+
+        stats = measure(ratings_based, picks)
+        results.append({'scenario': 'ratings_based_recommendations', 'catalog_size': size,
+                        'profile_size': profile_size, **stats})
+
+    # predict_genre_and_recommend: every mood is new, so the prediction cache never hits
+    moods = [' '.join(rng.choice(WORDS, size=4)) + f' {n}' for n in range(runs)]
+    stats = measure(lambda mood: bundle.recommend_for_mood(mood), moods)
+    results.append({'scenario': 'predict_genre_and_recommend', 'catalog_size': size,
+                    'profile_size': None, **stats})
+
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(results, baseline):
+    """
+    p50/p95 ratios of `results` against a baseline run, matched by scenario,
+    catalog size and profile size
+    """
+    def key(result):
+        return result['scenario'], result['catalog_size'], result['profile_size']
+
+    previous = {key(result): result for result in baseline.get('results', [])}
+    rows = []
+    for result in results:
+        before = previous.get(key(result))
+        if before:
+            rows.append({
+                'scenario': result['scenario'],
+                'catalog_size': result['catalog_size'],
+                'profile_size': result['profile_size'],
+                'p50_ratio': round(result['p50_ms'] / before['p50_ms'], 3) if before['p50_ms'] else None,
+                'p95_ratio': round(result['p95_ms'] / before['p95_ms'], 3) if before['p95_ms'] else None,
+            })
+    return rows
@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import warnings
+
+import numpy as np
+from scipy import sparse
+
+from .engine import LIKE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+
+def rating_values(ratings):
+    return np.where(np.asarray(ratings, dtype=np.float64) >= LIKE_THRESHOLD, 1.0, -1.0).astype(np.float32)
+
+
+class ItemSimilarityModel:
+    """
+    Truncated item-item collaborative filtering over the Ratings table.
+
+    Ratings become a sparse users x movies matrix of +1 (liked) / -1
+    (disliked). Item similarity is the cosine between movie columns; only
+    the `neighbours` most similar movies are kept per movie, as two dense
+    (movies x neighbours) arrays. Serving a user touches only the neighbour
+    lists of the movies they rated.
+
+    `apply_ratings` patches the rating matrix with new, changed and removed
+    ratings and refreshes the neighbour lists of the touched movies and of
+    every movie co-rated with them, which are the only lists whose
+    similarities can change.
+    """
+
+    def __init__(self, user_ids, movie_ids, ratings, neighbour_rows, neighbour_sims):
+        self.user_ids = user_ids
+        self.movie_ids = movie_ids
+        self.ratings = ratings
+        self.neighbour_rows = neighbour_rows
+        self.neighbour_sims = neighbour_sims
+        self._reindex()
+
+    def _reindex(self):
+        self.user_index = {int(user_id): i for i, user_id in enumerate(self.user_ids)}
+        self.movie_index = {int(movie_id): i for i, movie_id in enumerate(self.movie_ids)}
+
+    @property
+    def neighbours(self):
+        return self.neighbour_rows.shape[1]
+
+    @classmethod
+    def build(cls, user_ids, movie_ids, ratings, neighbours=50, block_size=2048):
+        """
+        Full build from parallel arrays of (user_id, movie_id, rating)
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        unique_users, user_rows = np.unique(user_ids, return_inverse=True)
+        unique_movies, movie_cols = np.unique(movie_ids, return_inverse=True)
+
+        # One entry per (user, movie); the last rating wins
+        keys = user_rows.astype(np.int64) * len(unique_movies) + movie_cols
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last
+        matrix = sparse.csr_matrix(
+            (rating_values(np.asarray(ratings)[last]), (user_rows[last], movie_cols[last])),
+            shape=(len(unique_users), len(unique_movies)),
+        )
+
+        model = cls(
+            unique_users, unique_movies, matrix,
+            np.full((len(unique_movies), neighbours), -1, dtype=np.int32),
+            np.zeros((len(unique_movies), neighbours), dtype=np.float32),
+        )
+        model._refresh(np.arange(len(unique_movies)), block_size)
+        return model
+
+    def _normalized_columns(self):
+        matrix = self.ratings.tocsc()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+        scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        return matrix @ sparse.diags(scale.astype(np.float32))
+
+    def _refresh(self, movie_rows, block_size=2048):
+        """
+        Recompute the neighbour lists of the given movie rows, a block at a time
+        """
+        normalized = self._normalized_columns().tocsc()
+        by_movie = normalized.T.tocsr()
+        k = self.neighbours
+
+        for start in range(0, len(movie_rows), block_size):
+            block = np.asarray(movie_rows[start:start + block_size])
+            similarity = (by_movie[block] @ normalized).tocsr()
+
+            for offset, movie_row in enumerate(block):
+                lo, hi = similarity.indptr[offset], similarity.indptr[offset + 1]
+                cols = similarity.indices[lo:hi]
+                sims = similarity.data[lo:hi]
+
+                keep = (cols != movie_row) & (sims > 0)
+                cols, sims = cols[keep], sims[keep]
+                if len(cols) > k:
+                    top = np.argpartition(-sims, k - 1)[:k]
+                    cols, sims = cols[top], sims[top]
+                order = np.argsort(-sims, kind='stable')
+
+                self.neighbour_rows[movie_row] = -1
+                self.neighbour_sims[movie_row] = 0
+                self.neighbour_rows[movie_row, :len(cols)] = cols[order]
+                self.neighbour_sims[movie_row, :len(cols)] = sims[order]
+
+    def apply_ratings(self, user_ids, movie_ids, ratings, removed=(), block_size=2048):
+        """
+        Incremental update with new or changed ratings. `removed` holds the
+        (user_id, movie_id) of deleted ratings; they are taken out before
+        the new values are written, so a rating deleted and then given again
+        ends up in the model.
+        """
+        user_ids = [int(user_id) for user_id in user_ids]
+        movie_ids = [int(movie_id) for movie_id in movie_ids]
+        # Ratings the model never saw need no removal
+        removed = [(int(user_id), int(movie_id)) for user_id, movie_id in removed
+                   if int(user_id) in self.user_index and int(movie_id) in self.movie_index]
+
+        new_users = sorted(set(user_ids) - self.user_index.keys())
+        new_movies = sorted(set(movie_ids) - self.movie_index.keys())
+        if new_users or new_movies:
+            self.user_ids = np.concatenate([self.user_ids, np.asarray(new_users, dtype=np.int64)])
+            self.movie_ids = np.concatenate([self.movie_ids, np.asarray(new_movies, dtype=np.int64)])
+            self.ratings.resize((len(self.user_ids), len(self.movie_ids)))
+            self.neighbour_rows = np.vstack([
+                self.neighbour_rows, np.full((len(new_movies), self.neighbours), -1, dtype=np.int32)
+            ])
+            self.neighbour_sims = np.vstack([
+                self.neighbour_sims, np.zeros((len(new_movies), self.neighbours), dtype=np.float32)
+            ])
+            self._reindex()
+
+        rows = [self.user_index[user_id] for user_id in user_ids]
+        cols = [self.movie_index[movie_id] for movie_id in movie_ids]
+        removed_rows = [self.user_index[user_id] for user_id, _ in removed]
+        removed_cols = [self.movie_index[movie_id] for _, movie_id in removed]
+        with warnings.catch_warnings():
+            # Inserting a handful of entries into a CSR matrix is fine
+            warnings.simplefilter('ignore', sparse.SparseEfficiencyWarning)
+            if removed:
+                self.ratings[removed_rows, removed_cols] = 0
+            if rows:
+                self.ratings[rows, cols] = rating_values(ratings)
+        # Ratings are always +1/-1, so the only zeros are removed ratings
+        self.ratings.eliminate_zeros()
+
+        # Only similarities between a touched movie and a movie co-rated with it can
+        # change, including movies co-rated by the users whose ratings were removed
+        touched = np.unique(np.asarray(cols + removed_cols, dtype=np.intp))
+        raters = np.union1d(self.ratings.tocsc()[:, touched].indices, np.asarray(removed_rows, dtype=np.intp))
+        co_rated = self.ratings.tocsr()[raters].indices
+        self._refresh(np.union1d(touched, co_rated), block_size)
+
+    def scores_for(self, rated_movie_ids, ratings):
+        """
+        Sparse scores for a user's ratings: (movie_rows, scores) over the
+        union of the rated movies' neighbour lists
+        """
+        rated = [(self.movie_index[int(movie_id)], value)
+                 for movie_id, value in zip(rated_movie_ids, rating_values(ratings))
+                 if int(movie_id) in self.movie_index]
+        if not rated:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+        rows = np.array([row for row, _ in rated], dtype=np.intp)
+        weights = np.array([value for _, value in rated], dtype=np.float32)
+
+        candidates = self.neighbour_rows[rows].ravel()
+        contributions = (self.neighbour_sims[rows] * weights[:, None]).ravel()
+        valid = candidates >= 0
+        movie_rows, inverse = np.unique(candidates[valid], return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions[valid]).astype(np.float32)
+
+        unseen = ~np.isin(movie_rows, rows)
+        return movie_rows[unseen], scores[unseen]
+
+    def recommend(self, rated_movie_ids, ratings, k=10):
+        """
+        Top k (movie_ids, scores) for a user's ratings, best first
+        """
+        movie_rows, scores = self.scores_for(rated_movie_ids, ratings)
+        keep = scores > 0
+        movie_rows, scores = movie_rows[keep], scores[keep]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            movie_rows, scores = movie_rows[top], scores[top]
+        order = np.lexsort((movie_rows, -scores))
+        return self.movie_ids[movie_rows[order]].tolist(), scores[order].tolist()
+
+    def nbytes(self):
+        """
+        Memory held by the model's arrays, in bytes
+        """
+        return (self.user_ids.nbytes + self.movie_ids.nbytes
+                + self.ratings.data.nbytes + self.ratings.indices.nbytes + self.ratings.indptr.nbytes
+                + self.neighbour_rows.nbytes + self.neighbour_sims.nbytes)
+
+    def save(self, path):
+        ratings = self.ratings.tocsr()
+        tmp = path + '.tmp.npz'
+        np.savez(
+            tmp,
+            user_ids=self.user_ids, movie_ids=self.movie_ids,
+            ratings_data=ratings.data, ratings_indices=ratings.indices,
+            ratings_indptr=ratings.indptr, ratings_shape=np.asarray(ratings.shape),
+            neighbour_rows=self.neighbour_rows, neighbour_sims=self.neighbour_sims,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            ratings = sparse.csr_matrix(
+                (data['ratings_data'], data['ratings_indices'], data['ratings_indptr']),
+                shape=tuple(data['ratings_shape']),
+            )
+            return cls(
+                data['user_ids'], data['movie_ids'], ratings,
+                data['neighbour_rows'], data['neighbour_sims'],
+            )
+
+
+class ItemModelLoader:
+    """
+    Process-wide cache of the saved item model, reloaded when the file changes
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._model = None
+        self._mtime = None
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    logger.info("Loading item similarity model from %s", self.path)
+                    self._model = ItemSimilarityModel.load(self.path)
+                    self._mtime = mtime
+        return self._model
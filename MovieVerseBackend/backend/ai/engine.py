@@ -0,0 +1,176 @@
+import numpy as np
+from scipy import sparse
+
+# Ratings at or above this count as a like, anything lower as a dislike.
+# Shared by every recommender so they all split ratings the same way.
+LIKE_THRESHOLD = 5
+
+
+class RecommendationEngine:
+    """
+    Content-based retrieval over the movie feature matrix.
+
+    The matrix is L2-normalized once when the engine is built, so scoring a
+    profile is one matrix-vector product and picking the best k rows is a
+    partial selection. Nothing is written back to shared state, which keeps
+    the engine safe to share between concurrent requests.
+    """
+
+    def __init__(self, features):
+        matrix = np.asarray(features, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1).astype(np.float32)
+        safe_norms = np.where(norms > 0, norms, 1.0).astype(np.float32)
+
+        self.normalized = matrix / safe_norms[:, None]
+        self.norms = norms
+
+    @classmethod
+    def from_normalized(cls, normalized, norms):
+        """
+        Build an engine around an already normalized matrix (e.g. a read-only
+        memory map) without copying it
+        """
+        engine = cls.__new__(cls)
+        engine.normalized = normalized
+        engine.norms = np.asarray(norms, dtype=np.float32)
+        return engine
+
+    def __len__(self):
+        return self.normalized.shape[0]
+
+    def raw_rows(self, rows):
+        """
+        Rebuild the original (un-normalized) feature rows for the given row numbers
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        return self.normalized[rows] * self.norms[rows, None]
+
+    def build_profile(self, liked_rows, disliked_rows=()):
+        """
+        Mean of the liked rows minus the mean of the disliked rows, in raw feature space
+        """
+        profile = self.raw_rows(liked_rows).mean(axis=0)
+        if len(disliked_rows):
+            profile -= self.raw_rows(disliked_rows).mean(axis=0)
+        return profile
+
+    def score(self, profile):
+        """
+        Cosine similarity of every movie against the profile vector
+        """
+        profile = np.asarray(profile, dtype=np.float32)
+        norm = np.linalg.norm(profile)
+        if norm == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        return self.normalized @ (profile / norm)
+
+    @staticmethod
+    def top_k(scores, k, exclude_rows=(), after=None):
+        """
+        Return (rows, scores) of the k best-scoring rows, best first.
+
+        Uses argpartition so the cost is linear in the catalog size; only the
+        k selected rows are sorted. `scores` is not modified. `after` is the
+        (score, row) of the last row of a previous page; only rows ranked
+        below it are returned.
+        """
+        scores = np.array(scores, dtype=np.float32, copy=True)
+        if len(exclude_rows):
+            scores[np.asarray(exclude_rows, dtype=np.intp)] = -np.inf
+        if after is not None:
+            last_score, last_row = np.float32(after[0]), after[1]
+            seen = (scores > last_score) | ((scores == last_score) & (np.arange(len(scores)) <= last_row))
+            scores[seen] = -np.inf
+
+        candidates = np.flatnonzero(np.isfinite(scores))
+        k = min(k, len(candidates))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+        if k < len(candidates):
+            picked = np.argpartition(-scores[candidates], k - 1)[:k]
+            # Keep every row tied with the k-th score so the cut below is by row number,
+            # not by whichever tied rows argpartition happened to pick
+            candidates = candidates[scores[candidates] >= scores[candidates[picked]].min()]
+
+        # Best score first, ties broken by row number so results are stable
+        order = np.lexsort((candidates, -scores[candidates]))
+        rows = candidates[order][:k]
+        return rows, scores[rows]
+
+    def recommend(self, liked_rows, disliked_rows=(), k=10):
+        """
+        Score the catalog against a liked/disliked profile and return the top k unseen rows
+        """
+        profile = self.build_profile(liked_rows, disliked_rows)
+        seen = np.concatenate([np.asarray(liked_rows, dtype=np.intp),
+                               np.asarray(disliked_rows, dtype=np.intp)])
+        return self.recommend_for_profile(profile, seen, k=k)
+
+    def recommend_for_profile(self, profile, exclude_rows=(), k=10, after=None):
+        """
+        Top k rows for a ready-made profile vector, skipping `exclude_rows`
+        """
+        return self.top_k(self.score(profile), k, exclude_rows=exclude_rows, after=after)
+
+    def profile_weights(self, n_profiles, liked, disliked=()):
+        """
+        Sparse (n_profiles x n_movies) matrix W such that W @ normalized gives
+        the same profile vectors as build_profile, one row per profile.
+
+        `liked` and `disliked` are iterables of (profile_index, row) pairs.
+        Each entry is the row's norm over the liked/disliked count, which
+        undoes the normalization and takes the mean in one sparse product.
+        """
+        profile_idx, rows, values = [], [], []
+        for pairs, sign in ((liked, 1.0), (disliked, -1.0)):
+            pairs = np.asarray(list(pairs), dtype=np.intp).reshape(-1, 2)
+            if not len(pairs):
+                continue
+            counts = np.bincount(pairs[:, 0], minlength=n_profiles)
+            profile_idx.append(pairs[:, 0])
+            rows.append(pairs[:, 1])
+            values.append(sign * self.norms[pairs[:, 1]] / counts[pairs[:, 0]])
+
+        if not profile_idx:
+            return sparse.csr_matrix((n_profiles, len(self)), dtype=np.float32)
+        return sparse.csr_matrix(
+            (np.concatenate(values).astype(np.float32),
+             (np.concatenate(profile_idx), np.concatenate(rows))),
+            shape=(n_profiles, len(self)),
+        )
+
+    def score_many(self, weights):
+        """
+        Cosine similarity of every movie against each profile row of `weights`,
+        computed as one matrix-matrix product
+        """
+        profiles = np.asarray(weights @ self.normalized, dtype=np.float32)
+        norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+        profiles /= np.where(norms > 0, norms, 1.0)
+        return profiles @ self.normalized.T
+
+    @staticmethod
+    def top_k_many(scores, k):
+        """
+        Row-wise top k of a (profiles x movies) score matrix, best first.
+
+        Entries set to -inf are never returned; rows with fewer than k finite
+        scores are padded with row -1.
+        """
+        n_profiles, n_movies = scores.shape
+        k = min(k, n_movies)
+        if k <= 0:
+            return np.empty((n_profiles, 0), dtype=np.intp), np.empty((n_profiles, 0), dtype=np.float32)
+
+        if k < n_movies:
+            picked = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            picked = np.tile(np.arange(n_movies), (n_profiles, 1))
+        picked_scores = np.take_along_axis(scores, picked, axis=1)
+
+        order = np.lexsort((picked, -picked_scores), axis=1)
+        rows = np.take_along_axis(picked, order, axis=1)
+        top_scores = np.take_along_axis(picked_scores, order, axis=1)
+        rows[~np.isfinite(top_scores)] = -1
+        return rows, top_scores
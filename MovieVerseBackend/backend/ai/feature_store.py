@@ -0,0 +1,181 @@
+import json
+import os
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from .engine import RecommendationEngine
+
+STORE_DIRNAME = 'store'
+MANIFEST = 'manifest.json'
+# Bumped when the layout of the store changes, so stores written by older code are rebuilt
+STORE_VERSION = 1
+ARRAYS = ('features', 'norms', 'movie_ids')
+# Catalog columns kept next to the matrix, by feature row
+TEXT_COLUMNS = ('title', 'director', 'description', 'poster_url')
+NUMBER_COLUMNS = ('imdb_rating',)
+CATALOG_ARRAYS = (
+    'title_order', *NUMBER_COLUMNS,
+    *(f'{name}_{part}' for name in TEXT_COLUMNS for part in ('text', 'offsets')),
+)
+
+
+def store_path(model_dir, name=None):
+    path = os.path.join(model_dir, STORE_DIRNAME)
+    return os.path.join(path, name) if name else path
+
+
+class TextColumn:
+    """
+    Strings stored as one UTF-8 byte array plus row offsets, so a column can
+    be a read-only memory map instead of a list of Python strings per worker
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [str(value).encode('utf-8') for value in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode('utf-8')
+
+    def take(self, rows):
+        return [self[row] for row in rows]
+
+
+class Catalog:
+    """
+    The movie columns the recommenders return, indexed by feature row.
+
+    Built from cleaned_movies.csv once by `manage.py build_feature_store`
+    and then opened memory-mapped, like the matrix, so workers share its
+    pages instead of each parsing the CSV into a DataFrame.
+    """
+
+    def __init__(self, movie_ids, numbers, texts, title_order):
+        self.movie_ids = movie_ids
+        self.imdb_rating = numbers['imdb_rating']
+        self.texts = texts
+        self.title = texts['title']
+        self.director = texts['director']
+        self.description = texts['description']
+        self.poster_url = texts['poster_url']
+        # Rows sorted by title, for finding titles by binary search
+        self.title_order = title_order
+
+    @classmethod
+    def from_frame(cls, movies):
+        texts = {name: TextColumn.from_strings(movies[name].fillna('')) for name in TEXT_COLUMNS}
+        titles = [texts['title'][row] for row in range(len(movies))]
+        return cls(
+            movie_ids=movies['id'].to_numpy(dtype=np.int64),
+            numbers={name: movies[name].fillna(0).to_numpy(dtype=np.float64) for name in NUMBER_COLUMNS},
+            texts=texts,
+            title_order=np.array(sorted(range(len(titles)), key=titles.__getitem__), dtype=np.int64),
+        )
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def rows_for_titles(self, titles):
+        """
+        Rows of the movies with exactly these titles
+        """
+        def title_at(position):
+            return self.title[self.title_order[position]]
+
+        rows = []
+        for title in set(titles):
+            lo = bisect_left(range(len(self)), title, key=title_at)
+            hi = bisect_right(range(len(self)), title, lo, key=title_at)
+            rows.extend(self.title_order[lo:hi].tolist())
+        return np.array(sorted(rows), dtype=np.intp)
+
+    def arrays(self):
+        """
+        Every array of the catalog by store file name
+        """
+        arrays = {'movie_ids': self.movie_ids, 'title_order': self.title_order, 'imdb_rating': self.imdb_rating}
+        for name, column in self.texts.items():
+            arrays[f'{name}_text'] = column.data
+            arrays[f'{name}_offsets'] = column.offsets
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(
+            movie_ids=arrays['movie_ids'],
+            numbers={name: arrays[name] for name in NUMBER_COLUMNS},
+            texts={name: TextColumn(arrays[f'{name}_text'], arrays[f'{name}_offsets']) for name in TEXT_COLUMNS},
+            title_order=arrays['title_order'],
+        )
+
+
+def write_feature_store(model_dir, features, movies, source):
+    """
+    Write the normalized feature matrix, row norms and the catalog columns
+    of `movies` (a cleaned_movies.csv DataFrame) as .npy files.
+
+    `source` describes the artifacts the store was built from (file name ->
+    [mtime_ns, size]) so a stale store is ignored after features.pkl or the
+    catalog changes. Files are written under temporary names and renamed,
+    so workers never map a half-written store.
+    """
+    os.makedirs(store_path(model_dir), exist_ok=True)
+    engine = RecommendationEngine(features)
+    arrays = {
+        'features': np.ascontiguousarray(engine.normalized, dtype=np.float32),
+        'norms': engine.norms.astype(np.float32),
+        **Catalog.from_frame(movies).arrays(),
+    }
+
+    for name, array in arrays.items():
+        tmp = store_path(model_dir, f'{name}.tmp.npy')
+        np.save(tmp, array)
+        os.replace(tmp, store_path(model_dir, f'{name}.npy'))
+
+    manifest = {
+        'version': STORE_VERSION,
+        'shape': list(arrays['features'].shape),
+        'dtype': str(arrays['features'].dtype),
+        'catalog': list(CATALOG_ARRAYS),
+        'source': source,
+    }
+    tmp = store_path(model_dir, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, store_path(model_dir, MANIFEST))
+    return manifest
+
+
+def read_manifest(model_dir):
+    try:
+        with open(store_path(model_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def open_feature_store(model_dir):
+    """
+    Open the store read-only and memory-mapped; returns (engine, catalog).
+
+    The pages are shared through the OS page cache, so every worker process
+    mapping the same files costs one copy of the matrix and the catalog in
+    total.
+    """
+    arrays = {
+        name: np.load(store_path(model_dir, f'{name}.npy'), mmap_mode='r')
+        for name in (*ARRAYS, *CATALOG_ARRAYS)
+    }
+    engine = RecommendationEngine.from_normalized(arrays['features'], arrays['norms'])
+    return engine, Catalog.from_arrays(arrays)
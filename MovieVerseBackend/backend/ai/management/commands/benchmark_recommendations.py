@@ -0,0 +1,73 @@
+import json
+
+import joblib
+from django.core.management.base import BaseCommand, CommandError
+
+from ai.benchmarks import compare, environment, run_scenarios, synthetic_bundle
+from ai.registry import registry
+
+
+def int_list(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time get_recommendations, predict_genre_and_recommend and the ratings-based "
+        "path on synthetic catalogs and write p50/p95/p99 and peak memory as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int_list, default=[1000, 10000, 100000, 500000],
+                            help="Comma-separated catalog sizes")
+        parser.add_argument('--profile-sizes', type=int_list, default=[5, 50, 500],
+                            help="Comma-separated numbers of rated movies per profile")
+        parser.add_argument('--dim', type=int, default=256, help="Feature columns in the synthetic matrix")
+        parser.add_argument('--runs', type=int, default=100, help="Timed calls per scenario")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='bench_recommendations.json', help="Where to write the JSON results")
+        parser.add_argument('--compare', default=None, help="Earlier results file to compare against")
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError("--runs must be positive")
+
+        # The real mood model and vectorizer are small; only the catalog is synthetic
+        model = joblib.load(registry.path('model'))
+        vectorizer = joblib.load(registry.path('vectorizer'))
+
+        results = []
+        for size in options['sizes']:
+            self.stdout.write(f"Catalog of {size} movies x {options['dim']} features...")
+            bundle = synthetic_bundle(size, options['dim'], model, vectorizer, seed=options['seed'])
+            for result in run_scenarios(bundle, options['profile_sizes'], options['runs'], options['seed']):
+                results.append(result)
+                self.stdout.write(
+                    f"  {result['scenario']:<32} profile={str(result['profile_size']):<5} "
+                    f"p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms "
+                    f"p99={result['p99_ms']:.3f}ms peak={result['peak_memory_mib']:.2f}MiB"
+                )
+            del bundle
+
+        report = {
+            'environment': environment(),
+            'config': {key: options[key] for key in ('sizes', 'profile_sizes', 'dim', 'runs', 'seed')},
+            'results': results,
+        }
+
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {options['compare']}: {e}")
+            report['comparison'] = compare(results, baseline)
+            for row in report['comparison']:
+                self.stdout.write(
+                    f"  {row['scenario']:<32} size={row['catalog_size']:<7} profile={str(row['profile_size']):<5} "
+                    f"p50 x{row['p50_ratio']} p95 x{row['p95_ratio']}"
+                )
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
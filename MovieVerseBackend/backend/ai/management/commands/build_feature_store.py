@@ -0,0 +1,29 @@
+import joblib
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from ai.feature_store import store_path, write_feature_store
+from ai.registry import registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert features.pkl and the catalog columns of cleaned_movies.csv "
+        "into a memory-mappable .npy store that all worker processes share "
+        "through the page cache"
+    )
+
+    def handle(self, *args, **options):
+        features = joblib.load(registry.path('features'))
+        movies = pd.read_csv(registry.path('movies'))
+
+        if len(features) != len(movies):
+            raise CommandError(
+                f"features.pkl has {len(features)} rows but the catalog has {len(movies)} movies"
+            )
+
+        manifest = write_feature_store(registry.model_dir, features, movies, registry.source_signature())
+        rows, cols = manifest['shape']
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {rows}x{cols} {manifest['dtype']} feature store to {store_path(registry.model_dir)}"
+        ))
@@ -0,0 +1,107 @@
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ai.collaborative import ItemSimilarityModel
+from ai.registry import get_item_model, item_models
+from api.models import DeletedRating, Ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the item-item collaborative filtering model from Ratings, or "
+        "patch the saved one with recent ratings; reports build time and memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=50, help="Similar movies kept per movie")
+        parser.add_argument('--since', default=None,
+                            help="Incremental update with ratings changed or deleted at or after this ISO datetime")
+        parser.add_argument('--synthetic', type=int, default=None,
+                            help="Benchmark a build on this many synthetic ratings instead of the DB (nothing is saved)")
+        parser.add_argument('--users', type=int, default=50000, help="Users in the synthetic data")
+        parser.add_argument('--movies', type=int, default=20000, help="Movies in the synthetic data")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic data")
+
+    def handle(self, *args, **options):
+        if options['neighbours'] < 1:
+            raise CommandError("--neighbours must be positive")
+
+        if options['synthetic']:
+            user_ids, movie_ids, ratings = synthetic_ratings(
+                options['synthetic'], options['users'], options['movies'], options['seed']
+            )
+            self.timed_build(user_ids, movie_ids, ratings, options['neighbours'])
+            return
+
+        if options['since']:
+            self.incremental(options['since'])
+            return
+
+        started = timezone.now()
+        rows = np.array(list(Ratings.objects.values_list('user_id', 'movie_id', 'rating')), dtype=np.float64)
+        if not len(rows):
+            raise CommandError("There are no ratings to build from")
+
+        model = self.timed_build(rows[:, 0], rows[:, 1], rows[:, 2], options['neighbours'])
+        model.save(item_models.path)
+        # The build saw every rating that still exists, so older deletions are done with
+        DeletedRating.objects.filter(deleted_at__lt=started).delete()
+        self.stdout.write(self.style.SUCCESS(f"Saved item model to {item_models.path}"))
+
+    def timed_build(self, user_ids, movie_ids, ratings, neighbours):
+        tracemalloc.start()
+        started = time.perf_counter()
+        model = ItemSimilarityModel.build(user_ids, movie_ids, ratings, neighbours=neighbours)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"Built item model from {len(ratings)} ratings "
+            f"({len(model.user_ids)} users x {len(model.movie_ids)} movies, {neighbours} neighbours) "
+            f"in {elapsed:.2f}s; peak memory {peak / 2**20:.1f} MiB, model size {model.nbytes() / 2**20:.1f} MiB"
+        )
+        return model
+
+    def incremental(self, since):
+        since_dt = parse_datetime(since)
+        if since_dt is None:
+            raise CommandError(f"Invalid --since datetime: {since}")
+
+        model = get_item_model()
+        if model is None:
+            raise CommandError("No saved item model yet, run a full build first")
+
+        rows = list(Ratings.objects.filter(updated_at__gte=since_dt).values_list('user_id', 'movie_id', 'rating'))
+        removed = list(DeletedRating.objects.filter(deleted_at__gte=since_dt).values_list('user_id', 'movie_id'))
+        if not rows and not removed:
+            self.stdout.write("No changed ratings")
+            return
+
+        started = time.perf_counter()
+        user_ids, movie_ids, ratings = zip(*rows) if rows else ((), (), ())
+        model.apply_ratings(user_ids, movie_ids, ratings, removed=removed)
+        model.save(item_models.path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {len(rows)} changed and {len(removed)} deleted ratings in {time.perf_counter() - started:.2f}s"
+        ))
+
+
+def synthetic_ratings(count, users, movies, seed=0):
+    """
+    Ratings with Zipf-like movie popularity, roughly like a real catalog
+    """
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, movies + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    user_ids = rng.integers(1, users + 1, size=count)
+    movie_ids = rng.choice(np.arange(1, movies + 1), size=count, p=popularity)
+    # Same 0-5 scale as Ratings, so LIKE_THRESHOLD splits them as it does real ones
+    ratings = rng.integers(0, 6, size=count).astype(np.float64)
+    return user_ids, movie_ids, ratings
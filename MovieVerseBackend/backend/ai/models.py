@@ -1,3 +1,23 @@
 from django.db import models
+from users.models import CustomUser
 
-# Create your models here.
+
+class UserTasteProfile(models.Model):
+    """
+    Running sums of the feature vectors of a user's liked and disliked movies.
+
+    Kept up to date by ai.profiles on every rating write, so a recommender
+    reads one row instead of re-averaging the user's whole rating history.
+    Sums are float64 bytes in the layout of the model version they were
+    built with; a profile from another version is rebuilt on read.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='taste_profile')
+    model_version = models.CharField(max_length=64)
+    liked_sum = models.BinaryField()
+    liked_count = models.PositiveIntegerField(default=0)
+    disliked_sum = models.BinaryField()
+    disliked_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} taste profile ({self.liked_count} liked, {self.disliked_count} disliked)"
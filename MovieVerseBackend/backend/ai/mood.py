@@ -0,0 +1,103 @@
+from functools import lru_cache
+
+import numpy as np
+
+TMDB_POSTER_BASE_URL = "https://image.tmdb.org/t/p/w500"
+
+
+def poster_url(path):
+    # The catalog keeps bare TMDB poster paths
+    if path and not path.startswith(('http://', 'https://')):
+        return TMDB_POSTER_BASE_URL + path
+    return path
+
+
+def normalize_mood(text):
+    """
+    Lowercase and collapse whitespace; the vectorizer ignores both, so this
+    only makes equivalent moods share a cache entry
+    """
+    return ' '.join(str(text).lower().split())
+
+
+class MoodIndex:
+    """
+    Everything predict_genre_and_recommend needs, precomputed at model load.
+
+    Holds a genre -> catalog rows index (movies whose description mentions the
+    genre), the top rows of each genre by IMDb rating and an LRU cache of
+    mood -> predicted genre. Cards are read from the catalog columns (see
+    ai.feature_store.Catalog), which are shared memory maps, not copies.
+    """
+
+    def __init__(self, model, vectorizer, catalog, top_n=100, cache_size=1024):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.catalog = catalog
+        self.size = len(catalog)
+
+        imdb = np.asarray(catalog.imdb_rating, dtype=np.float64)
+        # Only needed while the index is built
+        descriptions = [catalog.description[row].lower() for row in range(self.size)]
+
+        self.genre_rows = {}
+        self.genre_top_rows = {}
+        for genre in model.classes_:
+            needle = str(genre).lower()
+            rows = np.array([row for row, text in enumerate(descriptions) if needle in text], dtype=np.intp)
+            self.genre_rows[genre] = rows
+            # Highest rated first, original row order among ties
+            order = np.lexsort((rows, -imdb[rows]))
+            self.genre_top_rows[genre] = rows[order[:top_n]]
+
+        self.predict_genre = lru_cache(maxsize=cache_size)(self._predict_genre)
+
+    def _predict_genre(self, mood):
+        return self.model.predict(self.vectorizer.transform([mood]))[0]
+
+    def genre_for(self, mood):
+        """
+        Predicted genre for a mood, served from the LRU cache when possible
+        """
+        return self.predict_genre(normalize_mood(mood))
+
+    def pick_rows(self, genre, count=50, rng=None):
+        """
+        Random rows for a genre: up to `count` of its top rated matches, padded
+        with random other movies when the genre has fewer than `count` matches
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        matching = self.genre_rows.get(genre, np.empty(0, dtype=np.intp))
+
+        if len(matching) >= count:
+            top = self.genre_top_rows[genre]
+            return rng.choice(top, size=min(count, len(top)), replace=False)
+
+        remaining = count - len(matching)
+        others = self.size - len(matching)
+        if others <= remaining:
+            mask = np.ones(self.size, dtype=bool)
+            mask[matching] = False
+            return np.concatenate([matching, np.flatnonzero(mask)])
+
+        # Oversample by the number of matches so enough non-matching rows survive the filter
+        drawn = rng.choice(self.size, size=min(self.size, remaining + len(matching)), replace=False)
+        drawn = drawn[~np.isin(drawn, matching)][:remaining]
+        return np.concatenate([matching, drawn])
+
+    def cards(self, rows):
+        """
+        Response dicts for the given rows
+        """
+        catalog = self.catalog
+        return [
+            {
+                'id': int(catalog.movie_ids[row]),
+                'title': catalog.title[row],
+                'director': catalog.director[row],
+                'imdb_rating': float(catalog.imdb_rating[row]),
+                'poster_url': poster_url(catalog.poster_url[row]),
+                'description': catalog.description[row],
+            }
+            for row in rows
+        ]
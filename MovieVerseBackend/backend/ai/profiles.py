@@ -0,0 +1,132 @@
+import numpy as np
+from django.db import transaction
+
+from .engine import LIKE_THRESHOLD
+from .models import UserTasteProfile
+from .registry import get_bundle
+
+
+def _vector(blob, dim):
+    vector = np.frombuffer(bytes(blob), dtype=np.float64)
+    return vector.copy() if len(vector) == dim else None
+
+
+def _rebuild(profile, bundle):
+    """
+    Recompute the sums from the user's ratings; used for new and stale profiles
+    """
+    from api.models import Ratings
+
+    dim = bundle.engine.normalized.shape[1]
+    liked_sum, disliked_sum = np.zeros(dim), np.zeros(dim)
+    liked_count = disliked_count = 0
+
+    rated = Ratings.objects.filter(user_id=profile.user_id).values_list('movie_id', 'rating')
+    liked_rows, disliked_rows = [], []
+    for movie_id, rating in rated:
+        row = bundle.row_for_id.get(movie_id)
+        if row is not None:
+            (liked_rows if rating >= LIKE_THRESHOLD else disliked_rows).append(row)
+
+    if liked_rows:
+        liked_sum = bundle.engine.raw_rows(liked_rows).sum(axis=0, dtype=np.float64)
+        liked_count = len(liked_rows)
+    if disliked_rows:
+        disliked_sum = bundle.engine.raw_rows(disliked_rows).sum(axis=0, dtype=np.float64)
+        disliked_count = len(disliked_rows)
+
+    profile.model_version = bundle.version
+    profile.liked_sum = liked_sum.tobytes()
+    profile.liked_count = liked_count
+    profile.disliked_sum = disliked_sum.tobytes()
+    profile.disliked_count = disliked_count
+    profile.save()
+    return profile
+
+
+def _locked_profile(user_id, bundle):
+    """
+    The user's profile row, locked for update and valid for the bundle's model version
+    """
+    profile, created = UserTasteProfile.objects.select_for_update().get_or_create(
+        user_id=user_id,
+        defaults={'model_version': '', 'liked_sum': b'', 'disliked_sum': b''},
+    )
+    if created or profile.model_version != bundle.version:
+        _rebuild(profile, bundle)
+    return profile
+
+
+def update_taste_profile(user_id, movie_id, old_rating, new_rating):
+    """
+    Apply one rating write to the user's running sums in O(d).
+
+    Called by the Ratings signals (api.signals) after the row is saved or
+    deleted, inside the write's transaction when there is one; the profile
+    row is locked so concurrent writes apply one at a time. `old_rating` is
+    None for a new rating, `new_rating` None for a deleted one.
+    """
+    with transaction.atomic():
+        profile = UserTasteProfile.objects.select_for_update().filter(user_id=user_id).first()
+        if profile is None:
+            # Built from the ratings, this one included, when it is first read
+            return
+        bundle = get_bundle()
+        if profile.model_version != bundle.version:
+            _rebuild(profile, bundle)
+            return
+
+        row = bundle.row_for_id.get(int(movie_id))
+        if row is None:
+            return
+
+        dim = bundle.engine.normalized.shape[1]
+        liked_sum = _vector(profile.liked_sum, dim)
+        disliked_sum = _vector(profile.disliked_sum, dim)
+        if liked_sum is None or disliked_sum is None:
+            _rebuild(profile, bundle)
+            return
+
+        vector = bundle.engine.raw_rows([row])[0].astype(np.float64)
+        if old_rating is not None:
+            if old_rating >= LIKE_THRESHOLD:
+                liked_sum -= vector
+                profile.liked_count -= 1
+            else:
+                disliked_sum -= vector
+                profile.disliked_count -= 1
+        if new_rating is not None:
+            if new_rating >= LIKE_THRESHOLD:
+                liked_sum += vector
+                profile.liked_count += 1
+            else:
+                disliked_sum += vector
+                profile.disliked_count += 1
+
+        profile.liked_sum = liked_sum.tobytes()
+        profile.disliked_sum = disliked_sum.tobytes()
+        profile.save()
+
+
+def get_profile_vector(user_id, bundle=None):
+    """
+    mean(liked) - mean(disliked) for the user, or None if they have no liked
+    movies in the model catalog
+    """
+    bundle = bundle or get_bundle()
+    dim = bundle.engine.normalized.shape[1]
+
+    profile = UserTasteProfile.objects.filter(user_id=user_id, model_version=bundle.version).first()
+    if profile is None:
+        with transaction.atomic():
+            profile = _locked_profile(user_id, bundle)
+
+    liked_sum = _vector(profile.liked_sum, dim)
+    disliked_sum = _vector(profile.disliked_sum, dim)
+    if liked_sum is None or disliked_sum is None or not profile.liked_count:
+        return None
+
+    vector = liked_sum / profile.liked_count
+    if profile.disliked_count:
+        vector -= disliked_sum / profile.disliked_count
+    return vector
@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .collaborative import ItemModelLoader
+from .engine import RecommendationEngine
+from .feature_store import MANIFEST, STORE_VERSION, Catalog, open_feature_store, read_manifest, store_path
+from .mood import MoodIndex
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.path.join(settings.BASE_DIR, 'ai', 'model')
+
+# Files in MODEL_DIR that make up one version of the model
+ARTIFACTS = {
+    'model': 'mood_genre_model.pkl',
+    'vectorizer': 'vectorizer.pkl',
+    'features': 'features.pkl',
+    'movies': 'cleaned_movies.csv',
+}
+# Optional file whose contents, when present, are used as the model version
+VERSION_FILE = 'VERSION'
+# Written by `manage.py build_item_similarity`
+ITEM_MODEL_FILE = 'item_similarity.npz'
+
+
+class ModelBundle:
+    """
+    One loaded, immutable set of model artifacts.
+
+    Requests should grab a bundle once and use it throughout, so a reload in
+    the middle of a request never mixes artifacts from two versions.
+    """
+
+    def __init__(self, model, vectorizer, catalog, features=None, version=None, engine=None):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.catalog = catalog
+        self.engine = engine if engine is not None else RecommendationEngine(features)
+        self.mood = MoodIndex(model, vectorizer, catalog)
+        self.version = version
+
+        # Movie.id -> feature row, so DB rows map to the matrix without title joins
+        self.movie_ids = np.asarray(catalog.movie_ids, dtype=np.int64)
+        self.row_for_id = {int(movie_id): row for row, movie_id in enumerate(self.movie_ids)}
+
+    def rows_for_ids(self, movie_ids):
+        """
+        Feature rows for the given Movie ids; ids missing from the catalog are skipped
+        """
+        rows = [self.row_for_id.get(int(movie_id)) for movie_id in movie_ids]
+        return np.array([row for row in rows if row is not None], dtype=np.intp)
+
+    def recommend_ids(self, liked_ids, disliked_ids=(), k=10):
+        """
+        Top k unseen Movie ids and their scores for a liked/disliked id profile
+        """
+        liked_rows = self.rows_for_ids(liked_ids)
+        if not len(liked_rows):
+            return [], []
+        rows, scores = self.engine.recommend(liked_rows, self.rows_for_ids(disliked_ids), k=k)
+        return self.movie_ids[rows].tolist(), scores.tolist()
+
+    def recommend_titles(self, liked, disliked=(), k=10):
+        """
+        get_recommendations payload for liked/disliked titles, or None if
+        none of the liked titles are in the catalog
+        """
+        catalog = self.catalog
+        liked_rows = catalog.rows_for_titles(liked)
+        disliked_rows = catalog.rows_for_titles(disliked)
+        if not len(liked_rows):
+            return None
+
+        rows, scores = self.engine.recommend(liked_rows, disliked_rows, k=k)
+        return [
+            {
+                'title': catalog.title[row],
+                'similarity': float(sim),
+                'poster_url': catalog.poster_url[row],
+                'description': catalog.description[row],
+                'imdb_rating': float(catalog.imdb_rating[row]),
+            }
+            for row, sim in zip(rows, scores)
+        ]
+
+    def recommend_for_mood(self, mood, count=50):
+        """
+        (predicted genre, movie cards) for predict_genre_and_recommend
+        """
+        genre = self.mood.genre_for(mood)
+        # Top rated movies mentioning the genre, padded with random ones when there are too few
+        rows = self.mood.pick_rows(genre, count=count)
+        return genre, self.mood.cards(rows)
+
+    def recommend_ids_for_profile(self, profile, exclude_ids=(), k=10, after=None):
+        """
+        Top k Movie ids and scores for a stored taste profile vector, optionally
+        continuing after the (score, movie_id) of a previous page's last result
+        """
+        if after is not None:
+            after = (after[0], self.row_for_id.get(int(after[1]), -1))
+        rows, scores = self.engine.recommend_for_profile(profile, self.rows_for_ids(exclude_ids), k=k, after=after)
+        return self.movie_ids[rows].tolist(), scores.tolist()
+
+
+class ModelRegistry:
+    """
+    Loads the artifacts in a model directory once per process and reloads
+    them when the VERSION file or any artifact's mtime/size changes. If the
+    new artifacts cannot be loaded, e.g. because they are still being
+    copied in, the loaded bundle is kept and the reload is retried at the
+    next check.
+
+    The filesystem is checked at most once every `check_interval` seconds, so
+    the common path of `get()` is a timestamp comparison.
+    """
+
+    def __init__(self, model_dir, check_interval=2.0):
+        self.model_dir = model_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._bundle = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def path(self, name):
+        return os.path.join(self.model_dir, ARTIFACTS[name])
+
+    def _read_signature(self):
+        parts = []
+        for filename in sorted(ARTIFACTS.values()):
+            stat = os.stat(os.path.join(self.model_dir, filename))
+            parts.append((filename, stat.st_mtime_ns, stat.st_size))
+
+        manifest_path = store_path(self.model_dir, MANIFEST)
+        if os.path.exists(manifest_path):
+            stat = os.stat(manifest_path)
+            parts.append((MANIFEST, stat.st_mtime_ns, stat.st_size))
+
+        version_path = os.path.join(self.model_dir, VERSION_FILE)
+        if os.path.exists(version_path):
+            with open(version_path) as f:
+                parts.append((VERSION_FILE, f.read().strip()))
+        return tuple(parts)
+
+    @staticmethod
+    def _version_for(signature):
+        for part in signature:
+            if part[0] == VERSION_FILE and part[1]:
+                return part[1]
+        return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()[:12]
+
+    def source_signature(self):
+        """
+        mtime/size of features.pkl and the catalog CSV, recorded in the
+        feature store they were converted to
+        """
+        signature = {}
+        for name in ('features', 'movies'):
+            stat = os.stat(self.path(name))
+            signature[ARTIFACTS[name]] = [stat.st_mtime_ns, stat.st_size]
+        return signature
+
+    def _open_store(self):
+        """
+        Memory-mapped (engine, catalog) from the feature store, or None if
+        there is no store built from the current artifacts by this version
+        of the code
+        """
+        manifest = read_manifest(self.model_dir)
+        if (not manifest or manifest.get('version') != STORE_VERSION
+                or manifest.get('source') != self.source_signature()):
+            return None
+        try:
+            engine, catalog = open_feature_store(self.model_dir)
+        except (OSError, ValueError):
+            logger.warning("Could not open feature store in %s", store_path(self.model_dir))
+            return None
+        if len(engine) != len(catalog) or list(engine.normalized.shape) != manifest.get('shape'):
+            logger.warning("Feature store in %s is inconsistent, ignoring it", store_path(self.model_dir))
+            return None
+        return engine, catalog
+
+    def _load(self, signature):
+        logger.info("Loading model artifacts from %s", self.model_dir)
+        store = self._open_store()
+        if store is not None:
+            engine, catalog = store
+            features = None
+        else:
+            # No usable store: every worker parses the artifacts itself
+            logger.warning("No up-to-date feature store in %s; run `manage.py build_feature_store`",
+                           store_path(self.model_dir))
+            engine = None
+            catalog = Catalog.from_frame(pd.read_csv(self.path('movies')))
+            features = joblib.load(self.path('features'))
+        rows = len(engine) if engine is not None else len(features)
+        if rows != len(catalog):
+            raise ValueError(f"features have {rows} rows but the catalog has {len(catalog)} movies")
+        return ModelBundle(
+            model=joblib.load(self.path('model')),
+            vectorizer=joblib.load(self.path('vectorizer')),
+            catalog=catalog,
+            features=features,
+            version=self._version_for(signature),
+            engine=engine,
+        )
+
+    def get(self):
+        """
+        Return the current bundle, loading or reloading it if needed
+        """
+        now = time.monotonic()
+        if self._bundle is not None and now - self._checked_at < self.check_interval:
+            return self._bundle
+
+        with self._lock:
+            if self._bundle is not None and now - self._checked_at < self.check_interval:
+                return self._bundle
+
+            try:
+                signature = self._read_signature()
+                if self._bundle is None or signature != self._signature:
+                    self._bundle = self._load(signature)
+                    self._signature = signature
+            except Exception:
+                if self._bundle is None:
+                    raise
+                logger.exception("Could not reload model artifacts from %s, keeping version %s",
+                                 self.model_dir, self._bundle.version)
+            self._checked_at = time.monotonic()
+            return self._bundle
+
+    @property
+    def version(self):
+        return self.get().version
+
+
+registry = ModelRegistry(MODEL_DIR)
+
+
+def get_bundle():
+    """
+    Shortcut for the process-wide registry used by the ai and api apps
+    """
+    return registry.get()
+
+
+item_models = ItemModelLoader(os.path.join(MODEL_DIR, ITEM_MODEL_FILE))
+
+
+def get_item_model():
+    """
+    The collaborative filtering model, or None if it has not been built yet
+    """
+    return item_models.get()
@@ -1,3 +1,511 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+import pandas as pd
+from django.core.management import call_command
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from api.models import Movie, Ratings
+from users.models import CustomUser
+
+from .benchmarks import compare, latency_stats
+from .collaborative import ItemModelLoader, ItemSimilarityModel
+from .engine import RecommendationEngine
+from .feature_store import (
+    MANIFEST, STORE_VERSION, Catalog, open_feature_store, read_manifest, store_path, write_feature_store
+)
+from .mood import MoodIndex
+from .registry import ARTIFACTS, VERSION_FILE, ModelBundle, ModelRegistry
+
+
+def full_ranking(scores):
+    # Reference order: best score first, ties by row number
+    return sorted(range(len(scores)), key=lambda row: (-scores[row], row))
+
+
+class TopKTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        # Few distinct values, so many rows tie
+        self.scores = rng.integers(0, 5, size=200).astype(np.float32)
+
+    def test_matches_a_full_sort(self):
+        for k in (1, 7, 50, 200, 500):
+            rows, scores = RecommendationEngine.top_k(self.scores, k)
+            self.assertEqual(rows.tolist(), full_ranking(self.scores)[:k], k)
+            np.testing.assert_array_equal(scores, self.scores[rows])
+
+    def test_excluded_rows_are_skipped_and_scores_untouched(self):
+        original = self.scores.copy()
+        excluded = full_ranking(self.scores)[:10]
+        rows, _ = RecommendationEngine.top_k(self.scores, 10, exclude_rows=excluded)
+        self.assertEqual(rows.tolist(), full_ranking(self.scores)[10:20])
+        np.testing.assert_array_equal(self.scores, original)
+
+    def test_pages_continue_after_the_last_row(self):
+        pages, after = [], None
+        while True:
+            rows, scores = RecommendationEngine.top_k(self.scores, 15, after=after)
+            if not len(rows):
+                break
+            pages += rows.tolist()
+            after = (float(scores[-1]), int(rows[-1]))
+        self.assertEqual(pages, full_ranking(self.scores))
+
+    def test_top_k_many_matches_top_k_per_row(self):
+        scores = np.random.default_rng(4).random((6, 40)).astype(np.float32)
+        scores[2, 5:] = -np.inf
+        rows, top = RecommendationEngine.top_k_many(scores, 8)
+        for profile in range(len(scores)):
+            expected, _ = RecommendationEngine.top_k(scores[profile], 8)
+            self.assertEqual(rows[profile][:len(expected)].tolist(), expected.tolist())
+        # Fewer finite scores than k: padded with -1
+        self.assertEqual(rows[2][5:].tolist(), [-1, -1, -1])
+
+
+class RecommendationEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.features = np.random.default_rng(5).random((30, 6))
+        self.engine = RecommendationEngine(self.features)
+
+    def test_scores_are_cosine_similarities(self):
+        profile = self.features[:3].mean(axis=0) - self.features[3]
+        expected = self.features @ profile / (np.linalg.norm(self.features, axis=1) * np.linalg.norm(profile))
+        np.testing.assert_allclose(self.engine.score(profile), expected, rtol=1e-5)
+        np.testing.assert_allclose(self.engine.build_profile([0, 1, 2], [3]), profile, rtol=1e-5)
+
+    def test_recommend_skips_rated_rows(self):
+        rows, scores = self.engine.recommend([0, 1, 2], [3], k=5)
+        self.assertEqual(len(rows), 5)
+        self.assertFalse({0, 1, 2, 3} & set(rows.tolist()))
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_from_normalized_shares_the_matrix(self):
+        engine = RecommendationEngine.from_normalized(self.engine.normalized, self.engine.norms)
+        self.assertIs(engine.normalized, self.engine.normalized)
+        np.testing.assert_allclose(engine.raw_rows([4, 9]), self.features[[4, 9]], rtol=1e-5)
+
+    def test_zero_profile_scores_nothing(self):
+        np.testing.assert_array_equal(self.engine.score(np.zeros(6)), np.zeros(30))
+
+
+def random_ratings(rng, users, movies, count):
+    return (rng.integers(1, users + 1, size=count), rng.integers(100, 100 + movies, size=count),
+            rng.integers(0, 6, size=count))
+
+
+def neighbours(model):
+    # {movie_id: {neighbour_id: similarity}}, independent of the order of tied
+    # neighbours; movies left without ratings are dropped
+    result = {}
+    for row, movie_id in enumerate(model.movie_ids):
+        cols = model.neighbour_rows[row]
+        similar = {
+            int(model.movie_ids[col]): round(float(sim), 5)
+            for col, sim in zip(cols, model.neighbour_sims[row]) if col >= 0
+        }
+        if similar:
+            result[int(movie_id)] = similar
+    return result
+
+
+class ItemSimilarityModelTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(11)
+        self.user_ids, self.movie_ids, self.ratings = random_ratings(self.rng, 20, 15, 120)
+
+    def test_neighbours_match_dense_cosine_similarity(self):
+        model = ItemSimilarityModel.build(self.user_ids, self.movie_ids, self.ratings, neighbours=15)
+
+        dense = model.ratings.toarray()
+        norms = np.linalg.norm(dense, axis=0)
+        similarity = dense.T @ dense / np.outer(norms, norms)
+        expected = {
+            int(movie_id): {
+                int(model.movie_ids[col]): round(float(similarity[row, col]), 5)
+                for col in range(len(model.movie_ids)) if col != row and similarity[row, col] > 1e-6
+            }
+            for row, movie_id in enumerate(model.movie_ids)
+        }
+        self.assertEqual(neighbours(model), expected)
+
+    def test_incremental_ratings_match_a_full_build(self):
+        model = ItemSimilarityModel.build(self.user_ids, self.movie_ids, self.ratings, neighbours=5)
+        # New users, new movies and changed ratings
+        extra = random_ratings(self.rng, 25, 18, 30)
+        model.apply_ratings(*extra)
+
+        rebuilt = ItemSimilarityModel.build(
+            *(np.concatenate(pair) for pair in zip((self.user_ids, self.movie_ids, self.ratings), extra)),
+            neighbours=5,
+        )
+        order = np.argsort(model.movie_ids)
+        np.testing.assert_array_equal(model.movie_ids[order], rebuilt.movie_ids)
+        np.testing.assert_allclose(np.sort(model.neighbour_sims[order], axis=1),
+                                   np.sort(rebuilt.neighbour_sims, axis=1), atol=1e-5)
+
+    def test_removed_ratings_match_a_full_build(self):
+        # Full neighbour lists, so the comparison does not depend on how ties were cut
+        model = ItemSimilarityModel.build(self.user_ids, self.movie_ids, self.ratings, neighbours=20)
+        pairs = sorted(set(zip(self.user_ids.tolist(), self.movie_ids.tolist())))
+        removed = [pairs[n] for n in (0, 7, 30)]
+        model.apply_ratings([], [], [], removed=removed)
+
+        keep = [(user_id, movie_id) not in removed for user_id, movie_id in zip(self.user_ids, self.movie_ids)]
+        rebuilt = ItemSimilarityModel.build(self.user_ids[keep], self.movie_ids[keep], self.ratings[keep],
+                                            neighbours=20)
+        self.assertEqual(neighbours(model), neighbours(rebuilt))
+
+    def test_recommend_ranks_unrated_neighbours(self):
+        # Everyone who likes 1 also likes 2; 3 is liked together with 1 only once
+        model = ItemSimilarityModel.build(
+            [1, 1, 2, 2, 3, 3, 4], [1, 2, 1, 2, 1, 3, 4], [5, 5, 5, 5, 5, 5, 5], neighbours=5,
+        )
+        movie_ids, scores = model.recommend([1], [5])
+        self.assertEqual(movie_ids, [2, 3])
+        self.assertGreater(scores[0], scores[1])
+        # Nothing in common with movie 4
+        self.assertEqual(model.recommend([4], [5]), ([], []))
+
+    def test_save_and_load_round_trip(self):
+        model = ItemSimilarityModel.build(self.user_ids, self.movie_ids, self.ratings, neighbours=5)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'item_similarity.npz')
+            model.save(path)
+            loaded = ItemSimilarityModel.load(path)
+        np.testing.assert_array_equal(loaded.neighbour_rows, model.neighbour_rows)
+        self.assertEqual(loaded.recommend([100, 101], [5, 1]), model.recommend([100, 101], [5, 1]))
+
+
+class BuildItemSimilarityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = np.random.default_rng(12)
+        cls.users = [CustomUser.objects.create(username=f'user{n}', email=f'user{n}@example.com') for n in range(12)]
+        cls.movies = [Movie.objects.create(title=f'Movie {n}') for n in range(10)]
+        for user in cls.users:
+            for movie in rng.choice(cls.movies, size=5, replace=False):
+                Ratings.objects.create(user=user, movie=movie, rating=int(rng.integers(0, 6)))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.loader = ItemModelLoader(os.path.join(directory.name, 'item_similarity.npz'))
+        command = 'ai.management.commands.build_item_similarity'
+        for patcher in (mock.patch(f'{command}.item_models', self.loader),
+                        mock.patch(f'{command}.get_item_model', self.loader.get)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def build(self, **options):
+        call_command('build_item_similarity', neighbours=20, stdout=StringIO(), **options)
+        return self.loader.get()
+
+    def test_rerated_and_deleted_ratings_reach_the_incremental_update(self):
+        self.build()
+        since = timezone.now()
+
+        rerated = Ratings.objects.order_by('id')[0]
+        rerated.rating = 0 if rerated.rating >= 5 else 5
+        rerated.save()
+        Ratings.objects.order_by('id')[3].delete()
+        Ratings.objects.order_by('id')[10].delete()
+        # Deleted and then given again
+        again = Ratings.objects.order_by('id')[5]
+        again.delete()
+        Ratings.objects.create(user=again.user, movie=again.movie, rating=5 if again.rating < 5 else 1)
+
+        incremental = neighbours(self.build(since=since.isoformat()))
+        self.assertEqual(incremental, neighbours(self.build()))
+
+
+def catalog_frame():
+    # cleaned_movies.csv columns, with a duplicate title and missing values
+    return pd.DataFrame({
+        'id': [10, 11, 12, 13],
+        'title': ['Heat', 'Alien', 'Heat', 'Amélie'],
+        'director': ['Michael Mann', 'Ridley Scott', None, 'Jean-Pierre Jeunet'],
+        'description': ['A crime thriller.', 'A horror film in space.', 'A remake.', None],
+        'poster_url': ['/heat.jpg', '/alien.jpg', None, '/amelie.jpg'],
+        'imdb_rating': [8.3, 8.5, None, 8.3],
+    })
+
+
+def mood_model():
+    # (model, vectorizer) that know two genres
+    moods = ['laugh out loud', 'something funny', 'scared of the dark', 'a night of horror']
+    vectorizer = TfidfVectorizer().fit(moods)
+    model = MultinomialNB().fit(vectorizer.transform(moods), ['Comedy', 'Comedy', 'Horror', 'Horror'])
+    return model, vectorizer
+
+
+def write_artifacts(model_dir, movies, features):
+    model, vectorizer = mood_model()
+    joblib.dump(model, os.path.join(model_dir, ARTIFACTS['model']))
+    joblib.dump(vectorizer, os.path.join(model_dir, ARTIFACTS['vectorizer']))
+    joblib.dump(features, os.path.join(model_dir, ARTIFACTS['features']))
+    movies.to_csv(os.path.join(model_dir, ARTIFACTS['movies']), index=False)
+
+
+class FeatureStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model_dir = directory.name
+        self.movies = catalog_frame()
+        self.features = np.random.default_rng(13).random((len(self.movies), 6))
+        write_artifacts(self.model_dir, self.movies, self.features)
+        self.registry = ModelRegistry(self.model_dir)
+
+    def write_store(self):
+        return write_feature_store(self.model_dir, self.features, self.movies, self.registry.source_signature())
+
+    def edit_manifest(self, **changes):
+        manifest = {**read_manifest(self.model_dir), **changes}
+        with open(store_path(self.model_dir, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+    def test_round_trip(self):
+        manifest = self.write_store()
+        self.assertEqual((manifest['version'], manifest['shape']), (STORE_VERSION, [4, 6]))
+
+        engine, catalog = open_feature_store(self.model_dir)
+        np.testing.assert_allclose(engine.normalized, RecommendationEngine(self.features).normalized, rtol=1e-6)
+        self.assertEqual(catalog.movie_ids.tolist(), [10, 11, 12, 13])
+        self.assertEqual(catalog.title.take(range(4)), ['Heat', 'Alien', 'Heat', 'Amélie'])
+        # Missing values read back as empty strings and 0
+        self.assertEqual((catalog.director[2], catalog.description[3], catalog.imdb_rating[2]), ('', '', 0))
+        self.assertEqual(catalog.poster_url[1], '/alien.jpg')
+
+        self.assertEqual(catalog.rows_for_titles(['Heat', 'Amélie', 'Missing', 'Heat']).tolist(), [0, 2, 3])
+        self.assertEqual(catalog.rows_for_titles(['heat']).tolist(), [])
+
+    def test_registry_only_opens_a_store_built_from_the_current_artifacts(self):
+        self.assertIsNone(self.registry._open_store())
+        self.write_store()
+        engine, catalog = self.registry._open_store()
+        self.assertEqual((len(engine), len(catalog)), (4, 4))
+
+        # Written by another version of the store code
+        self.edit_manifest(version=STORE_VERSION + 1)
+        self.assertIsNone(self.registry._open_store())
+
+        # Another row count than the arrays
+        self.write_store()
+        self.edit_manifest(shape=[5, 6])
+        with self.assertLogs('ai.registry', 'WARNING'):
+            self.assertIsNone(self.registry._open_store())
+
+        # Catalog arrays of another build than the matrix
+        self.write_store()
+        np.save(store_path(self.model_dir, 'movie_ids.npy'), np.arange(3))
+        with self.assertLogs('ai.registry', 'WARNING'):
+            self.assertIsNone(self.registry._open_store())
+
+        # features.pkl changed since the store was built
+        self.write_store()
+        joblib.dump(np.ones((5, 6)), self.registry.path('features'))
+        self.assertIsNone(self.registry._open_store())
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model_dir = directory.name
+        write_artifacts(self.model_dir, catalog_frame(), np.random.default_rng(14).random((4, 6)))
+        # Check the files on every get()
+        self.registry = ModelRegistry(self.model_dir, check_interval=0)
+        # There is no feature store here, which the registry warns about on every load
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def grow_catalog(self):
+        movies = pd.concat([catalog_frame(), pd.DataFrame({'id': [14], 'title': ['Aliens'], 'imdb_rating': [8.4]})])
+        write_artifacts(self.model_dir, movies, np.random.default_rng(15).random((5, 6)))
+
+    def test_swapped_artifacts_are_reloaded(self):
+        first = self.registry.get()
+        self.assertIs(self.registry.get(), first)
+
+        self.grow_catalog()
+        second = self.registry.get()
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(second.row_for_id[14], 4)
+        movie_ids, _ = second.recommend_ids([14], k=2)
+        self.assertEqual(len(movie_ids), 2)
+        self.assertNotIn(14, movie_ids)
+        # The bundle already handed out still works on its own artifacts
+        self.assertNotIn(14, first.row_for_id)
+
+        with open(os.path.join(self.model_dir, VERSION_FILE), 'w') as f:
+            f.write('2026-10-18\n')
+        self.assertEqual(self.registry.get().version, '2026-10-18')
+
+    def test_half_written_artifacts_are_not_picked_up(self):
+        first = self.registry.get()
+
+        # The new feature matrix is in place, its catalog is not yet
+        joblib.dump(np.ones((5, 6)), self.registry.path('features'))
+        with self.assertLogs('ai.registry', 'ERROR'):
+            self.assertIs(self.registry.get(), first)
+
+        # A model file still being copied
+        with open(self.registry.path('model'), 'rb') as f:
+            data = f.read()
+        with open(self.registry.path('model'), 'wb') as f:
+            f.write(data[:len(data) // 2])
+        with self.assertLogs('ai.registry', 'ERROR'):
+            self.assertIs(self.registry.get(), first)
+
+        # Once every file is complete the new version loads
+        self.grow_catalog()
+        self.assertEqual(len(self.registry.get().catalog), 5)
+
+
+class RecommendationsByIdTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='alice')
+
+    def setUp(self):
+        model, vectorizer = mood_model()
+        # Catalog ids 10..13 in rows 0..3
+        self.bundle = ModelBundle(model, vectorizer, Catalog.from_frame(catalog_frame()),
+                                  features=np.random.default_rng(16).random((4, 6)))
+        patcher = mock.patch('ai.views.get_bundle', return_value=self.bundle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+
+    def recommend(self, **data):
+        return self.client.post('/ai/rec/ids/', data, content_type='application/json')
+
+    def test_rows_for_ids_skips_unknown_ids(self):
+        self.assertEqual(self.bundle.rows_for_ids([13, 999, '11', np.int64(10)]).tolist(), [3, 1, 0])
+        self.assertEqual(self.bundle.rows_for_ids([]).tolist(), [])
+
+    def test_recommends_unrated_movies_by_id(self):
+        response = self.recommend(liked_ids=[10, 999], disliked_ids=[11, 998])
+
+        self.assertEqual(response.status_code, 200)
+        rows, scores = self.bundle.engine.recommend([0], [1], k=10)
+        self.assertEqual(response.json(), [
+            {'id': int(self.bundle.movie_ids[row]), 'similarity': float(score)} for row, score in zip(rows, scores)
+        ])
+        self.assertEqual({item['id'] for item in response.json()}, {12, 13})
+
+    def test_unknown_liked_ids_are_a_400(self):
+        response = self.recommend(liked_ids=[998, 999])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('None of the liked movies', response.json()['error'])
+
+    def test_malformed_input_is_a_400(self):
+        for data in ({}, {'liked_ids': []}, {'liked_ids': 10}, {'liked_ids': [10], 'disliked_ids': 11},
+                     {'liked_ids': ['heat']}, {'liked_ids': [10], 'disliked_ids': [None]}, {'liked_ids': [[10]]},
+                     {'liked_ids': [10.5]}, {'liked_ids': [10], 'disliked_ids': [True]}):
+            self.assertEqual(self.recommend(**data).status_code, 400, data)
+
+    def test_login_is_required(self):
+        self.client.logout()
+        self.assertEqual(self.recommend(liked_ids=[10]).status_code, 403)
+
+
+class MoodIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(17)
+        phrases = ['A comedy.', 'A dark COMEDY-drama.', 'Horror in the woods.', 'A quiet drama.', None]
+        self.movies = pd.DataFrame({
+            'id': np.arange(1000, 1300),
+            'title': [f'Movie {n}' for n in range(300)],
+            'director': 'Someone',
+            'description': rng.choice(np.array(phrases, dtype=object), size=300),
+            'poster_url': '/poster.jpg',
+            # One decimal, so ratings tie
+            'imdb_rating': rng.integers(10, 90, size=300) / 10,
+        })
+        model, vectorizer = mood_model()
+        self.index = MoodIndex(model, vectorizer, Catalog.from_frame(self.movies), top_n=20)
+
+    def baseline(self, genre, top_n=20):
+        # What predict_genre_and_recommend did per request before the index existed
+        matching = self.movies[self.movies['description'].str.contains(genre, case=False, na=False)]
+        return matching.index.tolist(), matching.nlargest(min(top_n, len(matching)), 'imdb_rating').index.tolist()
+
+    def test_genre_rows_match_the_description_filter(self):
+        for genre in ('Comedy', 'Horror'):
+            matching, top = self.baseline(genre)
+            self.assertEqual(self.index.genre_rows[genre].tolist(), matching)
+            self.assertEqual(self.index.genre_top_rows[genre].tolist(), top)
+
+    def test_pick_rows_samples_top_matches_or_pads_with_other_movies(self):
+        rng = np.random.default_rng(18)
+        _, top = self.baseline('Comedy')
+        rows = self.index.pick_rows('Comedy', count=10, rng=rng)
+        self.assertEqual(len(set(rows.tolist())), 10)
+        self.assertLessEqual(set(rows.tolist()), set(top))
+
+        # More wanted than the genre has: every match, then distinct others
+        matching, _ = self.baseline('Horror')
+        rows = self.index.pick_rows('Horror', count=len(matching) + 30, rng=rng).tolist()
+        self.assertEqual(rows[:len(matching)], matching)
+        self.assertEqual(len(set(rows)), len(matching) + 30)
+
+        # More wanted than the catalog has: all of it
+        self.assertEqual(sorted(self.index.pick_rows('Horror', count=500, rng=rng).tolist()), list(range(300)))
+
+    def test_predictions_are_cached_by_normalized_mood(self):
+        with mock.patch.object(self.index.model, 'predict', wraps=self.index.model.predict) as predict:
+            genre = self.index.genre_for('Something FUNNY')
+            self.assertEqual(self.index.genre_for('  something   funny\n'), genre)
+            self.assertEqual(predict.call_count, 1)
+            # The vectorizer ignores case and spacing, so caching by normalized text changes nothing
+            self.assertEqual(genre, self.index.model.predict(self.index.vectorizer.transform(['Something FUNNY']))[0])
+
+            self.assertEqual(self.index.genre_for('scared of the dark'), 'Horror')
+            self.assertEqual(predict.call_count, 3)
+        self.assertEqual(self.index.predict_genre.cache_info().currsize, 2)
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_latency_stats_and_comparison(self):
+        stats = latency_stats([0.001] * 98 + [0.010, 0.020])
+        self.assertEqual((stats['runs'], stats['p50_ms']), (100, 1.0))
+        self.assertGreater(stats['p99_ms'], stats['p95_ms'])
+
+        result = {'scenario': 'get_recommendations', 'catalog_size': 10, 'profile_size': 5, 'p50_ms': 2.0, 'p95_ms': 3.0}
+        baseline = {'results': [{**result, 'p50_ms': 4.0, 'p95_ms': 0}]}
+        self.assertEqual(compare([result], baseline), [{
+            'scenario': 'get_recommendations', 'catalog_size': 10, 'profile_size': 5,
+            'p50_ratio': 0.5, 'p95_ratio': None,
+        }])
+        self.assertEqual(compare([result], {'results': []}), [])
+
+    def test_command_writes_results_and_comparison(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = os.path.join(directory, 'first.json'), os.path.join(directory, 'second.json')
+            options = {'sizes': [200], 'profile_sizes': [3, 20], 'dim': 16, 'runs': 5, 'stdout': StringIO()}
+            call_command('benchmark_recommendations', output=first, **options)
+            call_command('benchmark_recommendations', output=second, compare=first, **options)
+            with open(second) as f:
+                report = json.load(f)
+
+        scenarios = [(result['scenario'], result['profile_size']) for result in report['results']]
+        self.assertEqual(scenarios, [
+            ('get_recommendations', 3), ('ratings_based_recommendations', 3),
+            ('get_recommendations', 20), ('ratings_based_recommendations', 20),
+            ('predict_genre_and_recommend', None),
+        ])
+        self.assertTrue(all(result['runs'] == 5 and result['catalog_size'] == 200 for result in report['results']))
+        self.assertEqual(len(report['comparison']), 5)
+        self.assertEqual(report['config']['sizes'], [200])
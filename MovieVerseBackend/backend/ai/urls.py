@@ -1,10 +1,12 @@
 # ai/urls.py
 from django.urls import path
 from .views import predict_genre_and_recommend
-from .views import get_recommendations , import_movies_from_csv 
+from .views import get_recommendations , import_movies_from_csv , get_recommendations_by_id , get_collaborative_recommendations
 
 urlpatterns = [
     path('recommend/', predict_genre_and_recommend),
     path('rec/', get_recommendations),
+    path('rec/ids/', get_recommendations_by_id),
+    path('rec/collaborative/', get_collaborative_recommendations),
     path('import-movies/', import_movies_from_csv, name='import_movies'),
 ]
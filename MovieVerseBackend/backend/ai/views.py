@@ -1,26 +1,16 @@
-import joblib
 import pandas as pd
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
+import random
 import os 
 from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from sklearn.metrics.pairwise import cosine_similarity
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authentication import SessionAuthentication
-
-# Load model and vectorizer once
-MODEL_DIR = os.path.join(settings.BASE_DIR, 'ai', 'model')
-model_path = os.path.join(MODEL_DIR, 'mood_genre_model.pkl')
-vectorizer_path = os.path.join(MODEL_DIR, 'vectorizer.pkl')
-movies_path = os.path.join(MODEL_DIR, 'cleaned_movies.csv')
-
-model = joblib.load(model_path)
-vectorizer = joblib.load(vectorizer_path)
-movies_df = pd.read_csv(movies_path)
+from .registry import get_bundle, get_item_model
 
 @api_view(['POST'])
 @authentication_classes([SessionAuthentication])
@@ -31,68 +21,12 @@ def predict_genre_and_recommend(request):
     if not user_mood:
         return JsonResponse({"error": "Mood is required"}, status=400)
         
-    # Add randomness with time-based seed
-    import random
-    import time
-    random.seed(int(time.time()))
-
-    mood_input = vectorizer.transform([user_mood])
-    predicted_genre = model.predict(mood_input)[0]
-
-    # First try to find movies matching the predicted genre
-    matching_description = movies_df[movies_df['description'].str.contains(predicted_genre, case=False, na=False)]
-    
-    # If we don't have at least 50 matches, include more movies
-    if len(matching_description) < 50:
-        # Sample random movies to fill the gap
-        remaining_needed = 50 - len(matching_description)
-        non_matching = movies_df[~movies_df.index.isin(matching_description.index)]
-        
-        if len(non_matching) >= remaining_needed:
-            # Randomly sample from non-matching movies
-            additional = non_matching.sample(n=remaining_needed)
-            matched = pd.concat([matching_description, additional])
-        else:
-            # If we still don't have enough, just use what we have
-            matched = pd.concat([matching_description, non_matching])
-    else:
-        # If we have enough matches, randomly sample from top rated movies
-        top_matches = matching_description.nlargest(min(100, len(matching_description)), 'imdb_rating')
-        matched = top_matches.sample(min(50, len(top_matches)))
-
-    # Get all available movies (up to 50)
-    final_count = min(50, len(matched))
-    matched = matched.head(final_count)
-    
-    if not matched.empty:
-        # Include all relevant fields, especially poster_url
-        recommendations = matched[['id', 'title', 'director', 'imdb_rating', 'poster_url', 'description']].head(final_count)
-        
-        # Ensure poster URLs are complete
-        movies = []
-        for _, movie in recommendations.iterrows():
-            poster_url = movie['poster_url']
-            if poster_url and not (str(poster_url).startswith('http://') or str(poster_url).startswith('https://')):
-                poster_url = f"https://image.tmdb.org/t/p/w500{poster_url}"
-                
-            movies.append({
-                'id': int(movie['id']),
-                'title': movie['title'],
-                'director': movie['director'],
-                'imdb_rating': float(movie['imdb_rating']) if pd.notna(movie['imdb_rating']) else 0,
-                'poster_url': poster_url,
-                'description': movie['description']
-            })
-    else:
-        movies = []
+    predicted_genre, movies = get_bundle().recommend_for_mood(user_mood, count=50)
 
     return JsonResponse({
         "genre": predicted_genre,
         "recommendations": movies
     })
-# Load movie features for recommendation system
-X = joblib.load(os.path.join(MODEL_DIR, 'features.pkl'))
-df = pd.read_csv(os.path.join(MODEL_DIR, 'cleaned_movies.csv'))
 
 @api_view(['POST'])
 @authentication_classes([SessionAuthentication])
@@ -105,38 +39,68 @@ def get_recommendations(request):
     if not isinstance(liked, list) or not liked:
         return Response({"error": "Liked list must be a non-empty list"}, status=400)
 
-    # Filter features for liked and disliked movies
-    liked_df = X[df['title'].isin(liked)]
-    disliked_df = X[df['title'].isin(disliked)]
+    # Score against the user profile and keep the 10 best unseen movies
+    recommendations = get_bundle().recommend_titles(liked, disliked, k=10)
+    if recommendations is None:
+        return Response({"error": "None of the liked movies were found in the dataset"}, status=400)
+
+    return Response(recommendations)
+
+@api_view(['POST'])
+@authentication_classes([SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def get_recommendations_by_id(request):
+    """
+    Same as get_recommendations, but takes and returns Movie ids instead of titles
+    """
+    liked_ids = request.data.get('liked_ids', [])
+    disliked_ids = request.data.get('disliked_ids', [])
+
+    if not isinstance(liked_ids, list) or not liked_ids:
+        return Response({"error": "liked_ids must be a non-empty list"}, status=400)
+    if not isinstance(disliked_ids, list):
+        return Response({"error": "disliked_ids must be a list"}, status=400)
+    # int() would quietly turn 10.5 or true into a movie id
+    if any(isinstance(movie_id, (bool, float)) for movie_id in liked_ids + disliked_ids):
+        return Response({"error": "Movie ids must be integers"}, status=400)
 
-    if liked_df.empty:
+    try:
+        ids, scores = get_bundle().recommend_ids(liked_ids, disliked_ids, k=10)
+    except (TypeError, ValueError):
+        return Response({"error": "Movie ids must be integers"}, status=400)
+
+    if not ids:
         return Response({"error": "None of the liked movies were found in the dataset"}, status=400)
 
-    # Create user profile
-    profile = liked_df.mean()
-    if not disliked_df.empty:
-        profile -= disliked_df.mean()
-
-    # Calculate similarity
-    sim = cosine_similarity(X, profile.values.reshape(1, -1)).flatten()
-    df['sim'] = sim
-
-    # Filter out movies user has already rated
-    unseen = df[~df['title'].isin(liked + disliked)]
-    recs = unseen.sort_values(by='sim', ascending=False).head(10)
-
-    # Return recommendations with similarity scores
-    recommendations = []
-    for _, movie in recs.iterrows():
-        recommendations.append({
-            'title': movie['title'],
-            'similarity': float(movie['sim']),
-            'poster_url': movie.get('poster_url', ''),
-            'description': movie.get('description', ''),
-            'imdb_rating': movie.get('imdb_rating', 0)
-        })
+    return Response([
+        {'id': movie_id, 'similarity': score}
+        for movie_id, score in zip(ids, scores)
+    ])
 
-    return Response(recommendations)
+@api_view(['GET'])
+@authentication_classes([SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def get_collaborative_recommendations(request):
+    """
+    Movie ids liked by users with similar ratings to the current user
+    (item-item collaborative filtering, see build_item_similarity)
+    """
+    from api.models import Ratings
+
+    item_model = get_item_model()
+    if item_model is None:
+        return Response({"error": "Collaborative model has not been built yet"}, status=503)
+
+    rated = list(Ratings.objects.filter(user=request.user).values_list('movie_id', 'rating'))
+    if not rated:
+        return Response({"error": "No ratings found for this user"}, status=404)
+
+    movie_ids, ratings = zip(*rated)
+    ids, scores = item_model.recommend(movie_ids, ratings, k=10)
+    return Response([
+        {'id': movie_id, 'score': score}
+        for movie_id, score in zip(ids, scores)
+    ])
 
 from api.models import Movie
 from api.models import Genre
@@ -193,7 +157,8 @@ def import_movies_from_csv(request):
 def test_recommendation(request):
     """Test endpoint to verify recommendation system works"""
     try:
-        sample_movies = df['title'].sample(3).tolist()
+        catalog = get_bundle().catalog
+        sample_movies = catalog.title.take(random.sample(range(len(catalog)), min(3, len(catalog))))
         return JsonResponse({
             "status": "success",
             "message": "Recommendation system is working",
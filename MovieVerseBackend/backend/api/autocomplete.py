@@ -0,0 +1,187 @@
+"""
+Typeahead over titles, directors and stars.
+
+Every movie contributes a few normalized terms: each word-suffix of its
+title and of its people's names, so "knight" finds "The Dark Knight" and
+"nolan" finds "Christopher Nolan". The terms live in one sorted list of
+(term, movie_id); a prefix is two bisects, and the movies in that range are
+ranked by imdb_rating then our_rating. Results are memoized per prefix
+until the index changes, so repeated keystrokes are dictionary lookups.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from .models import Movie
+from .sampling import catalog_version
+from .search import normalize
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+TERM_FIELDS = ['title', 'director', 'star1', 'star2']
+CARD_FIELDS = ['id', 'title', 'director', 'release_date', 'poster_url', 'imdb_rating', 'our_rating']
+# Rebuild at least this often so edits made by other processes show up
+MAX_AGE = 10 * 60
+
+
+def movie_terms(movie):
+    terms = set()
+    for field in TERM_FIELDS:
+        words = normalize(movie.get(field)).split()
+        terms.update(' '.join(words[i:]) for i in range(len(words)))
+    return terms
+
+
+def _year(release_date):
+    # Movies created from TMDB data may still hold the raw 'YYYY-MM-DD' string
+    if hasattr(release_date, 'year'):
+        return release_date.year
+    try:
+        return int(str(release_date)[:4])
+    except ValueError:
+        return None
+
+
+def _card(movie):
+    return {
+        'id': movie['id'],
+        'title': movie['title'],
+        'director': movie['director'],
+        'year': _year(movie['release_date']) if movie['release_date'] else None,
+        'poster_url': movie['poster_url'],
+        'imdb_rating': movie['imdb_rating'],
+        'our_rating': movie['our_rating'],
+    }
+
+
+class PrefixIndex:
+    """
+    Searches and in-place patches share one lock, so a search never sees
+    the entries, cards and memo halfway through an update
+    """
+
+    def __init__(self, memo_size=4096):
+        self.entries = []
+        self.terms_by_movie = {}
+        self.cards = {}
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+    def build(self, movies):
+        entries = []
+        for movie in movies:
+            terms = movie_terms(movie)
+            self.terms_by_movie[movie['id']] = terms
+            self.cards[movie['id']] = _card(movie)
+            entries.extend((term, movie['id']) for term in terms)
+        entries.sort()
+        with self._lock:
+            self.entries = entries
+            self._memo.clear()
+            self.built_at = time.monotonic()
+        return self
+
+    def add(self, movie):
+        terms = movie_terms(movie)
+        card = _card(movie)
+        with self._lock:
+            old_terms = self.terms_by_movie.get(movie['id'], set())
+            for term in old_terms - terms:
+                position = bisect_left(self.entries, (term, movie['id']))
+                del self.entries[position]
+            for term in terms - old_terms:
+                insort(self.entries, (term, movie['id']))
+            self.terms_by_movie[movie['id']] = terms
+            self.cards[movie['id']] = card
+            self._memo.clear()
+
+    def remove(self, movie_id):
+        with self._lock:
+            for term in self.terms_by_movie.pop(movie_id, ()):
+                position = bisect_left(self.entries, (term, movie_id))
+                del self.entries[position]
+            self.cards.pop(movie_id, None)
+            self._memo.clear()
+
+    def _rank(self, movie_id):
+        card = self.cards[movie_id]
+        return -card['imdb_rating'], -card['our_rating'], movie_id
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        memo_key = (prefix, limit)
+        with self._lock:
+            cached = self._memo.get(memo_key)
+            if cached is not None:
+                self._memo.move_to_end(memo_key)
+                return cached
+
+            lo = bisect_left(self.entries, (prefix,))
+            hi = bisect_left(self.entries, (prefix + '\uffff',), lo)
+            movie_ids = {movie_id for _, movie_id in self.entries[lo:hi]}
+            results = [self.cards[movie_id] for movie_id in heapq.nsmallest(limit, movie_ids, key=self._rank)]
+
+            self._memo[memo_key] = results
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+            return results
+
+
+class AutocompleteIndexHolder:
+    """
+    Process-wide PrefixIndex. Patched in place by the Movie signals,
+    rebuilt when another process adds or deletes movies (catalog version)
+    or the index is older than MAX_AGE, which picks up edits made by other
+    processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def _stale(self, version):
+        return (self._index is None or version != self._version
+                or time.monotonic() - self._index.built_at > MAX_AGE)
+
+    def get(self):
+        version = catalog_version()
+        if self._stale(version):
+            with self._lock:
+                if self._stale(version):
+                    self._index = PrefixIndex().build(Movie.objects.values(*CARD_FIELDS, 'star1', 'star2'))
+                    self._version = version
+        return self._index
+
+    def update(self, movie, version=None):
+        """
+        Patch one movie in; `version` is the catalog version after this change, if it bumped it
+        """
+        if self._index is not None:
+            with self._lock:
+                self._index.add({field: getattr(movie, field) for field in [*CARD_FIELDS, 'star1', 'star2']})
+                # Only skip the rebuild if no other process changed the catalog in between
+                if version is not None and self._version is not None and version == self._version + 1:
+                    self._version = version
+
+    def remove(self, movie_id, version=None):
+        if self._index is not None:
+            with self._lock:
+                self._index.remove(movie_id)
+                # Only skip the rebuild if no other process changed the catalog in between
+                if version is not None and self._version is not None and version == self._version + 1:
+                    self._version = version
+
+
+autocomplete_index = AutocompleteIndexHolder()
+
+
+def autocomplete(query, limit=DEFAULT_LIMIT):
+    return autocomplete_index.get().search(query, limit)
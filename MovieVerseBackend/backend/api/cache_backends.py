@@ -0,0 +1,47 @@
+"""
+Cache backends for settings.CACHES.
+"""
+from datetime import datetime
+
+from django.core.cache.backends.db import DatabaseCache as BaseDatabaseCache
+from django.db import connections, models, router, transaction
+from django.utils.timezone import now as tz_now
+
+
+class DatabaseCache(BaseDatabaseCache):
+    """
+    DatabaseCache with an incr that is atomic across processes.
+
+    The stock incr is a get followed by a set, so two workers bumping the
+    same version counter (api.sampling, api.http_cache,
+    api.recommendation_cache) could both store the same value and one bump
+    would be lost. Here the row is locked while it is incremented, and it
+    keeps its expiry.
+    """
+
+    def incr(self, key, delta=1, version=None):
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        lock = ' FOR UPDATE' if connection.features.has_select_for_update else ''
+        with transaction.atomic(using=db):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT {quote_name("expires")} FROM {quote_name(self._table)} '
+                    f'WHERE {quote_name("cache_key")} = %s{lock}',
+                    [self.make_and_validate_key(key, version=version)],
+                )
+                row = cursor.fetchone()
+            value = self.get(key, self._missing_key, version=version)
+            if row is None or value is self._missing_key:
+                raise ValueError("Key '%s' not found" % key)
+
+            expires = row[0]
+            expression = models.Expression(output_field=models.DateTimeField())
+            for converter in connection.ops.get_db_converters(expression) + expression.get_db_converters(connection):
+                expires = converter(expires, expression, connection)
+            timeout = None if expires.year == datetime.max.year else max(0, (expires - tz_now()).total_seconds())
+
+            value += delta
+            self.set(key, value, timeout, version=version)
+        return value
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    # The database-backed cache works, but puts a query behind every cache read
+    if settings.CACHES['default']['BACKEND'] == 'api.cache_backends.DatabaseCache':
+        return [checks.Warning(
+            'The default cache is the database table.',
+            hint='Set REDIS_URL so response, recommendation and TMDB caches are served from Redis.',
+            id='api.W001',
+        )]
+    return []
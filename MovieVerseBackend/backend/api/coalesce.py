@@ -0,0 +1,88 @@
+"""
+Single-flight request coalescing.
+
+`single_flight(key, fn)` runs `fn` once for any number of concurrent callers
+with the same key. Within a process, the first caller runs it and the others
+wait for and share its result (or exception). Across workers, the first
+caller also holds a lock for the key in the shared cache (settings.CACHES:
+Redis or the database table, never a per-process cache); callers in other
+processes wait for the lock to be released and then run `fn` themselves,
+which is cheap when `fn` starts by checking the caches or tables the first
+caller filled.
+
+Do not call it inside transaction.atomic when the cache lives in the
+database: the lock row would not be visible to other workers until commit.
+"""
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+
+# How long one worker may hold the right to run a key
+LOCK_TIMEOUT = 30
+# How long callers wait for the running call before giving up and running it themselves
+WAIT_TIMEOUT = 25
+# Polling the lock starts fast and backs off, so a long wait costs few cache queries
+LOCK_POLL = 0.05
+LOCK_POLL_MAX = 0.5
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def _lock_key(key):
+    return f'singleflight:{hashlib.sha1(key.encode()).hexdigest()}'
+
+
+def _run_with_lock(key, fn):
+    lock_key = _lock_key(key)
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        poll = LOCK_POLL
+        while time.monotonic() < deadline and cache.get(lock_key) is not None:
+            time.sleep(min(poll, max(0.0, deadline - time.monotonic())))
+            poll = min(poll * 2, LOCK_POLL_MAX)
+        # Released (or the holder is too slow or died): the result should now be cached
+        return fn()
+    try:
+        return fn()
+    finally:
+        cache.delete(lock_key)
+
+
+def single_flight(key, fn):
+    """
+    `fn()`, shared with every concurrent call for the same `key`
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        if call.done.wait(WAIT_TIMEOUT):
+            if call.error is not None:
+                raise call.error
+            return call.result
+        return fn()
+
+    try:
+        call.result = _run_with_lock(key, fn)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
@@ -0,0 +1,99 @@
+"""
+The movie detail blob served by fetchMovieInfo.
+
+`movie_detail` loads a movie, with its denormalized genre names, in one
+query and keeps the serialized result in the cache by id until the Movie
+signals invalidate it. Title queries resolve to an id through the indexed
+`normalized_title` column; partial titles fall back to an icontains match,
+which Postgres answers from the trigram index on UPPER(title) (migration
+0010) rather than a scan.
+"""
+from django.core.cache import cache
+
+from .models import Movie
+from .search import normalize
+
+DETAIL_TIMEOUT = 60 * 60
+DETAIL_FIELDS = [
+    'id', 'title', 'description', 'director', 'star1', 'star2',
+    'poster_url', 'release_date', 'imdb_rating', 'our_rating',
+]
+TMDB_IMAGE_URL = "https://image.tmdb.org/t/p/original/"
+
+
+def _detail_key(movie_id):
+    return f'movie:detail:{movie_id}'
+
+
+def poster_image_url(poster_url):
+    """
+    Full image URL; movies from the CSV import store only the TMDB poster path
+    """
+    if not poster_url or poster_url.startswith(('http://', 'https://')):
+        return poster_url
+    return TMDB_IMAGE_URL + poster_url.lstrip('/')
+
+
+def build_detail(movie, genres):
+    """
+    Response data for a Movie instance or a DETAIL_FIELDS dict
+    """
+    field = movie.get if isinstance(movie, dict) else lambda name: getattr(movie, name)
+    return {
+        'id': field('id'),
+        'title': field('title'),
+        'movie_info': field('description'),
+        'director': field('director'),
+        'star1': field('star1'),
+        'star2': field('star2'),
+        'poster_url': poster_image_url(field('poster_url')),
+        'release_date': field('release_date'),
+        'imdb_rating': field('imdb_rating'),
+        'our_rating': field('our_rating'),
+        'genres': list(genres),
+    }
+
+
+def load_detail(movie_id):
+    """
+    The detail of one movie straight from the database, or None
+    """
+    row = Movie.objects.filter(id=movie_id).values(*DETAIL_FIELDS, 'genre_names').first()
+    if row is None:
+        return None
+    return build_detail(row, row['genre_names'])
+
+
+def movie_detail(movie_id):
+    """
+    The cached detail of one movie, or None if it does not exist
+    """
+    key = _detail_key(movie_id)
+    detail = cache.get(key)
+    if detail is None:
+        detail = load_detail(movie_id)
+        if detail is not None:
+            cache.set(key, detail, DETAIL_TIMEOUT)
+    return detail
+
+
+def invalidate_details(*movie_ids):
+    cache.delete_many([_detail_key(movie_id) for movie_id in movie_ids])
+
+
+def find_movie_id(title):
+    """
+    Id of the movie best matching `title`: an exact normalized title, then
+    the best rated title starting with it, then the best rated title
+    containing it
+    """
+    normalized = normalize(title)
+    if not normalized:
+        return None
+    movies = Movie.objects.order_by('-imdb_rating', 'id').values_list('id', flat=True)
+    return (
+        movies.filter(normalized_title=normalized).first()
+        or movies.filter(normalized_title__startswith=normalized).first()
+        # UPPER(title) LIKE on Postgres, served by the api_movie_title_upper_trgm index
+        or movies.filter(title__icontains=title).first()
+    )
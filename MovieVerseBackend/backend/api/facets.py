@@ -0,0 +1,198 @@
+"""
+Faceted browsing over genre, release decade and IMDb rating.
+
+Movies are numbered by their position in a sorted id array, and every facet
+value (a genre, a decade, a whole-number rating bucket) is a bitset over
+those positions packed into uint64 words. A filter is a few ORs and ANDs
+over the word arrays, and facet counts are popcounts, so the cost is about
+n / 64 word operations whatever the number of facets, with no joins.
+"""
+import threading
+import time
+
+import numpy as np
+
+from .models import Genre, Movie
+from .sampling import catalog_version
+
+RATING_BUCKETS = range(10)
+# Rebuild at least this often so edits made by other processes show up
+MAX_AGE = 10 * 60
+
+
+def _decade(release_date):
+    if not release_date:
+        return None
+    year = getattr(release_date, 'year', None)
+    if year is None:
+        try:
+            year = int(str(release_date)[:4])
+        except ValueError:
+            return None
+    return year // 10 * 10
+
+
+def _bucket(imdb_rating):
+    return min(int(imdb_rating or 0), RATING_BUCKETS[-1])
+
+
+class FacetIndex:
+    def __init__(self, movies, movie_genres, genre_names):
+        """
+        `movies` is (id, release_date, imdb_rating) rows, `movie_genres`
+        (movie_id, genre_id) rows
+        """
+        movies = sorted(movies)
+        self.ids = np.array([movie_id for movie_id, _, _ in movies], dtype=np.int64)
+        self.ratings = np.array([rating or 0.0 for _, _, rating in movies], dtype=np.float64)
+        self.genre_names = dict(genre_names)
+        self.words = (len(self.ids) + 63) // 64
+
+        self.genres, self.decades, self.buckets = {}, {}, {}
+        for position, (_, release_date, rating) in enumerate(movies):
+            self._set(self.decades, _decade(release_date), position)
+            self._set(self.buckets, _bucket(rating), position)
+        for movie_id, genre_id in movie_genres:
+            position = self.position(movie_id)
+            if position is not None:
+                self._set(self.genres, genre_id, position)
+        self.built_at = time.monotonic()
+
+    def _set(self, bitsets, key, position, value=True):
+        if key is None:
+            return
+        bits = bitsets.get(key)
+        if bits is None:
+            bits = bitsets[key] = np.zeros(self.words, dtype=np.uint64)
+        mask = np.uint64(1) << np.uint64(position % 64)
+        if value:
+            bits[position // 64] |= mask
+        else:
+            bits[position // 64] &= ~mask
+
+    def position(self, movie_id):
+        position = int(np.searchsorted(self.ids, movie_id))
+        if position < len(self.ids) and self.ids[position] == movie_id:
+            return position
+        return None
+
+    def patch(self, movie_id, release_date, imdb_rating, genre_ids=None):
+        """
+        Move an existing movie's bits after an edit; returns False for unknown ids
+        """
+        position = self.position(movie_id)
+        if position is None:
+            return False
+        for bitsets in (self.decades, self.buckets) + ((self.genres,) if genre_ids is not None else ()):
+            for key in bitsets:
+                self._set(bitsets, key, position, False)
+        self._set(self.decades, _decade(release_date), position)
+        self._set(self.buckets, _bucket(imdb_rating), position)
+        self.ratings[position] = imdb_rating or 0.0
+        for genre_id in genre_ids or ():
+            self._set(self.genres, genre_id, position)
+        return True
+
+    def _all(self):
+        bits = np.full(self.words, np.uint64(0xFFFFFFFFFFFFFFFF), dtype=np.uint64)
+        tail = len(self.ids) % 64
+        if tail:
+            bits[-1] = (np.uint64(1) << np.uint64(tail)) - np.uint64(1)
+        return bits
+
+    def _union(self, bitsets, keys):
+        bits = np.zeros(self.words, dtype=np.uint64)
+        for key in keys:
+            if key in bitsets:
+                bits |= bitsets[key]
+        return bits
+
+    def select(self, genre_ids=(), decades=(), buckets=()):
+        """
+        Bitset of movies in every genre of `genre_ids`, in any of `decades`
+        and in any of the rating `buckets`; empty selections do not filter
+        """
+        bits = self._all()
+        for genre_id in genre_ids:
+            bits &= self.genres.get(genre_id, np.zeros(self.words, dtype=np.uint64))
+        if decades:
+            bits &= self._union(self.decades, decades)
+        if buckets:
+            bits &= self._union(self.buckets, buckets)
+        return bits
+
+    @staticmethod
+    def count(bits):
+        return int(np.bitwise_count(bits).sum())
+
+    def facet_counts(self, bits):
+        return {
+            'genres': sorted(
+                ({'id': genre_id, 'name': self.genre_names.get(genre_id), 'count': self.count(bits & genre_bits)}
+                 for genre_id, genre_bits in self.genres.items()),
+                key=lambda facet: (-facet['count'], facet['name'] or ''),
+            ),
+            'decades': [{'decade': decade, 'count': self.count(bits & self.decades[decade])}
+                        for decade in sorted(self.decades)],
+            'ratings': [{'rating': bucket, 'count': self.count(bits & self.buckets[bucket])}
+                        for bucket in sorted(self.buckets)],
+        }
+
+    def page(self, bits, size, after=None):
+        """
+        Up to `size` (movie_ids, next_key) of the selected movies, best
+        imdb_rating first, continuing after the (rating, id) key `after`
+        """
+        selected = np.unpackbits(bits.astype('<u8').view(np.uint8), bitorder='little')[:len(self.ids)].astype(bool)
+        if after is not None:
+            rating, movie_id = after
+            selected &= (self.ratings < rating) | ((self.ratings == rating) & (self.ids > movie_id))
+        positions = np.flatnonzero(selected)
+        if len(positions) > size + 1:
+            # Keep everything tied with the cut-off rating so ids decide the order at the boundary
+            cutoff = np.partition(-self.ratings[positions], size)[size]
+            positions = positions[-self.ratings[positions] <= cutoff]
+        positions = positions[np.lexsort((self.ids[positions], -self.ratings[positions]))][:size + 1]
+
+        next_key = None
+        if len(positions) > size:
+            positions = positions[:size]
+            next_key = [float(self.ratings[positions[-1]]), int(self.ids[positions[-1]])]
+        return self.ids[positions].tolist(), next_key
+
+
+class FacetIndexHolder:
+    """
+    Process-wide FacetIndex: patched by the Movie signals, rebuilt when the
+    catalog version changes or the index is older than MAX_AGE
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def _stale(self, version):
+        return (self._index is None or version != self._version
+                or time.monotonic() - self._index.built_at > MAX_AGE)
+
+    def get(self):
+        version = catalog_version()
+        if self._stale(version):
+            with self._lock:
+                if self._stale(version):
+                    self._index = FacetIndex(
+                        Movie.objects.values_list('id', 'release_date', 'imdb_rating'),
+                        Movie.genres.through.objects.values_list('movie_id', 'genre_id'),
+                        Genre.objects.values_list('id', 'name'),
+                    )
+                    self._version = version
+        return self._index
+
+    def patch(self, movie, genre_ids=None):
+        if self._index is not None:
+            with self._lock:
+                self._index.patch(movie.id, movie.release_date, movie.imdb_rating, genre_ids)
+
+
+facet_index = FacetIndexHolder()
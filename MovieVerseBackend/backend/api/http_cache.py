@@ -0,0 +1,141 @@
+"""
+Response caching with ETags for read-heavy GET endpoints.
+
+`cache_response` stores a view's response data under its URL (and the user,
+for per-user endpoints) together with the current generation of each tag
+the view depends on. Writes bump a tag's generation (see api.signals), which
+orphans every entry built from the old data. Tags can also come from the
+response itself, e.g. one per movie in a search result, so editing a movie
+only invalidates the responses that contain it. A hit is one cache round
+trip (two when the entry has response tags): the view does not run, and a
+matching If-None-Match gets a 304. With the database cache each round trip
+is a query; only Redis keeps hits off the database (see CACHES in settings).
+
+A generation is the time.time_ns() of the tag's last bump, which is how a
+response tag bumped while the view was running is detected.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _tag_key(tag):
+    return f'http:tag:{tag}'
+
+
+def bump_tags(*tags):
+    """
+    Invalidate every cached response that depends on any of `tags`
+    """
+    if tags:
+        generation = time.time_ns()
+        cache.set_many({_tag_key(tag): generation for tag in tags}, None)
+
+
+def _etag(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+
+
+def _matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def _response_generations(tag_keys, started):
+    """
+    Current generations of response tags, or None if one was bumped after
+    `started` (while the view ran) and the response may be stale
+    """
+    found = cache.get_many(tag_keys)
+    missing = [key for key in tag_keys if key not in found]
+    if missing:
+        # Never bumped: any generation older than this request will do
+        for key in missing:
+            cache.add(key, started - 1, None)
+        found.update(cache.get_many(missing))
+    generations = [found.get(key) for key in tag_keys]
+    if None in generations or max(generations) >= started:
+        return None
+    return generations
+
+
+def _response_tags_unchanged(entry):
+    tag_keys = entry.get('response_tags')
+    if not tag_keys:
+        return True
+    found = cache.get_many(tag_keys)
+    return [found.get(key) for key in tag_keys] == entry['response_generations']
+
+
+def cache_response(timeout, tags=(), per_user=False, private=False, response_tags=None):
+    """
+    Cache a DRF GET view's 200 responses for `timeout` seconds.
+
+    `tags` lists the data the response is built from, or is a callable
+    taking the view's (request, *args, **kwargs) and returning them.
+    `response_tags` is a callable taking the response data and returning
+    more tags, for data that depends on what the view found. Responses sent with `private` (or `per_user`) are marked so shared
+    caches do not store them. Place it below the DRF decorators so
+    authentication and permissions still run on every request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            view_tags = sorted(tags(request, *args, **kwargs) if callable(tags) else tags)
+            scope = f'user:{request.user.pk}' if per_user else 'public'
+            url_hash = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+            entry_key = f'http:response:{view.__name__}:{scope}:{url_hash}'
+            tag_keys = [_tag_key(tag) for tag in view_tags]
+
+            found = cache.get_many([entry_key, *tag_keys])
+            generations = [found.get(key) for key in tag_keys]
+            cache_control = f"{'private' if private or per_user else 'public'}, max-age={timeout}"
+
+            entry = found.get(entry_key)
+            if (entry and entry['generations'] == generations and None not in generations
+                    and _response_tags_unchanged(entry)):
+                headers = {**entry['headers'], 'ETag': entry['etag'], 'Cache-Control': cache_control}
+                if _matches(request.headers.get('If-None-Match'), entry['etag']):
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+                return Response(entry['data'], headers=headers)
+
+            # Start missing generations so entries built now can be invalidated later
+            for key, generation in zip(tag_keys, generations):
+                if generation is None:
+                    cache.add(key, time.time_ns(), None)
+            generations = [cache.get(key) for key in tag_keys] if None in generations else generations
+
+            started = time.time_ns()
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+            etag = _etag(response.data)
+            # Headers the view set itself, e.g. pagination links
+            extra_headers = {name: value for name, value in response.items() if name.lower() != 'content-type'}
+            data_tag_keys = sorted({_tag_key(tag) for tag in response_tags(response.data)}) if response_tags else []
+            data_generations = _response_generations(data_tag_keys, started) if data_tag_keys else []
+            if data_generations is not None:
+                cache.set(entry_key, {
+                    'generations': generations, 'etag': etag, 'data': response.data, 'headers': extra_headers,
+                    'response_tags': data_tag_keys, 'response_generations': data_generations,
+                }, timeout)
+            response['ETag'] = etag
+            response['Cache-Control'] = cache_control
+            if _matches(request.headers.get('If-None-Match'), etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=dict(response.items()))
+            return response
+        return wrapper
+    return decorator
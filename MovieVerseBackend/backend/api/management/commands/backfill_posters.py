@@ -0,0 +1,177 @@
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from api.details import invalidate_details
+from api.http_cache import bump_tags
+from api.models import Movie
+from api.sampling import bump_catalog_version
+from api.tmdb import TMDBUnavailable, first_result, poster_url, search_key, tmdb, trim_search
+from api.tmdb_cache import MISSING, tmdb_cache
+
+DEFAULT_STATE_FILE = Path(settings.BASE_DIR) / '.backfill_posters.json'
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 1 / `rate` seconds apart across threads
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+def missing_posters():
+    """
+    Movies whose poster_url is empty or a bare TMDB path
+    """
+    return Movie.objects.exclude(Q(poster_url__startswith='http://') | Q(poster_url__startswith='https://'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill in poster_url for movies that have none or only a TMDB path, so "
+        "requests never have to look posters up. Safe to interrupt: a rerun "
+        "resumes after the last finished batch"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent TMDB lookups")
+        parser.add_argument('--rate', type=float, default=10, help="Maximum TMDB lookups per second")
+        parser.add_argument('--batch-size', type=int, default=100, help="Movies written per bulk_update")
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many movies")
+        parser.add_argument('--state-file', default=str(DEFAULT_STATE_FILE),
+                            help="Where progress is kept between runs")
+        parser.add_argument('--restart', action='store_true', help="Ignore saved progress")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['rate'] <= 0 or options['batch_size'] < 1:
+            raise CommandError("--workers, --rate and --batch-size must be positive")
+
+        state_file = Path(options['state_file'])
+        after_id = 0
+        if state_file.exists() and not options['restart']:
+            after_id = json.loads(state_file.read_text())['last_id']
+            self.stdout.write(f"Resuming after movie {after_id}")
+
+        limiter = RateLimiter(options['rate'])
+        started = time.monotonic()
+        processed = resolved = 0
+        movies = missing_posters().filter(id__gt=after_id).order_by('id').only('id', 'title', 'poster_url')
+
+        finished = False
+        while options['limit'] is None or processed < options['limit']:
+            size = options['batch_size']
+            if options['limit'] is not None:
+                size = min(size, options['limit'] - processed)
+            batch = list(movies.filter(id__gt=after_id)[:size])
+            if not batch:
+                finished = True
+                break
+
+            posters, failed = self.resolve_batch(batch, limiter, options['workers'])
+            changed = [movie for movie in batch if posters.get(movie.id)]
+            for movie in changed:
+                movie.poster_url = posters[movie.id]
+            Movie.objects.bulk_update(changed, ['poster_url'], batch_size=options['batch_size'])
+            # bulk_update sends no signals, so invalidate what the Movie signals would
+            invalidate_details(*(movie.id for movie in changed))
+            bump_tags(*(f'movie:{movie.id}' for movie in changed))
+            resolved += len(changed)
+
+            if failed:
+                self.refresh_catalog(resolved)
+                raise CommandError(
+                    f"TMDB is unavailable ({failed} lookups failed); {resolved} posters saved, "
+                    f"rerun to resume after movie {after_id}"
+                )
+            after_id = batch[-1].id
+            processed += len(batch)
+            state_file.write_text(json.dumps({'last_id': after_id}))
+
+        self.refresh_catalog(resolved)
+        if finished:
+            state_file.unlink(missing_ok=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Resolved {resolved} of {processed} posters in {time.monotonic() - started:.2f}s"
+        ))
+
+    def refresh_catalog(self, resolved):
+        if resolved:
+            # Cached autocomplete cards and responses carry the old URLs
+            bump_catalog_version()
+            bump_tags('catalog')
+
+    def resolve_batch(self, batch, limiter, workers):
+        """
+        ({movie_id: poster_url or None}, number of failed lookups).
+
+        Titles are looked up through the TMDB response cache. Misses are
+        fetched by `workers` threads that only talk to TMDB; this thread
+        does every database read and write.
+        """
+        posters = {}
+        lookups = {}
+        for movie in batch:
+            if movie.poster_url:
+                # A path from the CSV import: no lookup needed
+                posters[movie.id] = poster_url('/' + movie.poster_url.lstrip('/'))
+                continue
+            key = search_key(movie.title)
+            data = tmdb_cache.get('search', key)
+            if data is MISSING:
+                lookups.setdefault(key, (movie.title, []))[1].append(movie.id)
+            else:
+                posters[movie.id] = self.search_poster(data)
+
+        pending = queue.Queue()
+        for key in lookups:
+            pending.put(key)
+        fetched = {}
+        failures = []
+
+        def work():
+            while True:
+                try:
+                    key = pending.get_nowait()
+                except queue.Empty:
+                    return
+                limiter.wait()
+                try:
+                    fetched[key] = tmdb.get('search/movie', query=lookups[key][0])
+                except TMDBUnavailable:
+                    failures.append(key)
+
+        threads = [threading.Thread(target=work) for _ in range(min(workers, len(lookups)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for key, data in fetched.items():
+            data = trim_search(data) if data is not None else None
+            tmdb_cache.set('search', key, data)
+            for movie_id in lookups[key][1]:
+                posters[movie_id] = self.search_poster(data)
+        return posters, len(failures)
+
+    @staticmethod
+    def search_poster(data):
+        result = first_result(data)
+        return poster_url(result.get('poster_path')) if result else None
@@ -0,0 +1,125 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from ai.engine import LIKE_THRESHOLD
+from ai.registry import get_bundle
+from api.models import Movie, Ratings, RecommendedMovies
+from api.recommendation_cache import bump_ratings_version
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Score every active user against the feature matrix in chunks and "
+        "bulk-upsert their top k movies into RecommendedMovies"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10, help="Recommendations stored per user")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Users scored per matrix product")
+        parser.add_argument('--min-user-id', type=int, default=None, help="Lowest user id to process (inclusive)")
+        parser.add_argument('--max-user-id', type=int, default=None, help="Highest user id to process (inclusive)")
+        parser.add_argument('--shard', type=int, default=0, help="Process users with id %% shards == shard")
+        parser.add_argument('--shards', type=int, default=1, help="Total number of shards")
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        chunk_size = options['chunk_size']
+        shard, shards = options['shard'], options['shards']
+
+        if top_k < 1 or chunk_size < 1:
+            raise CommandError("--top-k and --chunk-size must be positive")
+        if shards < 1 or not 0 <= shard < shards:
+            raise CommandError("--shard must be between 0 and --shards - 1")
+
+        users = CustomUser.objects.filter(is_active=True)
+        if options['min_user_id'] is not None:
+            users = users.filter(id__gte=options['min_user_id'])
+        if options['max_user_id'] is not None:
+            users = users.filter(id__lte=options['max_user_id'])
+        user_ids = [user_id for user_id in users.order_by('id').values_list('id', flat=True)
+                    if user_id % shards == shard]
+
+        bundle = get_bundle()
+        started = time.monotonic()
+        written = 0
+        for start in range(0, len(user_ids), chunk_size):
+            written += self.process_chunk(bundle, user_ids[start:start + chunk_size], top_k)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {written} recommendations for {len(user_ids)} users "
+            f"(shard {shard}/{shards}) in {time.monotonic() - started:.1f}s"
+        ))
+
+    def process_chunk(self, bundle, user_ids, top_k):
+        """
+        Score one chunk of users with a single matrix-matrix product and upsert their top k
+        """
+        engine = bundle.engine
+        index_for_user = {user_id: index for index, user_id in enumerate(user_ids)}
+
+        liked, disliked, rated = [], [], []
+        ratings = Ratings.objects.filter(user_id__in=user_ids).values_list('user_id', 'movie_id', 'rating')
+        for user_id, movie_id, rating in ratings:
+            row = bundle.row_for_id.get(movie_id)
+            if row is None:
+                continue
+            pair = (index_for_user[user_id], row)
+            rated.append(pair)
+            (liked if rating >= LIKE_THRESHOLD else disliked).append(pair)
+
+        if not liked:
+            return 0
+
+        weights = engine.profile_weights(len(user_ids), liked, disliked)
+        scores = engine.score_many(weights)
+
+        # Never recommend something the user already rated
+        rated = np.asarray(rated, dtype=np.intp)
+        scores[rated[:, 0], rated[:, 1]] = -np.inf
+
+        rows, top_scores = engine.top_k_many(scores, top_k)
+        has_profile = np.zeros(len(user_ids), dtype=bool)
+        has_profile[np.asarray(liked, dtype=np.intp)[:, 0]] = True
+
+        run_started = timezone.now()
+        recommendations = []
+        for index in np.flatnonzero(has_profile):
+            for row, score in zip(rows[index], top_scores[index]):
+                if row < 0:
+                    break
+                recommendations.append(RecommendedMovies(
+                    user_id=user_ids[index],
+                    movie_id=int(bundle.movie_ids[row]),
+                    score=float(score),
+                ))
+
+        # Ids in the model catalog may not all exist in the DB
+        existing = set(
+            Movie.objects.filter(id__in={rec.movie_id for rec in recommendations}).values_list('id', flat=True)
+        )
+        recommendations = [rec for rec in recommendations if rec.movie_id in existing]
+
+        processed = [user_ids[index] for index in np.flatnonzero(has_profile)]
+        with transaction.atomic():
+            RecommendedMovies.objects.bulk_create(
+                recommendations,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['user', 'movie'],
+                update_fields=['score', 'recommended_on'],
+            )
+            # Drop anything from an older run that is no longer in the user's top k
+            RecommendedMovies.objects.filter(
+                user_id__in=processed, recommended_on__lt=run_started
+            ).delete()
+
+        # Cached /api/recommendations/ responses for these users are now stale
+        for user_id in processed:
+            bump_ratings_version(user_id)
+
+        return len(recommendations)
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.trending import LIST_SIZE, backfill_buckets, rebuild_trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the cached trending list from the hourly rating buckets; "
+        "run it every few minutes from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=LIST_SIZE, help="Movies kept in the ranked list")
+        parser.add_argument('--backfill', action='store_true',
+                            help="First rebuild the buckets of the window from Ratings.created_at")
+
+    def handle(self, *args, **options):
+        if options['size'] < 1:
+            raise CommandError("--size must be positive")
+
+        started = time.monotonic()
+        if options['backfill']:
+            backfill_buckets()
+        entry = rebuild_trending(size=options['size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranked {len(entry['ids'])} trending movies in {time.monotonic() - started:.2f}s"
+        ))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_recommendedmovies_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recommendedmovies',
+            name='score',
+            field=models.FloatField(blank=True, default=None, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recommendedmovies',
+            index=models.Index(fields=['user', '-score'], name='api_recomme_user_id_ba922d_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:02
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRIGRAM_FIELDS = ['title', 'director', 'star1', 'star2']
+# Copy of api.search.SEARCH_VECTOR_SQL as of this migration; queries must use the same expression
+SEARCH_VECTOR_SQL = (
+    "(setweight(to_tsvector('english', coalesce(\"api_movie\".\"title\", '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(\"api_movie\".\"director\", '') || ' ' || "
+    "coalesce(\"api_movie\".\"star1\", '') || ' ' || coalesce(\"api_movie\".\"star2\", '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(\"api_movie\".\"description\", '')), 'C'))"
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    # Trigram and tsvector GIN indexes only exist on Postgres; other backends use api.search.NgramIndex
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS api_movie_{field}_trgm ON api_movie USING gin ("{field}" gin_trgm_ops)'
+        )
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS api_movie_search_vector ON api_movie USING gin ({SEARCH_VECTOR_SQL})'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS api_movie_{field}_trgm')
+    schema_editor.execute('DROP INDEX IF EXISTS api_movie_search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_recommendedmovies_score'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
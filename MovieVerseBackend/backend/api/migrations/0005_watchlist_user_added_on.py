@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_movie_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['user', '-added_on'], name='api_watchli_user_id_5214ef_idx'),
+        ),
+    ]
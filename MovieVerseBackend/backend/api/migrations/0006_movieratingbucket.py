@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_watchlist_user_added_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieRatingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='api_moviera_hour_b203b3_idx')],
+                'unique_together': {('movie', 'hour')},
+            },
+        ),
+    ]
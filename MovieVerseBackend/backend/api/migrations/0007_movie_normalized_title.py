@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:10
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize(text):
+    # Copy of api.search.normalize as of this migration
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w]+', ' ', text.lower()).split())
+
+
+def fill_normalized_titles(apps, schema_editor):
+    Movie = apps.get_model('api', 'Movie')
+    movies = list(Movie.objects.only('id', 'title'))
+    for movie in movies:
+        movie.normalized_title = normalize(movie.title)[:255]
+    Movie.objects.bulk_update(movies, ['normalized_title'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_movieratingbucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='normalized_title',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_normalized_titles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:40
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_genre_names(apps, schema_editor):
+    # Same as the backfill_genre_names command, against the historical models
+    Movie = apps.get_model('api', 'Movie')
+    names = defaultdict(list)
+    rows = Movie.genres.through.objects.order_by('id').values_list('movie_id', 'genre__name')
+    for movie_id, name in rows:
+        names[movie_id].append(name)
+    movies = [Movie(id=movie_id, genre_names=genre_names) for movie_id, genre_names in names.items()]
+    Movie.objects.bulk_update(movies, ['genre_names'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_movie_normalized_title'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='genre_names',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(fill_genre_names, migrations.RunPython.noop),
+    ]
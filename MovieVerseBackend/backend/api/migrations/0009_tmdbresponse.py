@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_movie_genre_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TMDBResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=255)),
+                ('data', models.JSONField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='api_tmdbres_expires_340120_idx'), models.Index(fields=['fetched_at'], name='api_tmdbres_fetched_e71b52_idx')],
+                'unique_together': {('kind', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:05
+
+from django.db import migrations
+
+
+def create_title_index(apps, schema_editor):
+    # title__icontains compiles to UPPER("title"::text) LIKE UPPER(...), which the plain
+    # api_movie_title_trgm index cannot serve; a trigram index on the same expression can
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS api_movie_title_upper_trgm ON api_movie USING gin (UPPER("title"::text) gin_trgm_ops)'
+    )
+
+
+def drop_title_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS api_movie_title_upper_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_tmdbresponse'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_index, drop_title_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:30
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # The shared cache in settings.CACHES lives in the database unless REDIS_URL is set;
+    # createcachetable does nothing for other backends or when the table exists
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_movie_title_upper_trgm'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
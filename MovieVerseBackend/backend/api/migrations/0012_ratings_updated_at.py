@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    # Existing ratings were last changed when they were created, as far as we know
+    Ratings = apps.get_model('api', 'Ratings')
+    Ratings.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField()),
+                ('movie_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ratings',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ratings',
+            index=models.Index(fields=['updated_at'], name='api_ratings_updated_050d3a_idx'),
+        ),
+    ]
@@ -26,6 +26,7 @@ class Genre(models.Model):
 
 class Movie(models.Model):
     title = models.CharField(max_length=255)
+    normalized_title = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False)  # Set from title by api.signals
     description = models.TextField(blank=True,default="")
     director = models.CharField(max_length=255, blank=True,default="")
     star1 = models.CharField(max_length=255, blank=True,default="")
@@ -35,6 +36,7 @@ class Movie(models.Model):
     imdb_rating = models.FloatField(default=0.0, validators=[MinValueValidator(0.0), MaxValueValidator(10.0)])
     our_rating = models.FloatField(default=0, validators=[MinValueValidator(0), MaxValueValidator(10)])
     genres = models.ManyToManyField(Genre)
+    genre_names = models.JSONField(default=list, blank=True, editable=False)  # Copy of genres' names, synced by api.signals
 
     def __str__(self):
         return self.title
@@ -48,6 +50,7 @@ class Watchlist(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['user', 'movie']), 
+            models.Index(fields=['user', '-added_on']),
         ]
 
     def __str__(self):
@@ -58,33 +61,82 @@ class Ratings(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     rating = models.FloatField(validators=[MinValueValidator(0.0), MaxValueValidator(5.0)])
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Read by incremental model updates
 
     class Meta:
         unique_together = ('user', 'movie') 
         indexes = [
             models.Index(fields=['movie']), 
             models.Index(fields=['user']),  
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
         return f"{self.user.username} rated {self.movie.title} {self.rating}/5"
 
+
+class DeletedRating(models.Model):
+    # Written by api.signals when a rating is deleted, so incremental model
+    # updates can take it back out; pruned by full rebuilds
+    user_id = models.IntegerField()
+    movie_id = models.IntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"User {self.user_id} unrated movie {self.movie_id}"
+
+
 class RecommendedMovies(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)  
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE) 
     recommended_on = models.DateTimeField(auto_now_add=True)  
+    score = models.FloatField(null=True, blank=True, default=None)  # Filled by precompute_recommendations
 
     class Meta:
         unique_together = ('user', 'movie')  
         indexes = [
             models.Index(fields=['user']), 
             models.Index(fields=['movie']),
+            models.Index(fields=['user', '-score']),
         ]
 
     def __str__(self):
         return f"{self.user.username} recommended {self.movie.title}"
+
+
+class MovieRatingBucket(models.Model):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    hour = models.DateTimeField()  # Start of the hour the ratings were added in
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('movie', 'hour')
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.movie.title} rated {self.count} times at {self.hour:%Y-%m-%d %H:00}"
     
 
+class TMDBResponse(models.Model):
+    kind = models.CharField(max_length=20)  # 'search', 'movie', 'credits' or 'movie_credits'
+    key = models.CharField(max_length=255)  # Normalized query or TMDB id
+    data = models.JSONField(null=True, blank=True)  # None: TMDB had nothing (404 or no results)
+    fetched_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('kind', 'key')
+        indexes = [
+            models.Index(fields=['expires_at']),
+            models.Index(fields=['fetched_at']),
+        ]
+
+    def __str__(self):
+        return f"TMDB {self.kind} {self.key}"
+
+
 class Actor(models.Model):
     name = models.CharField(max_length=255)
     
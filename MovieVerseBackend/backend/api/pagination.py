@@ -0,0 +1,150 @@
+"""
+Keyset (cursor) pagination for the list endpoints in api.views.
+
+A cursor is the ordering key of the last row on the previous page, so the
+next page is a range query on that key instead of an OFFSET: deep pages
+cost the same as the first one. Response bodies keep their existing shape;
+the next page is advertised in a `Link: <...>; rel="next"` header and in
+`X-Next-Cursor`.
+"""
+import base64
+import binascii
+import json
+import math
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.response import Response
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _param(request, name):
+    value = request.query_params.get(name)
+    if value is None and request.method == 'POST' and hasattr(request.data, 'get'):
+        value = request.data.get(name)
+    return value
+
+
+def page_size(request, default=DEFAULT_PAGE_SIZE):
+    """
+    ?page_size= (or the same key in a POST body), clamped to 1..MAX_PAGE_SIZE
+    """
+    try:
+        size = int(_param(request, 'page_size'))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def decode_cursor(cursor, length=None, numeric=False):
+    """
+    Ordering key stored in a cursor, or None for the first page. With
+    `numeric`, every value must be a finite number, as in the (score, id)
+    cursors of the in-memory rankings.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or (length is not None and len(values) != length):
+        raise InvalidCursor(cursor)
+    if numeric and not all(_is_number(value) for value in values):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def request_cursor(request, length=None, numeric=False):
+    return decode_cursor(_param(request, 'cursor'), length, numeric)
+
+
+def _order_expressions(ordering):
+    # Nulls always sort last so the database order matches keyset_filter
+    return [
+        F(field[1:]).desc(nulls_last=True) if field.startswith('-') else F(field).asc(nulls_last=True)
+        for field in ordering
+    ]
+
+
+def keyset_filter(model, ordering, values):
+    """
+    Q matching the rows that come after `values` in `ordering`.
+
+    The last field of `ordering` must be unique (normally the primary key).
+    """
+    if len(values) != len(ordering):
+        raise InvalidCursor(values)
+
+    branches = Q(pk__in=[])
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        nullable = model._meta.get_field(name).null
+
+        if value is not None:
+            after = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            if nullable:
+                after |= Q(**{f'{name}__isnull': True})
+            branches |= equal & after
+            equal &= Q(**{name: value})
+        else:
+            # Only other nulls come after a null, and they are equal on this field
+            equal &= Q(**{f'{name}__isnull': True})
+    return branches
+
+
+def paginate(queryset, ordering, size, cursor_values=None):
+    """
+    One page of `queryset` in keyset order: (rows, next_cursor).
+
+    `next_cursor` is None on the last page.
+    """
+    queryset = queryset.order_by(*_order_expressions(ordering))
+    if cursor_values is not None:
+        try:
+            queryset = queryset.filter(keyset_filter(queryset.model, ordering, cursor_values))
+        except (TypeError, ValueError, ValidationError):
+            # A value the field cannot take, e.g. a string for a score
+            raise InvalidCursor(cursor_values)
+
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+
+
+def page_headers(request, next_cursor):
+    """
+    Link / X-Next-Cursor headers for a page, empty on the last page
+    """
+    if not next_cursor:
+        return {}
+    params = request.query_params.copy()
+    params['cursor'] = next_cursor
+    url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return {'Link': f'<{url}>; rel="next"', 'X-Next-Cursor': next_cursor}
+
+
+def paginated_response(request, data, next_cursor, **kwargs):
+    return Response(data, headers=page_headers(request, next_cursor), **kwargs)
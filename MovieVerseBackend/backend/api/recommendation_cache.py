@@ -0,0 +1,88 @@
+import time
+
+from django.core.cache import cache
+
+from ai.registry import get_bundle
+
+RESULT_TIMEOUT = 60 * 60
+# How long one request may hold the right to recompute a cold entry
+LOCK_TIMEOUT = 30
+# How long other requests wait for that recompute before doing it themselves
+LOCK_WAIT = 5.0
+LOCK_POLL = 0.05
+
+
+def _version_key(user_id):
+    return f'recs:ratings-version:{user_id}'
+
+
+def _entry_key(kind, user_id):
+    return f'recs:{kind}:{user_id}'
+
+
+def bump_ratings_version(user_id):
+    """
+    Invalidate every cached recommendation for the user; call after their ratings
+    (or their precomputed recommendations) change
+    """
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Missing or evicted: start from a fresh value that no old entry can carry
+        cache.set(key, time.time_ns(), None)
+
+
+def ratings_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def cached_recommendations(kind, user_id, compute, timeout=RESULT_TIMEOUT):
+    """
+    Return `compute()`'s payload for the user, cached under
+    (user_id, ratings_version, model_version).
+
+    The entry and the version counter are fetched with one get_many, so a
+    warm hit is a single cache round trip. On a miss only one request
+    recomputes; concurrent ones wait for its result. `compute` returns
+    (payload, cacheable) so error fallbacks are not cached.
+    """
+    model_version = get_bundle().version
+    entry_key = _entry_key(kind, user_id)
+
+    found = cache.get_many([_version_key(user_id), entry_key])
+    version = found.get(_version_key(user_id))
+    if version is None:
+        version = ratings_version(user_id)
+
+    entry = found.get(entry_key)
+    if entry and entry['ratings_version'] == version and entry['model_version'] == model_version:
+        return entry['payload']
+
+    lock_key = f'{entry_key}:lock:{version}:{model_version}'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            entry = cache.get(entry_key)
+            if entry and entry['ratings_version'] == version and entry['model_version'] == model_version:
+                return entry['payload']
+        # The request holding the lock is too slow or died; compute without caching
+        return compute()[0]
+
+    try:
+        payload, cacheable = compute()
+        if cacheable:
+            cache.set(entry_key, {
+                'ratings_version': version,
+                'model_version': model_version,
+                'payload': payload,
+            }, timeout)
+        return payload
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,151 @@
+"""
+Random movie sampling without scanning the Movie table.
+
+All movie ids are loaded once per process into a numpy array and reloaded
+only when the catalog version (bumped by the Movie signals) changes, so a
+sample costs O(count) instead of order_by('?') sorting the whole table.
+
+Per-user Tinder decks walk a pseudo-random permutation of that array. The
+permutation is a keyed Feistel network, so a deck is just (seed, position)
+in the cache: every card is shown once before the deck is reshuffled, and
+drawing a card is O(1) whatever the catalog size.
+"""
+import hashlib
+import secrets
+import threading
+import time
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import Movie
+
+CATALOG_VERSION_KEY = 'movies:catalog-version'
+DECK_TIMEOUT = 60 * 60 * 24 * 30
+FEISTEL_ROUNDS = 4
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Mark the cached id array stale in every process; call after movies are added
+    or deleted. Returns the new version.
+    """
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(CATALOG_VERSION_KEY, version, None)
+        return version
+
+
+class MovieIdPool:
+    """
+    Process-wide sorted array of every Movie id
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+        self._version = None
+
+    def ids(self, version=None):
+        version = catalog_version() if version is None else version
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._ids = np.fromiter(
+                        Movie.objects.order_by('id').values_list('id', flat=True), dtype=np.int64
+                    )
+                    self._version = version
+        return self._ids
+
+
+movie_pool = MovieIdPool()
+
+
+def random_movie_ids(count, exclude=()):
+    """
+    Up to `count` distinct random movie ids, skipping `exclude`
+    """
+    ids = movie_pool.ids()
+    exclude = set(exclude)
+    count = min(count, len(ids) - len(exclude))
+    if count <= 0:
+        return []
+
+    rng = np.random.default_rng()
+    picked = []
+    seen = set(exclude)
+    # Rejection sampling: draws only a few extra ids unless most of the catalog is excluded
+    while len(picked) < count:
+        for movie_id in ids[rng.integers(0, len(ids), size=2 * (count - len(picked)) + 4)].tolist():
+            if movie_id not in seen:
+                seen.add(movie_id)
+                picked.append(movie_id)
+                if len(picked) == count:
+                    break
+    return picked
+
+
+def _permute(index, size, seed):
+    """
+    Position of `index` in the seed's pseudo-random permutation of range(size)
+    """
+    half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+    mask = (1 << half_bits) - 1
+    key = seed.encode()
+
+    while True:
+        left, right = index >> half_bits, index & mask
+        for round_number in range(FEISTEL_ROUNDS):
+            digest = hashlib.blake2b(right.to_bytes(8, 'little'), digest_size=8, key=key,
+                                     person=round_number.to_bytes(2, 'little')).digest()
+            left, right = right, left ^ (int.from_bytes(digest, 'little') & mask)
+        index = (left << half_bits) | right
+        # Cycle-walk until the result falls inside range(size)
+        if index < size:
+            return index
+
+
+def _deck_key(user_id):
+    return f'tinder:deck:{user_id}'
+
+
+def deck_movie_ids(user_id, count):
+    """
+    The next `count` movie ids of the user's deck.
+
+    A deck is a permutation of the catalog; it is reshuffled once exhausted
+    or when movies are added or removed. Concurrent requests from the same
+    user may occasionally get the same cards.
+    """
+    version = catalog_version()
+    ids = movie_pool.ids(version)
+    size = len(ids)
+    if size == 0:
+        return []
+
+    key = _deck_key(user_id)
+    deck = cache.get(key)
+    if not deck or deck['catalog_version'] != version:
+        deck = {'seed': secrets.token_hex(8), 'position': 0, 'catalog_version': version}
+
+    picked = []
+    while len(picked) < min(count, size):
+        if deck['position'] >= size:
+            deck = {'seed': secrets.token_hex(8), 'position': 0, 'catalog_version': version}
+        movie_id = int(ids[_permute(deck['position'], size, deck['seed'])])
+        deck['position'] += 1
+        if movie_id not in picked:
+            picked.append(movie_id)
+
+    cache.set(key, deck, DECK_TIMEOUT)
+    return picked
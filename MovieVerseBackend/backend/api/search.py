@@ -0,0 +1,194 @@
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+from .models import Movie
+
+DEFAULT_LIMIT = 20
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {
+    'title': 1.0,
+    'director': 0.8,
+    'star1': 0.8,
+    'star2': 0.8,
+    'description': 0.5,
+}
+FIELDS = list(FIELD_WEIGHTS)
+
+# Must stay identical to the expression indexed in migration 0004, or Postgres
+# will not use the index
+SEARCH_VECTOR_SQL = (
+    "(setweight(to_tsvector('english', coalesce(\"api_movie\".\"title\", '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(\"api_movie\".\"director\", '') || ' ' || "
+    "coalesce(\"api_movie\".\"star1\", '') || ' ' || coalesce(\"api_movie\".\"star2\", '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(\"api_movie\".\"description\", '')), 'C'))"
+)
+
+
+def normalize(text):
+    """
+    Lowercase, strip accents and collapse punctuation to single spaces
+    """
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w]+', ' ', text.lower()).split())
+
+
+def trigrams(text):
+    """
+    Trigrams of each word, padded like pg_trgm so short words still match
+    """
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NgramIndex:
+    """
+    In-process trigram inverted index over the searchable Movie fields.
+
+    Used when the database is not Postgres (e.g. SQLite test runs). Each
+    field keeps its own trigram -> movie ids posting lists. A field's
+    similarity to the query is the share of the query's trigrams found in
+    it (like pg_trgm's word_similarity); a movie scores its best weighted
+    field. Work depends on the posting lists of the query's trigrams, not
+    on the size of the catalog.
+    """
+
+    def __init__(self):
+        self.postings = {field: defaultdict(set) for field in FIELDS}
+        self.grams_by_movie = {}
+
+    def add(self, movie):
+        self.remove(movie['id'])
+        entries = []
+        for field in FIELDS:
+            for gram in trigrams(movie.get(field)):
+                self.postings[field][gram].add(movie['id'])
+                entries.append((field, gram))
+        self.grams_by_movie[movie['id']] = entries
+
+    def remove(self, movie_id):
+        for field, gram in self.grams_by_movie.pop(movie_id, ()):
+            posting = self.postings[field].get(gram)
+            if posting is not None:
+                posting.discard(movie_id)
+                if not posting:
+                    del self.postings[field][gram]
+
+    def search(self, query, limit, after=None, min_similarity=0.5):
+        """
+        Up to `limit` (movie_id, score) pairs, best first, starting after
+        the (score, movie_id) key `after`
+        """
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        scores = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            counts = Counter()
+            for gram in grams:
+                counts.update(self.postings[field].get(gram, ()))
+            for movie_id, count in counts.items():
+                similarity = count / len(grams)
+                if similarity >= min_similarity and weight * similarity > scores.get(movie_id, 0):
+                    scores[movie_id] = weight * similarity
+        if after is not None:
+            last_score, last_id = after
+            scores = {movie_id: score for movie_id, score in scores.items()
+                      if score < last_score or (score == last_score and movie_id > last_id)}
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+class SearchIndexHolder:
+    """
+    Lazily built process-wide NgramIndex, patched by the Movie signals
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    index = NgramIndex()
+                    for movie in Movie.objects.values('id', *FIELDS):
+                        index.add(movie)
+                    self._index = index
+        return self._index
+
+    def update(self, movie):
+        if self._index is not None:
+            with self._lock:
+                self._index.add({'id': movie.id, **{field: getattr(movie, field) for field in FIELDS}})
+
+    def remove(self, movie_id):
+        if self._index is not None:
+            with self._lock:
+                self._index.remove(movie_id)
+
+
+search_index = SearchIndexHolder()
+
+
+def _postgres_search(query, limit, after=None):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    matches_text = RawSQL(
+        f"{SEARCH_VECTOR_SQL} @@ websearch_to_tsquery('english', %s)", (query,), output_field=BooleanField()
+    )
+    text_rank = RawSQL(
+        f"ts_rank({SEARCH_VECTOR_SQL}, websearch_to_tsquery('english', %s))", (query,), output_field=FloatField()
+    )
+    people = Greatest(
+        TrigramWordSimilarity(query, 'director'),
+        TrigramWordSimilarity(query, 'star1'),
+        TrigramWordSimilarity(query, 'star2'),
+    )
+
+    # Each OR branch is served by a GIN index (pg_trgm on the names, tsvector on the text)
+    matching = (
+        Q(title__trigram_word_similar=query)
+        | Q(director__trigram_word_similar=query)
+        | Q(star1__trigram_word_similar=query)
+        | Q(star2__trigram_word_similar=query)
+        | Q(matches_text)
+    )
+    ranked = (
+        Movie.objects.filter(matching)
+        .annotate(rank=Greatest(TrigramWordSimilarity(query, 'title') * Value(FIELD_WEIGHTS['title']),
+                                people * Value(FIELD_WEIGHTS['director']))
+                  + text_rank * Value(FIELD_WEIGHTS['description']))
+    )
+    if after is not None:
+        last_score, last_id = after
+        ranked = ranked.filter(Q(rank__lt=last_score) | Q(rank=last_score, id__gt=last_id))
+    return list(ranked.order_by('-rank', 'id').values_list('id', 'rank')[:limit])
+
+
+def search_movies(query, limit=DEFAULT_LIMIT, after=None):
+    """
+    Movie ids matching `query` in the title, director, stars or description,
+    ranked by relevance: a list of (movie_id, score), best first.
+
+    `after` is the (score, movie_id) of the last result already returned,
+    for fetching the next page.
+    """
+    if not normalize(query):
+        return []
+    if connection.vendor == 'postgresql':
+        return _postgres_search(query, limit, after)
+    return search_index.get().search(query, limit, after)
@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from ai.profiles import update_taste_profile
+
+from .autocomplete import autocomplete_index
+from .cards import sync_genre_names
+from .details import invalidate_details
+from .facets import facet_index
+from .http_cache import bump_tags
+from .models import DeletedRating, Genre, Movie, Ratings
+from .sampling import bump_catalog_version
+from .search import normalize, search_index
+from .trending import record_rating, unrecord_rating
+
+
+@receiver(pre_save, sender=Movie)
+def normalize_title(sender, instance, **kwargs):
+    instance.normalized_title = normalize(instance.title)[:255]
+
+
+@receiver(post_save, sender=Movie)
+def index_movie(sender, instance, created, **kwargs):
+    search_index.update(instance)
+    invalidate_details(instance.id)
+    bump_tags(f'movie:{instance.id}')
+    version = None
+    if created:
+        version = bump_catalog_version()
+        bump_tags('catalog')
+    else:
+        facet_index.patch(instance)
+    autocomplete_index.update(instance, version)
+
+
+@receiver(post_delete, sender=Movie)
+def unindex_movie(sender, instance, **kwargs):
+    search_index.remove(instance.id)
+    invalidate_details(instance.id)
+    autocomplete_index.remove(instance.id, bump_catalog_version())
+    bump_tags('catalog', f'movie:{instance.id}')
+
+
+def _genres_changed(movie_ids):
+    movie_ids = list(movie_ids)
+    if not movie_ids:
+        return
+    sync_genre_names(movie_ids)
+    bump_tags(*(f'movie:{movie_id}' for movie_id in movie_ids))
+    invalidate_details(*movie_ids)
+    for movie in Movie.objects.filter(id__in=movie_ids).prefetch_related('genres'):
+        facet_index.patch(movie, [genre.id for genre in movie.genres.all()])
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def movie_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # genre.movie_set.clear() does not say which movies it touched
+        instance._cleared_movie_ids = list(instance.movie_set.values_list('id', flat=True))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        movie_ids = [instance.pk]
+    elif action == 'post_clear':
+        movie_ids = getattr(instance, '_cleared_movie_ids', [])
+    else:
+        movie_ids = pk_set or ()
+    _genres_changed(movie_ids)
+
+
+@receiver(post_save, sender=Genre)
+def genre_renamed(sender, instance, created, **kwargs):
+    if not created:
+        _genres_changed(instance.movie_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Genre)
+def remember_genre_movies(sender, instance, **kwargs):
+    # The Movie.genres rows are cascaded away without an m2m_changed signal
+    instance._deleted_movie_ids = list(instance.movie_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    _genres_changed(getattr(instance, '_deleted_movie_ids', []))
+
+
+@receiver(pre_save, sender=Ratings)
+def remember_old_rating(sender, instance, **kwargs):
+    # Inside a transaction the row stays locked until commit, so concurrent re-ratings
+    # of one movie reach the taste profile one after the other
+    instance._old_rating = None
+    if instance.pk is not None:
+        ratings = Ratings.objects.filter(pk=instance.pk)
+        if transaction.get_connection().in_atomic_block:
+            ratings = ratings.select_for_update()
+        instance._old_rating = ratings.values_list('rating', flat=True).first()
+
+
+@receiver(post_save, sender=Ratings)
+def count_rating(sender, instance, created, **kwargs):
+    # Only new ratings count towards trending, like the old created_at window did
+    if created:
+        record_rating(instance.movie_id, instance.created_at)
+    update_taste_profile(instance.user_id, instance.movie_id, getattr(instance, '_old_rating', None), instance.rating)
+    bump_tags(f'movie:{instance.movie_id}')
+
+
+@receiver(post_delete, sender=Ratings)
+def forget_rating(sender, instance, **kwargs):
+    update_taste_profile(instance.user_id, instance.movie_id, instance.rating, None)
+    unrecord_rating(instance.movie_id, instance.created_at)
+    # Picked up by `manage.py build_item_similarity --since`
+    DeletedRating.objects.create(user_id=instance.user_id, movie_id=instance.movie_id)
+    bump_tags(f'movie:{instance.movie_id}')
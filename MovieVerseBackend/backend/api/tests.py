@@ -1,3 +1,1144 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from ai import profiles
+from ai.engine import RecommendationEngine
+from ai.models import UserTasteProfile
+from users.models import CustomUser
+
+from . import autocomplete, coalesce, trending
+from .cards import CARD_FIELDS, movie_cards, movie_cards_by_id, sync_genre_names
+from .coalesce import _lock_key, single_flight
+from .details import find_movie_id, movie_detail
+from .http_cache import bump_tags
+from .models import Genre, Movie, MovieRatingBucket, Ratings, RecommendedMovies, TMDBResponse, Watchlist
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, paginate
+from .recommendation_cache import bump_ratings_version, cached_recommendations, ratings_version
+from .sampling import deck_movie_ids
+from .search import SEARCH_VECTOR_SQL, normalize, search_index, search_movies
+from .tmdb import MAX_RETRIES, CircuitBreaker, TMDBClient, TMDBRejected, TMDBUnavailable
+from .tmdb_cache import NEGATIVE_TTL
+
+# For tests that count queries or share the cache with other threads: the
+# shared DatabaseCache adds its own queries, and other threads cannot see
+# rows the test's transaction has not committed
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class DatabaseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def expiry(self, key):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT expires FROM movieverse_cache WHERE cache_key = %s', [cache.make_key(key)])
+            return cursor.fetchone()[0]
+
+    def test_incr_keeps_the_value_and_the_expiry(self):
+        cache.set('counter', 1, None)
+        cache.set('expiring', 1, 60)
+        forever, soon = self.expiry('counter'), self.expiry('expiring')
+
+        self.assertEqual(cache.incr('counter'), 2)
+        self.assertEqual(cache.incr('expiring', 5), 6)
+        self.assertEqual(cache.get_many(['counter', 'expiring']), {'counter': 2, 'expiring': 6})
+        self.assertEqual(self.expiry('counter'), forever)
+        self.assertLessEqual(abs((self.expiry('expiring') - soon).total_seconds()), 1)
+
+    def test_incr_of_a_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MovieCardsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        drama = Genre.objects.create(id=1, name='Drama')
+        crime = Genre.objects.create(id=2, name='Crime')
+        cls.movies = []
+        for n in range(30):
+            movie = Movie.objects.create(title=f'Movie {n}', director=f'Director {n}')
+            movie.genres.add(drama)
+            if n % 3 == 0:
+                movie.genres.add(crime)
+            cls.movies.append(movie)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        ids = [movie.id for movie in self.movies]
+        for size in (1, 10, 30):
+            with self.assertNumQueries(1):
+                cards = movie_cards_by_id(ids[:size])
+            self.assertEqual(len(cards), size)
+
+        with self.assertNumQueries(1):
+            movie_cards(Movie.objects.order_by('-id')[:25])
+
+    def test_cards_keep_the_serializer_shape_and_order(self):
+        ids = [self.movies[3].id, self.movies[1].id, 999999]
+        cards = movie_cards_by_id(ids)
+
+        self.assertEqual([card['id'] for card in cards], ids[:2])
+        self.assertEqual(list(cards[0]), CARD_FIELDS)
+        self.assertEqual(cards[0]['genres'], ['Drama', 'Crime'])
+        self.assertEqual(cards[1]['genres'], ['Drama'])
+        self.assertIsNone(cards[0]['release_date'])
+
+    def test_tinder_movies_query_count(self):
+        # The id pool is loaded once per catalog change; after that only the cards hit the DB
+        self.client.get('/api/TinderMovies/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/TinderMovies/')
+        self.assertEqual(len(response.json()), 10)
+
+
+class GenreNamesSyncTests(TestCase):
+    def setUp(self):
+        self.drama = Genre.objects.create(id=1, name='Drama')
+        self.crime = Genre.objects.create(id=2, name='Crime')
+        self.movie = Movie.objects.create(title='Heat')
+
+    def genre_names(self):
+        return Movie.objects.get(id=self.movie.id).genre_names
+
+    def test_follows_changes_from_the_movie_side(self):
+        self.movie.genres.add(self.crime, self.drama)
+        self.assertEqual(sorted(self.genre_names()), ['Crime', 'Drama'])
+        self.movie.genres.remove(self.crime)
+        self.assertEqual(self.genre_names(), ['Drama'])
+        self.movie.genres.clear()
+        self.assertEqual(self.genre_names(), [])
+
+    def test_follows_changes_from_the_genre_side(self):
+        self.crime.movie_set.add(self.movie)
+        self.assertEqual(self.genre_names(), ['Crime'])
+        self.crime.name = 'Heist'
+        self.crime.save()
+        self.assertEqual(self.genre_names(), ['Heist'])
+        self.crime.movie_set.clear()
+        self.assertEqual(self.genre_names(), [])
+
+        self.movie.genres.add(self.drama)
+        self.drama.delete()
+        self.assertEqual(self.genre_names(), [])
+
+    def test_backfill_repairs_rows_written_without_signals(self):
+        Movie.genres.through.objects.bulk_create([Movie.genres.through(movie=self.movie, genre=self.drama)])
+        self.assertEqual(self.genre_names(), [])
+        self.assertEqual(sync_genre_names(), [self.movie.id])
+        self.assertEqual(self.genre_names(), ['Drama'])
+        self.assertEqual(sync_genre_names(), [])
+
+
+class TinderDeckTests(TestCase):
+    def test_deck_shows_every_movie_once_before_repeating(self):
+        for n in range(23):
+            Movie.objects.create(title=f'Movie {n}')
+        catalog = set(Movie.objects.values_list('id', flat=True))
+
+        first_pass = deck_movie_ids(42, 10) + deck_movie_ids(42, 10) + deck_movie_ids(42, 3)
+        self.assertEqual(len(first_pass), 23)
+        self.assertEqual(set(first_pass), catalog)
+        # A new shuffle starts once the deck is exhausted
+        self.assertEqual(len(set(deck_movie_ids(42, 10))), 10)
+
+
+class FacetBrowseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        drama = Genre.objects.create(id=1, name='Drama')
+        crime = Genre.objects.create(id=2, name='Crime')
+        # Pairs of movies share a rating, so pages have to break ties by id
+        for n in range(12):
+            movie = Movie.objects.create(
+                title=f'Movie {n}', imdb_rating=9 - n // 2, release_date=f'{1990 + n * 2}-01-01',
+            )
+            movie.genres.add(drama)
+            if n % 2 == 0:
+                movie.genres.add(crime)
+
+    def browse(self, **params):
+        return self.client.get('/api/browse/', params)
+
+    def test_pages_walk_the_selection_in_rating_order(self):
+        expected = list(Movie.objects.order_by('-imdb_rating', 'id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            response = self.browse(page_size=5, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['count'], 12)
+            seen += [card['id'] for card in response.json()['results']]
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_filters_and_facet_counts(self):
+        data = self.browse(genre=2, decade=1990, min_rating=8).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([card['title'] for card in data['results']], ['Movie 0', 'Movie 2'])
+        self.assertEqual({facet['name']: facet['count'] for facet in data['facets']['genres']},
+                         {'Drama': 2, 'Crime': 2})
+
+    def test_malformed_cursors_are_rejected(self):
+        for cursor in (encode_cursor(['a', 'b']), encode_cursor([9.0]), encode_cursor([True, 1]), 'not-a-cursor'):
+            self.assertEqual(self.browse(cursor=cursor).status_code, 400, cursor)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.godfather = Movie.objects.create(title='The Godfather', director='Francis Ford Coppola',
+                                             description='The aging patriarch of a crime dynasty.')
+        cls.heat = Movie.objects.create(title='Heat', director='Michael Mann', star1='Al Pacino',
+                                        description='A crime thriller set in Los Angeles.')
+        cls.amelie = Movie.objects.create(title='Amélie', director='Jean-Pierre Jeunet')
+        for n in range(7):
+            Movie.objects.create(title=f'Crime Story {n}')
+
+    def setUp(self):
+        cache.clear()
+        # Built from this test's rows, then kept current by the Movie signals
+        search_index._index = None
+        self.addCleanup(setattr, search_index, '_index', None)
+
+    def search(self, query, **params):
+        return self.client.get(f'/api/searchMovie/{query}/', params)
+
+    def test_normalize(self):
+        self.assertEqual(normalize('  Amélie: The   MOVIE! '), 'amelie the movie')
+        self.assertEqual(normalize(None), '')
+
+    def test_ranks_fields_and_tolerates_typos(self):
+        self.assertEqual(search_movies('godfathr')[0][0], self.godfather.id)
+        self.assertEqual(search_movies('amelie')[0][0], self.amelie.id)
+        self.assertEqual(search_movies('pacino')[0][0], self.heat.id)
+        # A title match outranks the same word in a description
+        ranked = [movie_id for movie_id, _ in search_movies('crime')]
+        self.assertEqual(ranked[-2:], sorted([self.godfather.id, self.heat.id]))
+        self.assertEqual(search_movies('?!'), [])
+
+    def test_index_follows_movie_changes(self):
+        search_movies('heat')
+        movie = Movie.objects.create(title='Heatwave')
+        self.assertIn(movie.id, [movie_id for movie_id, _ in search_movies('heatwave')])
+        movie.title = 'Cold Front'
+        movie.save()
+        self.assertEqual(search_movies('heatwave'), [])
+        self.assertEqual(search_movies('cold front')[0][0], movie.id)
+        movie.delete()
+        self.assertEqual(search_movies('cold front'), [])
+
+    def test_pages_do_not_repeat_or_skip(self):
+        expected = [movie_id for movie_id, _ in search_movies('crime', limit=100)]
+        seen, cursor = [], None
+        while True:
+            response = self.search('crime', page_size=3, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(response.status_code, 200)
+            seen += [card['id'] for card in response.json()]
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 9)
+        self.assertEqual(self.search('crime', cursor=encode_cursor(['a', 1])).status_code, 400)
+
+    def test_query_expression_matches_the_indexed_one(self):
+        # Postgres only uses the GIN index for the exact expression migration 0004 indexed
+        migration = import_module('api.migrations.0004_movie_search_indexes')
+        self.assertEqual(SEARCH_VECTOR_SQL, migration.SEARCH_VECTOR_SQL)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='alice')
+        movies = [Movie.objects.create(title=f'Movie {n}') for n in range(9)]
+        # Scores tie in threes and two are not computed yet
+        for movie, score in zip(movies, [0.5, None, 0.9, 0.5, 0.9, None, 0.5, 0.1, 0.9]):
+            RecommendedMovies.objects.create(user=cls.user, movie=movie, score=score)
+            Watchlist.objects.create(user=cls.user, movie=movie)
+        # The same timestamp everywhere, so only the id breaks the ties
+        now = timezone.now()
+        RecommendedMovies.objects.update(recommended_on=now)
+        Watchlist.objects.update(added_on=now)
+
+    def walk(self, ordering, size):
+        ids, cursor = [], None
+        while True:
+            rows, cursor = paginate(RecommendedMovies.objects.all(), ordering, size, decode_cursor(cursor))
+            ids += [row.id for row in rows]
+            if cursor is None:
+                return ids
+
+    def watchlist(self, **data):
+        return self.client.post('/api/watchlist/', {'username': 'alice', **data})
+
+    def test_ties_and_null_keys_page_without_gaps_or_repeats(self):
+        ordering = ['-score', '-recommended_on', '-id']
+        rows = RecommendedMovies.objects.all()
+        # Highest score first, no score last, newest id first among equals
+        expected = [row.id for row in sorted(rows, key=lambda row: (row.score is None, -(row.score or 0), -row.id))]
+        for size in (1, 2, 4, 20):
+            self.assertEqual(self.walk(ordering, size), expected, size)
+
+    def test_watchlist_pages_through_identical_timestamps(self):
+        self.client.force_login(self.user)
+        expected = list(Watchlist.objects.order_by('-id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            response = self.watchlist(page_size=2, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(response.status_code, 200, response.content)
+            seen += [item['id'] for item in response.json()]
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_tampered_cursors_are_rejected(self):
+        self.client.force_login(self.user)
+        for cursor in ('not-a-cursor', encode_cursor(['2026-01-01T00:00:00']), encode_cursor(['yesterday', 1]),
+                       encode_cursor(['2026-01-01T00:00:00', 'abc']), encode_cursor([{}, []])):
+            self.assertEqual(self.watchlist(cursor=cursor).status_code, 400, cursor)
+
+        with self.assertRaises(InvalidCursor):
+            paginate(RecommendedMovies.objects.all(), ['-score', '-recommended_on', '-id'], 5, ['high', None, 1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='alice')
+        cls.heat = Movie.objects.create(title='Heat', director='Michael Mann', imdb_rating=8.3)
+        cls.heat_2 = Movie.objects.create(title='Heat 2', director='Michael Mann', imdb_rating=6.0)
+        cls.alien = Movie.objects.create(title='Alien', director='Ridley Scott', imdb_rating=8.5)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **headers):
+        return self.client.get('/api/searchMovie/heat/', headers=headers)
+
+    def test_hits_skip_the_view_and_honour_etags(self):
+        first = self.search()
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first.headers)
+
+        with self.assertNumQueries(0):
+            second = self.search()
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+
+        not_modified = self.search(if_none_match=first.headers['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.search(if_none_match='"stale"').status_code, 200)
+
+    def test_editing_a_movie_in_the_response_invalidates_it(self):
+        etag = self.search().headers['ETag']
+        self.heat.our_rating = 4.5
+        self.heat.save()
+
+        response = self.search(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({card['id']: card['our_rating'] for card in response.json()}[self.heat.id], 4.5)
+
+    def test_editing_other_movies_keeps_it(self):
+        self.search()
+        self.alien.our_rating = 3.0
+        self.alien.save()
+        with self.assertNumQueries(0):
+            self.search()
+
+    def test_title_lookups_follow_the_movie_they_found(self):
+        self.client.force_login(self.user)
+        first = self.client.get('/api/fetchMovieInfo/heat/')
+        self.assertEqual(first.json()['id'], self.heat.id)
+        self.heat.our_rating = 4.0
+        self.heat.save()
+
+        self.assertEqual(self.client.get('/api/fetchMovieInfo/heat/').json()['our_rating'], 4.0)
+
+    def test_changing_a_poster_invalidates_the_poster_response(self):
+        self.heat.poster_url = 'https://image.tmdb.org/t/p/w500/old.jpg'
+        self.heat.save()
+        first = self.client.get('/api/getMoviePoster/heat/')
+        self.assertEqual(first.json(), {'id': self.heat.id, 'poster_url': self.heat.poster_url})
+        with self.assertNumQueries(0):
+            self.client.get('/api/getMoviePoster/heat/')
+
+        self.heat.poster_url = 'https://image.tmdb.org/t/p/w500/new.jpg'
+        self.heat.save()
+        response = self.client.get('/api/getMoviePoster/heat/', headers={'if_none_match': first.headers['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['poster_url'], self.heat.poster_url)
+
+    def test_responses_are_not_stored_if_a_movie_changed_while_building_them(self):
+        calls = []
+
+        def search_movies(query, limit, after=None):
+            calls.append(query)
+            if len(calls) == 1:
+                # A rating lands between the view reading the movie and the response being stored
+                bump_tags(f'movie:{self.heat.id}')
+            return [(self.heat.id, 1.0)]
+
+        with mock.patch('api.views.search_movies', search_movies):
+            for _ in range(3):
+                self.search()
+        # The first response was not stored, the second was and served the third
+        self.assertEqual(len(calls), 2)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.knight = Movie.objects.create(title='The Dark Knight', director='Christopher Nolan', imdb_rating=9.0)
+        Movie.objects.create(title='Knight and Day', director='James Mangold', imdb_rating=6.3)
+
+    def titles(self, query):
+        return [card['title'] for card in self.client.get('/api/autocomplete/', {'q': query}).json()]
+
+    def test_prefixes_of_title_and_people_words(self):
+        self.assertEqual(self.titles('knig'), ['The Dark Knight', 'Knight and Day'])
+        self.assertEqual(self.titles('nolan'), ['The Dark Knight'])
+
+    def test_edits_from_other_processes_show_up_after_max_age(self):
+        self.titles('knig')
+        # Written without signals, as if by another process
+        Movie.objects.filter(id=self.knight.id).update(title='The Dark Knight Rises')
+        self.assertEqual(self.titles('knig')[0], 'The Dark Knight')
+
+        later = time.monotonic() + autocomplete.MAX_AGE + 1
+        with mock.patch.object(autocomplete.time, 'monotonic', return_value=later):
+            self.assertEqual(self.titles('knig')[0], 'The Dark Knight Rises')
+
+
+class TasteProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='alice')
+        cls.movies = [Movie.objects.create(title=f'Movie {n}') for n in range(6)]
+
+    def setUp(self):
+        features = np.random.default_rng(7).random((len(self.movies), 8))
+        self.bundle = SimpleNamespace(
+            version='test', engine=RecommendationEngine(features),
+            row_for_id={movie.id: row for row, movie in enumerate(self.movies)},
+        )
+        patcher = mock.patch('ai.profiles.get_bundle', return_value=self.bundle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rate(self, movie, value):
+        response = self.client.post(f'/api/movie/{movie.id}/rate/', {'username': 'alice', 'rating': value})
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def assertMatchesRebuild(self):
+        profile = UserTasteProfile.objects.get(user=self.user)
+        counts = (profile.liked_count, profile.disliked_count)
+        sums = [np.frombuffer(bytes(profile.liked_sum)), np.frombuffer(bytes(profile.disliked_sum))]
+
+        rebuilt = profiles._rebuild(profile, self.bundle)
+        self.assertEqual(counts, (rebuilt.liked_count, rebuilt.disliked_count))
+        np.testing.assert_allclose(sums[0], np.frombuffer(bytes(rebuilt.liked_sum)), atol=1e-6)
+        np.testing.assert_allclose(sums[1], np.frombuffer(bytes(rebuilt.disliked_sum)), atol=1e-6)
+
+    def test_incremental_updates_match_a_full_rebuild(self):
+        self.client.force_login(self.user)
+        self.rate(self.movies[0], 5)
+        self.assertIsNotNone(profiles.get_profile_vector(self.user.id))
+
+        self.rate(self.movies[1], 5)
+        self.rate(self.movies[2], 2)
+        self.rate(self.movies[3], 4)
+        self.assertMatchesRebuild()
+
+        # Re-ratings that cross the like threshold both ways, and one that does not
+        self.rate(self.movies[0], 1)
+        self.rate(self.movies[2], 5)
+        self.rate(self.movies[3], 3)
+        self.assertMatchesRebuild()
+
+        Ratings.objects.get(user=self.user, movie=self.movies[1]).delete()
+        self.movies[2].delete()
+        self.assertMatchesRebuild()
+
+        Ratings.objects.create(user=self.user, movie=self.movies[4], rating=5)
+        self.assertMatchesRebuild()
+        profile = UserTasteProfile.objects.get(user=self.user)
+        self.assertEqual((profile.liked_count, profile.disliked_count), (1, 2))
+
+
+class PrecomputeRecommendationsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [CustomUser.objects.create(username=f'user{n}', email=f'user{n}@example.com') for n in range(4)]
+        cls.movies = [Movie.objects.create(title=f'Movie {n}') for n in range(12)]
+
+    def setUp(self):
+        features = np.random.default_rng(9).random((len(self.movies), 8))
+        self.bundle = SimpleNamespace(
+            engine=RecommendationEngine(features),
+            movie_ids=np.array([movie.id for movie in self.movies]),
+            row_for_id={movie.id: row for row, movie in enumerate(self.movies)},
+        )
+        patcher = mock.patch('api.management.commands.precompute_recommendations.get_bundle',
+                             return_value=self.bundle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rate(self, user, ratings):
+        Ratings.objects.filter(user=user).delete()
+        for row, value in ratings.items():
+            Ratings.objects.create(user=user, movie=self.movies[row], rating=value)
+
+    def precompute(self, **options):
+        call_command('precompute_recommendations', top_k=3, stdout=StringIO(), **options)
+
+    def stored(self, user):
+        return list(RecommendedMovies.objects.filter(user=user).order_by('-score').values_list('movie_id', flat=True))
+
+    def expected(self, liked, disliked=()):
+        rows, _ = self.bundle.engine.recommend(liked, disliked, k=3)
+        return [self.movies[row].id for row in rows]
+
+    def test_batch_scores_match_single_user_recommendations(self):
+        self.rate(self.users[0], {0: 5, 1: 5, 2: 1})
+        self.rate(self.users[1], {3: 5})
+        self.rate(self.users[2], {4: 1})
+        for chunk_size in (1, 3):
+            self.precompute(chunk_size=chunk_size)
+            self.assertEqual(self.stored(self.users[0]), self.expected([0, 1], [2]))
+            self.assertEqual(self.stored(self.users[1]), self.expected([3]))
+            # Only dislikes: no profile to score
+            self.assertEqual(self.stored(self.users[2]), [])
+
+    def test_rerun_replaces_recommendations_that_dropped_out(self):
+        self.rate(self.users[0], {0: 5})
+        self.precompute()
+        self.rate(self.users[0], {7: 5, 8: 5})
+        self.precompute()
+        self.assertEqual(self.stored(self.users[0]), self.expected([7, 8]))
+
+    def test_shards_split_the_users(self):
+        for user in self.users:
+            self.rate(user, {0: 5})
+        self.precompute(shard=1, shards=2)
+        self.assertEqual(
+            set(RecommendedMovies.objects.values_list('user_id', flat=True)),
+            {user.id for user in self.users if user.id % 2 == 1},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecommendationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bundle = SimpleNamespace(version='model-1')
+        patcher = mock.patch('api.recommendation_cache.get_bundle', return_value=self.bundle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = 0
+
+    def compute(self, cacheable=True):
+        self.calls += 1
+        return {'movies': [self.calls]}, cacheable
+
+    def test_warm_hit_makes_no_queries(self):
+        first = cached_recommendations('ratings', 1, self.compute)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_recommendations('ratings', 1, self.compute), first)
+        self.assertEqual(self.calls, 1)
+
+    def test_ratings_or_model_version_change_recomputes(self):
+        cached_recommendations('ratings', 1, self.compute)
+        cached_recommendations('ratings', 2, self.compute)
+        bump_ratings_version(1)
+        self.assertEqual(cached_recommendations('ratings', 1, self.compute), {'movies': [3]})
+        # The other user's entry is untouched
+        self.assertEqual(cached_recommendations('ratings', 2, self.compute), {'movies': [2]})
+
+        self.bundle.version = 'model-2'
+        self.assertEqual(cached_recommendations('ratings', 2, self.compute), {'movies': [4]})
+
+    def test_uncacheable_results_are_not_stored(self):
+        cached_recommendations('ratings', 1, lambda: self.compute(cacheable=False))
+        self.assertEqual(cached_recommendations('ratings', 1, self.compute), {'movies': [2]})
+
+    def test_cold_entry_is_computed_once_by_concurrent_requests(self):
+        def slow():
+            time.sleep(0.2)
+            return self.compute()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cached_recommendations('ratings', 1, slow)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'movies': [1]}] * 5)
+
+    def test_waiter_computes_without_caching_when_the_lock_is_never_released(self):
+        version = ratings_version(1)
+        cache.add(f'recs:ratings:1:lock:{version}:model-1', 1)
+        with mock.patch('api.recommendation_cache.LOCK_WAIT', 0.1):
+            self.assertEqual(cached_recommendations('ratings', 1, self.compute), {'movies': [1]})
+            self.assertEqual(cached_recommendations('ratings', 1, self.compute), {'movies': [2]})
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [CustomUser.objects.create(username=f'user{n}', email=f'user{n}@example.com') for n in range(4)]
+        cls.movies = [Movie.objects.create(title=f'Movie {n}') for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+
+    def buckets(self):
+        return sorted(MovieRatingBucket.objects.values_list('movie_id', 'hour', 'count'))
+
+    def test_new_ratings_fill_hourly_buckets(self):
+        for user in self.users[:3]:
+            Ratings.objects.create(user=user, movie=self.movies[0], rating=4)
+        rating = Ratings.objects.create(user=self.users[0], movie=self.movies[1], rating=2)
+        # Changing a rating is not a new rating
+        rating.rating = 5
+        rating.save()
+
+        hour = trending.current_hour()
+        self.assertEqual(self.buckets(), [(self.movies[0].id, hour, 3), (self.movies[1].id, hour, 1)])
+
+        # The backfill rebuilds the same buckets from Ratings.created_at
+        recorded = self.buckets()
+        MovieRatingBucket.objects.all().delete()
+        trending.backfill_buckets()
+        self.assertEqual(self.buckets(), recorded)
+
+    def test_deleted_ratings_leave_their_bucket(self):
+        ratings = [Ratings.objects.create(user=user, movie=self.movies[0], rating=4) for user in self.users[:2]]
+        Ratings.objects.create(user=self.users[0], movie=self.movies[1], rating=3).delete()
+        ratings[0].delete()
+
+        self.assertEqual(self.buckets(), [(self.movies[0].id, trending.current_hour(), 1)])
+        self.assertEqual(trending.rebuild_trending()['ids'], [self.movies[0].id])
+
+    def test_older_ratings_decay_and_leave_the_window(self):
+        def record(movie, count, hours_ago):
+            for _ in range(count):
+                trending.record_rating(movie.id, self.now - timedelta(hours=hours_ago))
+
+        # 4 ratings two half-lives ago weigh 1, less than 2 fresh ones
+        record(self.movies[0], 4, 2 * trending.HALF_LIFE_HOURS)
+        record(self.movies[1], 2, 0)
+        record(self.movies[2], 50, trending.WINDOW_HOURS + 2)
+
+        entry = trending.rebuild_trending(now=self.now)
+        self.assertEqual(entry['ids'], [self.movies[1].id, self.movies[0].id])
+        self.assertAlmostEqual(entry['scores'][1], 1.0, delta=0.05)
+        self.assertFalse(MovieRatingBucket.objects.filter(movie=self.movies[2]).exists())
+
+    def test_list_is_read_from_the_cache_and_refreshed_when_stale(self):
+        trending.record_rating(self.movies[0].id)
+        call_command('refresh_trending', stdout=StringIO())
+        self.assertEqual(trending.trending_list()['ids'], [self.movies[0].id])
+
+        trending.record_rating(self.movies[1].id)
+        trending.record_rating(self.movies[1].id)
+        self.assertEqual(trending.trending_list()['ids'], [self.movies[0].id])
+
+        entry = cache.get(trending.TRENDING_KEY)
+        entry['built_at'] -= trending.REFRESH_INTERVAL + 1
+        cache.set(trending.TRENDING_KEY, entry, None)
+        self.assertEqual(trending.trending_list()['ids'], [self.movies[1].id, self.movies[0].id])
+
+    def test_missing_list_is_rebuilt_by_one_request(self):
+        trending.record_rating(self.movies[0].id)
+        # Another request holds the lock and finishes while this one waits
+        cache.add(trending.REBUILD_LOCK_KEY, 1)
+        other_request = trending.rebuild_trending
+        with mock.patch('api.trending.time.sleep', lambda seconds: other_request()), \
+                mock.patch('api.trending.rebuild_trending') as rebuild:
+            self.assertEqual(trending.trending_list()['ids'], [self.movies[0].id])
+        rebuild.assert_not_called()
+
+    def test_missing_list_is_empty_while_another_request_is_slow_to_build_it(self):
+        cache.add(trending.REBUILD_LOCK_KEY, 1)
+        with mock.patch('api.trending.REBUILD_WAIT', 0.1), mock.patch('api.trending.rebuild_trending') as rebuild:
+            self.assertEqual(trending.trending_list()['ids'], [])
+        rebuild.assert_not_called()
+
+    def test_sample_is_distinct_and_from_the_list(self):
+        for n, movie in enumerate(self.movies):
+            for _ in range(n + 1):
+                trending.record_rating(movie.id)
+        picked = trending.sample_trending(2, rng=np.random.default_rng(1))
+        self.assertEqual(len(set(picked)), 2)
+        self.assertLessEqual(set(picked), {movie.id for movie in self.movies})
+        self.assertEqual(sorted(trending.sample_trending(10)), sorted(movie.id for movie in self.movies))
+
+
+class StubTMDB:
+    """
+    Local stand-in for the TMDB API that answers every request after
+    `latency` seconds and records the paths it was asked for. Statuses put
+    in `failures` are answered first, one per request.
+    """
+    MOVIE = {
+        'id': 550, 'title': 'Fight Club', 'overview': 'An insomniac office worker...',
+        'poster_path': '/fight.jpg', 'release_date': '1999-10-15', 'vote_average': 8.4,
+        'genres': [{'id': 18, 'name': 'Drama'}],
+    }
+    CREDITS = {
+        'crew': [{'job': 'Director', 'name': 'David Fincher'}],
+        'cast': [{'name': 'Brad Pitt'}, {'name': 'Edward Norton'}],
+    }
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.paths = []
+        self.failures = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.paths.append(self.path)
+                time.sleep(stub.latency)
+                if stub.failures:
+                    status, body = stub.failures.pop(0), {'status_message': 'Try again later.'}
+                else:
+                    status, body = stub.respond(urlsplit(self.path))
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '1')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def respond(self, url):
+        if url.path == '/search/movie':
+            if 'fight' not in url.query.lower():
+                return 200, {'results': []}
+            return 200, {'results': [{'id': 550, 'title': 'Fight Club', 'poster_path': '/fight.jpg'}]}
+        if url.path == '/movie/550':
+            movie = dict(self.MOVIE)
+            if 'append_to_response=credits' in url.query:
+                movie['credits'] = self.CREDITS
+            return 200, movie
+        if url.path == '/movie/550/credits':
+            return 200, self.CREDITS
+        return 404, {'status_message': 'The resource you requested could not be found.'}
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TMDBFetchTests(TestCase):
+    LATENCY = 0.2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='alice')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def fetch(self, url):
+        with StubTMDB(self.LATENCY) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            started = time.monotonic()
+            response = self.client.get(url)
+            return response, time.monotonic() - started, stub.paths
+
+    def test_movie_by_id_takes_one_round_trip(self):
+        response, elapsed, paths = self.fetch('/api/fetchMovieInfo/550/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(paths), 1)
+        self.assertLess(elapsed, 2 * self.LATENCY)
+        detail = response.json()
+        self.assertEqual((detail['director'], detail['star1'], detail['star2']),
+                         ('David Fincher', 'Brad Pitt', 'Edward Norton'))
+        self.assertEqual(detail['poster_url'], 'https://image.tmdb.org/t/p/w500/fight.jpg')
+        self.assertEqual(Movie.objects.get(id=550).genre_names, ['Drama'])
+
+    def test_genres_match_ours_by_name_whatever_their_id(self):
+        # Our ids come from the catalog import, not TMDB: 18 is taken by another genre
+        Genre.objects.create(id=18, name='Western')
+        response, elapsed, paths = self.fetch('/api/fetchMovieInfo/550/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['genres'], ['Drama'])
+        self.assertEqual(Genre.objects.get(id=18).name, 'Western')
+        drama = Genre.objects.get(name='Drama')
+        self.assertEqual(list(Movie.objects.get(id=550).genres.all()), [drama])
+
+        Movie.objects.filter(id=550).delete()
+        self.fetch('/api/fetchMovieInfo/550/')
+        self.assertEqual(Genre.objects.filter(name='Drama').count(), 1)
+
+    def test_movie_by_title_searches_then_fetches_once(self):
+        response, elapsed, paths = self.fetch('/api/fetchMovieInfo/fight%20club/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([urlsplit(path).path for path in paths], ['/search/movie', '/movie/550'])
+        self.assertLess(elapsed, 3 * self.LATENCY)
+        self.assertEqual(response.json()['director'], 'David Fincher')
+
+    def test_poster_comes_from_the_search_result(self):
+        response, elapsed, paths = self.fetch('/api/getMoviePoster/fight%20club/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(response.json()['poster_url'], 'https://image.tmdb.org/t/p/w500/fight.jpg')
+
+    def test_unknown_movie_is_a_404(self):
+        response, elapsed, paths = self.fetch('/api/fetchMovieInfo/999/')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(paths), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MovieDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='alice')
+        cls.alien = Movie.objects.create(title='Alien', imdb_rating=8.5)
+        cls.aliens = Movie.objects.create(title='Aliens', imdb_rating=7.0)
+        cls.planet = Movie.objects.create(title='Planet of the Aliens', imdb_rating=9.0)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_is_cached_until_the_movie_changes(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(movie_detail(self.alien.id)['title'], 'Alien')
+        with self.assertNumQueries(0):
+            movie_detail(self.alien.id)
+
+        self.alien.our_rating = 4.5
+        self.alien.save()
+        self.assertEqual(movie_detail(self.alien.id)['our_rating'], 4.5)
+
+        self.alien.genres.add(Genre.objects.create(id=27, name='Horror'))
+        self.assertEqual(movie_detail(self.alien.id)['genres'], ['Horror'])
+
+        Movie.objects.filter(id=self.aliens.id).delete()
+        self.assertIsNone(movie_detail(self.aliens.id))
+
+    def test_title_lookup_prefers_exact_then_prefix_then_partial_matches(self):
+        # An exact title wins over better rated titles that merely start with it
+        self.assertEqual(find_movie_id('ALIEN!'), self.alien.id)
+        self.assertEqual(find_movie_id('alie'), self.alien.id)
+        self.assertEqual(find_movie_id('lien'), self.planet.id)
+        self.assertIsNone(find_movie_id('predator'))
+        self.assertIsNone(find_movie_id(' ? '))
+
+    def test_numeric_queries_are_ids_before_titles(self):
+        Movie.objects.create(title='1917', imdb_rating=8.2)
+        other = Movie.objects.create(id=1917, title='Something Else')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/fetchMovieInfo/1917/').json()['id'], other.id)
+
+
+class TMDBResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_ = TMDBClient(breaker=CircuitBreaker(threshold=1, cooldown=60))
+
+    def test_repeated_lookups_stay_local(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            for _ in range(3):
+                self.assertEqual(self.client_.search_movie('Fight  Club!')['id'], 550)
+                self.assertEqual(self.client_.movie_with_credits(550)['credits'], StubTMDB.CREDITS)
+            self.assertEqual(len(stub.paths), 2)
+
+            # The table serves other processes, whose local cache is empty
+            cache.clear()
+            self.assertEqual(self.client_.search_movie('fight club')['id'], 550)
+            self.assertEqual(len(stub.paths), 2)
+
+    def test_misses_are_cached_briefly(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            self.assertIsNone(self.client_.movie(999))
+            self.assertIsNone(self.client_.movie(999))
+            self.assertEqual(len(stub.paths), 1)
+
+        entry = TMDBResponse.objects.get(kind='movie', key='999')
+        self.assertIsNone(entry.data)
+        self.assertLessEqual(entry.expires_at - entry.fetched_at, NEGATIVE_TTL)
+
+    def test_rejected_requests_are_not_cached_as_misses(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            stub.failures = [401]
+            with self.assertRaises(TMDBRejected), self.assertLogs('api.tmdb', 'ERROR'):
+                self.client_.movie(550)
+            self.assertFalse(TMDBResponse.objects.exists())
+
+            # Once the key is fixed the movie is found
+            self.client_.breaker.record_success()
+            self.assertEqual(self.client_.movie(550)['title'], 'Fight Club')
+
+    def test_expired_entries_are_served_when_tmdb_is_down(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            self.client_.movie(550)
+        TMDBResponse.objects.update(expires_at=TMDBResponse.objects.get().fetched_at)
+        cache.clear()
+
+        with override_settings(TMDB_BASE_URL='http://127.0.0.1:9'):
+            self.assertEqual(self.client_.movie(550)['title'], 'Fight Club')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+
+    def test_one_trial_after_the_cooldown(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        # Only one trial at a time while half-open
+        self.assertFalse(breaker.allow())
+        # A failed trial re-opens it at once
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+
+class TMDBClientTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=2, cooldown=60)
+        self.client_ = TMDBClient(breaker=self.breaker)
+        self.sleeps = []
+        # Record backoff sleeps instead of waiting them out
+        patcher = mock.patch('api.tmdb.time.sleep', side_effect=self.sleeps.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_server_errors(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            stub.failures = [503, 502]
+            self.assertEqual(self.client_.get('movie/550')['title'], 'Fight Club')
+            self.assertEqual(len(stub.paths), 3)
+        self.assertFalse(self.breaker.is_open)
+
+    def test_rate_limits_wait_for_retry_after(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            stub.failures = [429]
+            self.assertEqual(self.client_.get('movie/550')['id'], 550)
+        self.assertIn(1.0, self.sleeps)
+
+    def test_client_errors_are_not_retried(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            self.assertIsNone(self.client_.get('movie/999'))
+            self.assertEqual(len(stub.paths), 1)
+
+    def test_rejected_requests_raise_and_count_against_the_breaker(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            stub.failures = [401, 403]
+            for _ in range(2):
+                with self.assertRaises(TMDBRejected), self.assertLogs('api.tmdb', 'ERROR'):
+                    self.client_.get('movie/550')
+            self.assertEqual(len(stub.paths), 2)
+        self.assertTrue(self.breaker.is_open)
+
+    def test_gives_up_and_opens_the_breaker(self):
+        with StubTMDB(latency=0) as stub, override_settings(TMDB_BASE_URL=stub.url):
+            stub.failures = [500] * (2 * (MAX_RETRIES + 1))
+            for _ in range(2):
+                with self.assertRaises(TMDBUnavailable), self.assertLogs('api.tmdb', 'WARNING'):
+                    self.client_.get('movie/550')
+            self.assertEqual(len(stub.paths), 2 * (MAX_RETRIES + 1))
+
+            # Open: fails fast without calling TMDB
+            with self.assertRaises(TMDBUnavailable):
+                self.client_.get('movie/550')
+            self.assertEqual(len(stub.paths), 2 * (MAX_RETRIES + 1))
+
+    def test_connection_errors_do_not_leak_the_api_key(self):
+        with mock.patch.dict('os.environ', {'TMDB_API_KEY': 'not-a-real-key'}), \
+                override_settings(TMDB_BASE_URL='http://127.0.0.1:9'):
+            with self.assertRaises(TMDBUnavailable) as raised, self.assertLogs('api.tmdb', 'WARNING') as logs:
+                self.client_.get('movie/550')
+        self.assertNotIn('not-a-real-key', str(raised.exception))
+        self.assertNotIn('not-a-real-key', ''.join(logs.output))
+        self.assertEqual(len(self.sleeps), MAX_RETRIES)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SingleFlightTests(TestCase):
+    def run_concurrently(self, count, fn):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(single_flight('title:fight club', fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'id': 550}
+
+        results, errors = self.run_concurrently(8, fetch)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'id': 550}] * 8)
+        self.assertEqual(errors, [])
+
+    def test_concurrent_callers_share_the_error(self):
+        def fetch():
+            time.sleep(0.2)
+            raise ValueError('upstream failed')
+
+        results, errors = self.run_concurrently(4, fetch)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(len({id(error) for error in errors}), 1)
+
+    def test_waits_for_another_worker_holding_the_lock(self):
+        cache.add(_lock_key('title:fight club'), 1)
+        threading.Timer(0.2, cache.delete, [_lock_key('title:fight club')]).start()
+
+        started = time.monotonic()
+        self.assertEqual(single_flight('title:fight club', lambda: 'fetched'), 'fetched')
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+
+class SharedLockTests(TestCase):
+    """
+    single_flight against the shared (database) cache from settings.CACHES
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lock_is_held_in_the_shared_cache_while_running(self):
+        held = []
+        single_flight('title:heat', lambda: held.append(cache.get(_lock_key('title:heat'))))
+        self.assertEqual(held, [1])
+        self.assertIsNone(cache.get(_lock_key('title:heat')))
+
+    def test_waits_for_a_lock_held_elsewhere(self):
+        # As if another worker were running it and then died holding the lock
+        cache.add(_lock_key('title:heat'), 1)
+        with mock.patch.object(coalesce, 'WAIT_TIMEOUT', 0.3):
+            started = time.monotonic()
+            self.assertEqual(single_flight('title:heat', lambda: 'fetched'), 'fetched')
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+
+class BackfillPostersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.state_file = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        Path(self.state_file).unlink()
+        self.addCleanup(Path(self.state_file).unlink, missing_ok=True)
+        self.empty = Movie.objects.create(title='Fight Club')
+        self.relative = Movie.objects.create(title='Heat', poster_url='/heat.jpg')
+        self.absolute = Movie.objects.create(title='Alien', poster_url='https://example.com/alien.jpg')
+        self.unknown = Movie.objects.create(title='Nothing On TMDB')
+
+    def backfill(self, stub, **options):
+        with override_settings(TMDB_BASE_URL=stub.url):
+            call_command('backfill_posters', state_file=self.state_file, rate=1000, workers=2,
+                         stdout=StringIO(), **options)
+
+    def poster(self, movie):
+        return Movie.objects.get(id=movie.id).poster_url
+
+    def test_resolves_empty_and_relative_posters(self):
+        with StubTMDB(latency=0) as stub:
+            self.backfill(stub)
+            self.assertEqual(len(stub.paths), 2)
+
+            self.assertEqual(self.poster(self.empty), 'https://image.tmdb.org/t/p/w500/fight.jpg')
+            self.assertEqual(self.poster(self.relative), 'https://image.tmdb.org/t/p/w500/heat.jpg')
+            self.assertEqual(self.poster(self.absolute), 'https://example.com/alien.jpg')
+            self.assertEqual(self.poster(self.unknown), '')
+            self.assertFalse(Path(self.state_file).exists())
+
+            # Titles TMDB does not have are remembered, so a rerun stays local
+            self.backfill(stub)
+            self.assertEqual(len(stub.paths), 2)
+
+    def test_resumes_after_the_last_finished_batch(self):
+        with StubTMDB(latency=0) as stub:
+            self.backfill(stub, limit=1, batch_size=1)
+            self.assertEqual(json.loads(Path(self.state_file).read_text()), {'last_id': self.empty.id})
+            self.assertEqual(self.poster(self.relative), '/heat.jpg')
+
+            self.backfill(stub, batch_size=1)
+            self.assertEqual(self.poster(self.relative), 'https://image.tmdb.org/t/p/w500/heat.jpg')
+            # The first run's movie was not looked up again
+            self.assertEqual(len(stub.paths), 2)
+            self.assertFalse(Path(self.state_file).exists())
+
+    def test_rate_limit_spaces_out_lookups(self):
+        Movie.objects.bulk_create([Movie(title=f'Fight Club {n}') for n in range(4)])
+        with StubTMDB(latency=0) as stub:
+            started = time.monotonic()
+            with override_settings(TMDB_BASE_URL=stub.url):
+                call_command('backfill_posters', state_file=self.state_file, rate=20, workers=4, stdout=StringIO())
+            # Six lookups at 20 per second: the last one starts at least 0.25 s in
+            self.assertGreaterEqual(time.monotonic() - started, 0.25)
+            self.assertEqual(len(stub.paths), 6)
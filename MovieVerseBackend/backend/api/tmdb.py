@@ -0,0 +1,291 @@
+"""
+Client for the TMDB API.
+
+Every outbound TMDB call goes through `tmdb`, which keeps one pooled
+keep-alive session per process, bounds each attempt with connect and read
+timeouts and each call with an overall deadline, retries connection errors,
+429s and 5xx responses with jittered exponential backoff, and trips a circuit
+breaker after repeated failures so a stalled upstream fails fast instead of
+tying up workers. Responses are kept in the persistent cache of
+api.tmdb_cache, misses included, so repeated lookups stay local.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .coalesce import single_flight
+from .search import normalize
+from .tmdb_cache import MISSING, tmdb_cache
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://api.themoviedb.org/3"
+IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5
+# Total time one call may spend across its attempts and backoff sleeps
+DEADLINE = 10
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2
+POOL_SIZE = 20
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Consecutive failed calls that open the breaker, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+
+
+class TMDBUnavailable(requests.exceptions.RequestException):
+    """
+    TMDB could not be reached or kept failing, or the circuit breaker is open
+    """
+
+
+class TMDBRejected(TMDBUnavailable):
+    """
+    TMDB refused the request itself (400, 401, 403...): a bad or expired API
+    key or a malformed request, not a movie TMDB does not have
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures; once `cooldown` seconds
+    have passed, one trial call is let through (half-open) and its outcome
+    closes or re-opens the breaker
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= self.threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """
+    Full-jitter exponential backoff before retry number `attempt` (from 0)
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TMDBClient:
+    def __init__(self, base_url=None, breaker=None):
+        self._base_url = base_url
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        # Read on every call so tests can point the client at a stand-in server
+        return (self._base_url or getattr(settings, 'TMDB_BASE_URL', None) or BASE_URL).rstrip('/')
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers['accept'] = 'application/json'
+                    self._session = session
+        return self._session
+
+    def _auth(self, params):
+        headers = {}
+        bearer_token = os.getenv("TMDB_BEARER_TOKEN")
+        api_key = os.getenv("TMDB_API_KEY")
+        if bearer_token:
+            headers['Authorization'] = f"Bearer {bearer_token}"
+        if api_key:
+            params = {'api_key': api_key, **params}
+        return headers, params
+
+    def get(self, path, **params):
+        """
+        JSON body of GET `path`, or None if TMDB answers 404. Raises
+        TMDBRejected for any other client error, and TMDBUnavailable when
+        TMDB cannot be reached, keeps failing after the retries, or the
+        breaker is open.
+        """
+        if not self.breaker.allow():
+            raise TMDBUnavailable("TMDB circuit breaker is open")
+
+        headers, params = self._auth(params)
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        deadline = time.monotonic() + DEADLINE
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            response = None
+            try:
+                response = self.session.get(
+                    url, params=params, headers=headers,
+                    timeout=(CONNECT_TIMEOUT, max(0.1, min(READ_TIMEOUT, remaining))),
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # Not str(e): it contains the URL, and with it the api_key
+                error = type(e).__name__
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code == 404:
+                        self.breaker.record_success()
+                        return None
+                    if response.status_code >= 400:
+                        # Every call would fail the same way, so this counts against the breaker
+                        self.breaker.record_failure()
+                        logger.error("TMDB rejected GET %s with HTTP %d; check TMDB_API_KEY / TMDB_BEARER_TOKEN",
+                                     path, response.status_code)
+                        raise TMDBRejected(f"TMDB rejected the request: HTTP {response.status_code}")
+                    try:
+                        data = response.json()
+                    except ValueError:
+                        self.breaker.record_failure()
+                        raise TMDBUnavailable("TMDB returned a response that is not JSON")
+                    self.breaker.record_success()
+                    return data
+                error = f"HTTP {response.status_code}"
+
+            delay = backoff_delay(attempt)
+            if response is not None and response.status_code == 429:
+                # Respect the rate limiter's hint, within the same caps
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = min(BACKOFF_MAX, float(retry_after))
+            if attempt >= MAX_RETRIES or time.monotonic() + delay >= deadline:
+                self.breaker.record_failure()
+                logger.warning("TMDB GET %s failed after %d attempts: %s", path, attempt + 1, error)
+                raise TMDBUnavailable(f"TMDB request failed: {error}")
+            time.sleep(delay)
+            attempt += 1
+
+    def cached_get(self, kind, key, path, trim=None, **params):
+        """
+        `get` through the persistent response cache under (kind, key),
+        coalescing concurrent misses. `trim` reduces the payload before it is stored; a falsy result is
+        cached as a miss. Only a 404 or an empty result is a miss: rejected
+        requests are never cached. If TMDB is unavailable, an expired entry
+        is served rather than failing.
+        """
+        data = tmdb_cache.get(kind, key)
+        if data is not MISSING:
+            return data
+
+        def fetch():
+            # Concurrent callers for the same entry share one upstream request
+            data = tmdb_cache.get(kind, key)
+            if data is not MISSING:
+                return data
+            try:
+                data = self.get(path, **params)
+            except TMDBUnavailable:
+                data = tmdb_cache.get(kind, key, stale=True)
+                if data is MISSING:
+                    raise
+                return data
+            if trim is not None and data is not None:
+                data = trim(data) or None
+            tmdb_cache.set(kind, key, data)
+            return data
+
+        return single_flight(f'tmdb:{kind}:{key}', fetch)
+
+    def search_movie(self, query):
+        """
+        First TMDB search result for `query`, or None
+        """
+        data = self.cached_get('search', search_key(query), 'search/movie', trim=trim_search, query=query)
+        return first_result(data)
+
+    def movie(self, tmdb_id):
+        return self.cached_get('movie', str(tmdb_id), f'movie/{tmdb_id}')
+
+    def credits(self, tmdb_id):
+        return self.cached_get('credits', str(tmdb_id), f'movie/{tmdb_id}/credits')
+
+    def movie_with_credits(self, tmdb_id):
+        """
+        Movie details with the credits embedded under 'credits', in one round trip
+        """
+        return self.cached_get('movie_credits', str(tmdb_id), f'movie/{tmdb_id}', append_to_response='credits')
+
+
+def search_key(query):
+    return normalize(query)[:255]
+
+
+def trim_search(data):
+    # Only the first result is ever used, so only it is stored
+    return {'results': data['results'][:1]} if data.get('results') else None
+
+
+def first_result(data):
+    results = (data or {}).get('results') or []
+    return results[0] if results else None
+
+
+def poster_url(poster_path):
+    return f"{IMAGE_BASE_URL}{poster_path}" if poster_path else ""
+
+
+def movie_fields(movie_data):
+    """
+    Movie model fields from a movie_with_credits payload
+    """
+    credits_data = movie_data.get("credits") or {}
+    director = next((person["name"] for person in credits_data.get("crew", [])
+                     if person.get("job", "").lower() == "director"), "Unknown")
+    cast = credits_data.get("cast", [])
+    return {
+        'id': movie_data["id"],
+        'title': movie_data.get("title", "Unknown"),
+        'description': movie_data.get("overview", ""),
+        'director': director,
+        'star1': cast[0]["name"] if len(cast) > 0 else "Unknown",
+        'star2': cast[1]["name"] if len(cast) > 1 else "Unknown",
+        'poster_url': poster_url(movie_data.get("poster_path")),
+        'release_date': movie_data.get("release_date") or None,
+        'imdb_rating': movie_data.get("vote_average", 0.0),
+    }
+
+
+tmdb = TMDBClient()
@@ -0,0 +1,100 @@
+"""
+Persistent cache of TMDB responses.
+
+Entries live in the TMDBResponse table, keyed by kind and normalized query
+or TMDB id, with a TTL per kind. Misses are cached too, for NEGATIVE_TTL,
+so titles TMDB does not have are not searched again on every request. A
+copy in Django's cache answers repeated lookups without reading the table;
+that is only cheaper than the table with Redis as the cache (see CACHES in
+settings). The table is kept under MAX_ENTRIES by pruning expired rows,
+then the oldest ones, every PRUNE_EVERY writes.
+"""
+import hashlib
+import itertools
+import threading
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import TMDBResponse
+
+TTLS = {
+    'search': timedelta(days=1),
+    'movie': timedelta(days=7),
+    'credits': timedelta(days=7),
+    'movie_credits': timedelta(days=7),
+}
+NEGATIVE_TTL = timedelta(hours=1)
+LOCAL_TIMEOUT = 10 * 60
+MAX_ENTRIES = 50000
+PRUNE_EVERY = 200
+
+MISSING = object()
+
+
+def _local_key(kind, key):
+    return f'tmdb:{kind}:{hashlib.sha1(key.encode()).hexdigest()}'
+
+
+class TMDBResponseCache:
+    def __init__(self):
+        self._writes = itertools.count(1)
+        self._prune_lock = threading.Lock()
+
+    def get(self, kind, key, stale=False):
+        """
+        Cached data for (kind, key): None for a cached miss, MISSING if
+        nothing is cached. With `stale`, expired entries are returned too.
+        """
+        if not stale:
+            entry = cache.get(_local_key(kind, key))
+            if entry is not None:
+                return entry['data']
+
+        row = TMDBResponse.objects.filter(kind=kind, key=key).values('data', 'expires_at').first()
+        if row is None:
+            return MISSING
+        remaining = (row['expires_at'] - timezone.now()).total_seconds()
+        if remaining <= 0 and not stale:
+            return MISSING
+        if remaining > 0:
+            cache.set(_local_key(kind, key), {'data': row['data']}, min(LOCAL_TIMEOUT, remaining))
+        return row['data']
+
+    def set(self, kind, key, data, negative=False):
+        ttl = NEGATIVE_TTL if negative or data is None else TTLS[kind]
+        expires_at = timezone.now() + ttl
+        values = {'data': data, 'expires_at': expires_at}
+        try:
+            with transaction.atomic():
+                TMDBResponse.objects.update_or_create(kind=kind, key=key, defaults=values)
+        except IntegrityError:
+            # Another request stored the same response first
+            TMDBResponse.objects.filter(kind=kind, key=key).update(**values)
+        cache.set(_local_key(kind, key), {'data': data}, min(LOCAL_TIMEOUT, ttl.total_seconds()))
+
+        if next(self._writes) % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self, max_entries=MAX_ENTRIES):
+        """
+        Delete expired entries, then the oldest ones beyond `max_entries`
+        """
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            TMDBResponse.objects.filter(expires_at__lte=timezone.now()).delete()
+            cutoff = (
+                TMDBResponse.objects.order_by('-fetched_at', '-id')
+                .values_list('fetched_at', flat=True)[max_entries:max_entries + 1]
+                .first()
+            )
+            if cutoff is not None:
+                TMDBResponse.objects.filter(fetched_at__lte=cutoff).delete()
+        finally:
+            self._prune_lock.release()
+
+
+tmdb_cache = TMDBResponseCache()
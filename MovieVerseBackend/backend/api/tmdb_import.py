@@ -0,0 +1,91 @@
+"""
+Importing movies we do not have yet from TMDB.
+
+Both entry points are coalesced (see api.coalesce): when a new title trends,
+concurrent requests for it share one TMDB search and one detail fetch, and
+only one of them inserts the Movie row.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from .coalesce import single_flight
+from .details import build_detail, movie_detail
+from .models import Genre, Movie
+from .search import normalize
+from .tmdb import movie_fields, tmdb
+
+
+def tmdb_genre(genre_data):
+    """
+    Our Genre for a TMDB genre. The catalog's genres were loaded with their
+    own ids, so an existing genre is matched by name; a new one keeps TMDB's
+    id unless that id already belongs to a different genre.
+    """
+    name = genre_data["name"]
+    genre = Genre.objects.filter(name=name).order_by('id').first()
+    if genre is not None:
+        return genre
+    genre_id = genre_data.get("id")
+    if genre_id is None or Genre.objects.filter(id=genre_id).exists():
+        genre_id = (Genre.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+    try:
+        with transaction.atomic():
+            return Genre.objects.create(id=genre_id, name=name)
+    except IntegrityError:
+        # Another import created it (or took the id) meanwhile
+        genre = Genre.objects.filter(name=name).order_by('id').first()
+        if genre is None:
+            raise
+        return genre
+
+
+def save_tmdb_movie(movie_data):
+    """
+    Store a movie_with_credits payload from TMDB as a Movie and return its detail
+    """
+    new_movie = Movie(**movie_fields(movie_data))
+    try:
+        with transaction.atomic():
+            new_movie.save(force_insert=True)
+
+            genres = []
+            for genre_data in movie_data.get("genres", []):
+                genre = tmdb_genre(genre_data)
+                new_movie.genres.add(genre)
+                genres.append(genre.name)
+    except IntegrityError:
+        # Another worker inserted it first
+        detail = movie_detail(new_movie.id)
+        if detail is None:
+            raise
+        return detail
+
+    return build_detail(new_movie, genres)
+
+
+def import_tmdb_movie(tmdb_id):
+    """
+    Detail of the movie with this TMDB id, importing it first if we do not
+    have it; None if TMDB does not have it either
+    """
+    def fetch():
+        # A coalesced twin in another worker may have stored it meanwhile
+        detail = movie_detail(tmdb_id)
+        if detail is not None:
+            return detail
+        movie_data = tmdb.movie_with_credits(tmdb_id)
+        return save_tmdb_movie(movie_data) if movie_data else None
+
+    return single_flight(f'tmdb-import:{tmdb_id}', fetch)
+
+
+def import_movie_by_title(query):
+    """
+    Detail of TMDB's best match for `query`, importing it if needed; None
+    if TMDB finds nothing
+    """
+    def fetch():
+        first_result = tmdb.search_movie(query)
+        return import_tmdb_movie(first_result['id']) if first_result else None
+
+    return single_flight(f'tmdb-import:title:{normalize(query)}', fetch)
@@ -0,0 +1,159 @@
+"""
+Trending movies from hourly rating counters.
+
+Every new rating increments its movie's MovieRatingBucket for the current
+hour, and deleting it takes it back out of the bucket of the hour it was
+given in. `rebuild_trending` folds the buckets of the last WINDOW_HOURS into an
+exponentially decayed score per movie and stores the ranked list in the
+cache; the endpoint only reads that list. The list is rebuilt by the
+`refresh_trending` command (run it from cron) and, as a safety net, by the
+first request that finds it missing or older than REFRESH_INTERVAL; the
+others keep serving the old list, or wait up to REBUILD_WAIT for a missing
+one and then get an empty list.
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import MovieRatingBucket, Ratings
+
+WINDOW_HOURS = 30 * 24
+HALF_LIFE_HOURS = 72
+LIST_SIZE = 200
+REFRESH_INTERVAL = 10 * 60
+
+TRENDING_KEY = 'trending:list'
+REBUILD_LOCK_KEY = 'trending:rebuild-lock'
+REBUILD_LOCK_TIMEOUT = 60
+REBUILD_WAIT = 2.0
+REBUILD_POLL = 0.05
+
+
+def current_hour(now=None):
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def record_rating(movie_id, when=None):
+    """
+    Count one new rating of the movie in its hourly bucket
+    """
+    hour = current_hour(when)
+    buckets = MovieRatingBucket.objects.filter(movie_id=movie_id, hour=hour)
+    if buckets.update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MovieRatingBucket.objects.create(movie_id=movie_id, hour=hour, count=1)
+    except IntegrityError:
+        # Another request created the bucket first
+        buckets.update(count=F('count') + 1)
+
+
+def unrecord_rating(movie_id, when):
+    """
+    Take a deleted rating, given at `when`, back out of its hourly bucket
+    """
+    buckets = MovieRatingBucket.objects.filter(movie_id=movie_id, hour=current_hour(when))
+    # Emptied buckets are dropped so the movie does not trend with a score of 0
+    if not buckets.filter(count__gt=1).update(count=F('count') - 1):
+        buckets.filter(count__lte=1).delete()
+
+
+def backfill_buckets(now=None):
+    """
+    Rebuild the buckets of the window from Ratings.created_at
+    """
+    start = current_hour(now) - timedelta(hours=WINDOW_HOURS)
+    counts = (
+        Ratings.objects.filter(created_at__gte=start)
+        .annotate(hour=TruncHour('created_at'))
+        .values('movie_id', 'hour')
+        .annotate(count=Count('id'))
+    )
+    with transaction.atomic():
+        MovieRatingBucket.objects.filter(hour__gte=start).delete()
+        MovieRatingBucket.objects.bulk_create(
+            [MovieRatingBucket(movie_id=row['movie_id'], hour=row['hour'], count=row['count']) for row in counts],
+            batch_size=1000,
+        )
+
+
+def decayed_scores(movie_ids, hours_ago, counts, half_life=HALF_LIFE_HOURS):
+    """
+    (movie_ids, scores) with each bucket's count halved every `half_life` hours
+    """
+    weights = np.asarray(counts, dtype=np.float64) * 0.5 ** (np.asarray(hours_ago, dtype=np.float64) / half_life)
+    unique_ids, inverse = np.unique(np.asarray(movie_ids, dtype=np.int64), return_inverse=True)
+    return unique_ids, np.bincount(inverse, weights=weights)
+
+
+def rebuild_trending(now=None, size=LIST_SIZE):
+    """
+    Recompute the ranked trending list, store it in the cache and prune
+    buckets that have left the window
+    """
+    now = now or timezone.now()
+    start = current_hour(now) - timedelta(hours=WINDOW_HOURS)
+    MovieRatingBucket.objects.filter(hour__lt=start).delete()
+
+    rows = list(MovieRatingBucket.objects.filter(hour__gte=start).values_list('movie_id', 'hour', 'count'))
+    ranked_ids, ranked_scores = [], []
+    if rows:
+        movie_ids, hours, counts = zip(*rows)
+        hours_ago = [(now - hour).total_seconds() / 3600 for hour in hours]
+        ids, scores = decayed_scores(movie_ids, hours_ago, counts)
+        top = np.lexsort((ids, -scores))[:size]
+        ranked_ids, ranked_scores = ids[top].tolist(), scores[top].tolist()
+
+    entry = {'ids': ranked_ids, 'scores': ranked_scores, 'built_at': time.time()}
+    cache.set(TRENDING_KEY, entry, None)
+    return entry
+
+
+def trending_list():
+    """
+    The cached ranked list as {'ids', 'scores', 'built_at'}; rebuilt by one
+    request when missing or stale
+    """
+    entry = cache.get(TRENDING_KEY)
+    if entry is None:
+        if cache.add(REBUILD_LOCK_KEY, 1, REBUILD_LOCK_TIMEOUT):
+            try:
+                return rebuild_trending()
+            finally:
+                cache.delete(REBUILD_LOCK_KEY)
+        deadline = time.monotonic() + REBUILD_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(REBUILD_POLL)
+            entry = cache.get(TRENDING_KEY)
+            if entry is not None:
+                return entry
+        # Still building: nothing trends for now rather than rebuilding it again
+        return {'ids': [], 'scores': [], 'built_at': 0}
+    if time.time() - entry['built_at'] > REFRESH_INTERVAL and cache.add(REBUILD_LOCK_KEY, 1, REBUILD_LOCK_TIMEOUT):
+        try:
+            entry = rebuild_trending()
+        finally:
+            cache.delete(REBUILD_LOCK_KEY)
+    return entry
+
+
+def sample_trending(count, pool=50, rng=None):
+    """
+    Up to `count` distinct ids drawn from the top `pool` of the trending
+    list, weighted by score
+    """
+    entry = trending_list()
+    ids = np.asarray(entry['ids'][:pool], dtype=np.int64)
+    if not len(ids):
+        return []
+    weights = np.asarray(entry['scores'][:pool], dtype=np.float64)
+    rng = rng or np.random.default_rng()
+    picked = rng.choice(len(ids), size=min(count, len(ids)), replace=False, p=weights / weights.sum())
+    return ids[picked].tolist()
@@ -15,6 +15,8 @@ urlpatterns = [
    
     path('TinderMovies/', tinder_movies, name='tinder_movies'),
     path('searchMovie/<str:query>/', search_movie, name='search_movie'),
+    path('autocomplete/', views.autocomplete_movies, name='autocomplete_movies'),
+    path('browse/', views.browse_movies, name='browse_movies'),
     path('fetchMovieInfo/<str:query>/', views.fetch_movie_info, name='fetch_movie_info'),
     path('getMoviePoster/<str:query>/', views.get_movie_poster, name='get_movie_poster'),
     path('watchlist/', view_watchlist, name='view_watchlist'),
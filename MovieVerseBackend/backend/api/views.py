@@ -6,10 +6,11 @@ from rest_framework.response import Response
 from django.contrib.auth.hashers import make_password,check_password
 from rest_framework.decorators import api_view
 from .models import Movie, Watchlist, Genre
-from .serializers import MovieSerializer, WatchlistSerializer
+from .serializers import WatchlistSerializer
 from django.shortcuts import get_object_or_404
 import requests
 from django.conf import settings
+from django.db import transaction
 from rest_framework import status
 import random
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
@@ -18,6 +19,45 @@ from rest_framework.authentication import SessionAuthentication
 import requests
 from .models import Ratings,RecommendedMovies
 from itertools import chain
+from ai.engine import LIKE_THRESHOLD
+from ai.registry import get_bundle
+from ai.profiles import get_profile_vector
+from .recommendation_cache import cached_recommendations, bump_ratings_version
+from .search import search_movies
+from .cards import movie_cards_by_id
+from .details import find_movie_id, movie_detail, poster_image_url
+from .tmdb import TMDBUnavailable, tmdb
+from .tmdb_import import import_movie_by_title, import_tmdb_movie
+from .tmdb import poster_url as tmdb_poster_url
+from .sampling import deck_movie_ids, random_movie_ids
+from .trending import sample_trending
+from .http_cache import cache_response
+from .facets import RATING_BUCKETS, facet_index
+from .autocomplete import DEFAULT_LIMIT as DEFAULT_AUTOCOMPLETE_LIMIT, MAX_LIMIT as MAX_AUTOCOMPLETE_LIMIT, autocomplete
+from .pagination import (
+    InvalidCursor, encode_cursor, page_size, paginate, paginated_response, request_cursor
+)
+
+
+# How long the hot GET endpoints are served from api.http_cache (seconds)
+SEARCH_CACHE_TIMEOUT = 5 * 60
+TRENDING_CACHE_TIMEOUT = 60
+POSTER_CACHE_TIMEOUT = 60 * 60
+MOVIE_INFO_CACHE_TIMEOUT = 10 * 60
+
+
+def movie_info_tags(request, query):
+    # An id lookup only changes with that movie and its ratings; which movie a title
+    # finds changes with the catalog, and the movie found is tagged by movie_tags
+    return [f'movie:{query}'] if query.isdigit() else ['catalog']
+
+
+def movie_tags(data):
+    """
+    A movie:<id> tag for each movie in a response (a card list or one detail)
+    """
+    movies = data if isinstance(data, list) else [data]
+    return [f'movie:{movie["id"]}' for movie in movies if isinstance(movie, dict) and 'id' in movie]
 
 
 @api_view(['GET'])
@@ -87,42 +127,90 @@ def login_user(request):
 #     return Response(serializer.data)
 
 
-from rest_framework import serializers
-from .models import Movie, Watchlist, Genre
-
-class GenreSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Genre
-        fields = ['name']
-
-# Update the MovieSerializer to include genre names instead of IDs
-class MovieSerializer(serializers.ModelSerializer):
-    # Add a serialized field for genres that returns the names
-    genres = serializers.SerializerMethodField()
-    
-    class Meta:
-        model = Movie
-        fields = ['id', 'title', 'description', 'release_date', 'director','star1','star2', 'poster_url', 'genres', 'imdb_rating', 'our_rating']
-    
-    def get_genres(self, obj):
-        """
-        Return a list of genre names instead of genre objects or IDs
-        """
-        return [genre.name for genre in obj.genres.all()]
+# Movie cards (genres as names) are built by api.cards in one query per response
 
 @api_view(['GET'])
 def tinder_movies(request):
-    movies = list(Movie.objects.all())
-    random.shuffle(movies)
-    serializer = MovieSerializer(movies[:10], many=True)  # Return 10 random movies
-    return Response(serializer.data)
+    """
+    10 random movies. Signed-in users get the next cards of their own deck,
+    so no card repeats until they have swiped through the whole catalog.
+    """
+    if request.user.is_authenticated:
+        movie_ids = deck_movie_ids(request.user.id, 10)
+    else:
+        movie_ids = random_movie_ids(10)
+    return Response(movie_cards_by_id(movie_ids))
 
 
 @api_view(['GET'])
+@cache_response(SEARCH_CACHE_TIMEOUT, tags=['catalog'], response_tags=movie_tags)
 def search_movie(request, query):
-    movies = Movie.objects.filter(title__icontains=query)
-    serializer = MovieSerializer(movies, many=True)
-    return Response(serializer.data)
+    """
+    Search titles, directors, stars and descriptions, best matches first.
+    Paginated with ?page_size= and ?cursor= (see api.pagination).
+    """
+    try:
+        # The cursor is the (score, id) of the previous page's last result
+        after = request_cursor(request, length=2, numeric=True)
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+    size = page_size(request)
+
+    ranked = search_movies(query, size + 1, after=after)
+    next_cursor = None
+    if len(ranked) > size:
+        last_id, last_score = ranked[size - 1]
+        next_cursor = encode_cursor([last_score, last_id])
+    ranked_ids = [movie_id for movie_id, _ in ranked[:size]]
+
+    return paginated_response(request, movie_cards_by_id(ranked_ids), next_cursor)
+
+
+def _int_list(request, name):
+    return [int(value) for value in request.query_params.getlist(name) if value.strip()]
+
+
+@api_view(['GET'])
+def browse_movies(request):
+    """
+    Filter the catalog by facets, best IMDb rating first:
+    ?genre=<id> (repeatable, all must match), ?decade=1990 (repeatable, any),
+    ?min_rating= / ?max_rating= (whole IMDb points). Returns the page of
+    movies, the total and per-facet counts for the current selection.
+    """
+    try:
+        genre_ids = _int_list(request, 'genre')
+        decades = _int_list(request, 'decade')
+        min_rating = int(request.query_params.get('min_rating', 0))
+        max_rating = int(request.query_params.get('max_rating', 10))
+        after = request_cursor(request, length=2, numeric=True)
+    except ValueError:
+        return Response({"error": "genre, decade, min_rating, max_rating and cursor must be valid"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    index = facet_index.get()
+    buckets = [bucket for bucket in RATING_BUCKETS if min_rating <= bucket <= max_rating]
+    # An empty rating range matches nothing rather than everything
+    selected = index.select(genre_ids, decades, buckets or [None])
+
+    movie_ids, next_key = index.page(selected, page_size(request), after)
+    return paginated_response(request, {
+        "count": index.count(selected),
+        "results": movie_cards_by_id(movie_ids),
+        "facets": index.facet_counts(selected),
+    }, encode_cursor(next_key) if next_key else None)
+
+
+@api_view(['GET'])
+def autocomplete_movies(request):
+    """
+    Typeahead suggestions for ?q=, best rated first; at most ?limit= (default 8, max 20)
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', DEFAULT_AUTOCOMPLETE_LIMIT)), MAX_AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(autocomplete(request.query_params.get('q', ''), limit))
 
 
 @api_view(['GET'])
@@ -143,8 +231,8 @@ def get_user_recommendations(request, user_id=None):
     if not user_ratings.exists():
         return Response({"error": "No ratings found for this user"}, status=status.HTTP_404_NOT_FOUND)
 
-    liked_movies = [rating.movie.title for rating in user_ratings if rating.rating >= 5]
-    disliked_movies = [rating.movie.title for rating in user_ratings if rating.rating < 5]
+    liked_movies = [rating.movie.title for rating in user_ratings if rating.rating >= LIKE_THRESHOLD]
+    disliked_movies = [rating.movie.title for rating in user_ratings if rating.rating < LIKE_THRESHOLD]
     
     # If no clear preferences, return a message
     if not liked_movies:
@@ -183,57 +271,43 @@ def get_user_recommendations(request, user_id=None):
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
-TMDB_IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
-TMDB_BEARER_TOKEN = os.getenv("TMDB_BEARER_TOKEN")
-
-
-
 @api_view(['GET'])
+@cache_response(POSTER_CACHE_TIMEOUT, tags=['catalog'], response_tags=movie_tags)
 def get_movie_poster(request, query):
+    """
+    Poster URL for a title, from the catalog or else TMDB. Responses about a
+    catalog movie carry its id, which tags them with movie:<id> so changing
+    the movie's poster invalidates them
+    """
     if not query:
         return Response({"error": "Movie name (query) is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-    headers = {
-        "Authorization": f"Bearer {TMDB_BEARER_TOKEN}"
-    }
-
     try:
         local_movie = None
         try:
             local_movie = Movie.objects.get(title__iexact=query)
             if local_movie.poster_url:
-                return Response({"poster_url": local_movie.poster_url}, status=status.HTTP_200_OK)
+                return Response({"id": local_movie.id, "poster_url": local_movie.poster_url},
+                                status=status.HTTP_200_OK)
         except Movie.DoesNotExist:
             pass  # Movie not found locally
 
         # If movie not found locally OR poster_url is missing, search TMDB
-        tmdb_search_url = f"{TMDB_BASE_URL}/search/movie?query={query}"
-        print(tmdb_search_url)
-        tmdb_response = requests.get(tmdb_search_url, headers=headers)
-        tmdb_response.raise_for_status()
-        tmdb_search_data = tmdb_response.json()
-
-        if tmdb_search_data.get('results'):
-            first_result = tmdb_search_data['results'][0]
+        first_result = tmdb.search_movie(query)
+
+        if first_result:
             tmdb_id = first_result.get('id')
 
             if tmdb_id:
-                # Fetch movie details from TMDB to get the poster path
-                tmdb_movie_url = f"{TMDB_BASE_URL}/movie/{tmdb_id}"
-                print(tmdb_movie_url)
-                tmdb_movie_response = requests.get(tmdb_movie_url, headers=headers)
-                tmdb_movie_response.raise_for_status()
-                tmdb_movie_data = tmdb_movie_response.json()
-
-                poster_path = tmdb_movie_data.get('poster_path')
+                # Search results already carry the poster path, no details request needed
+                poster_path = first_result.get('poster_path')
                 if poster_path:
-                    poster_url = f"{TMDB_IMAGE_BASE_URL}{poster_path}"
+                    poster_url = tmdb_poster_url(poster_path)
                     # Update local database if movie exists
                     if local_movie:
                         local_movie.poster_url = poster_url
                         local_movie.save()
+                        return Response({"id": local_movie.id, "poster_url": poster_url}, status=status.HTTP_200_OK)
                     return Response({"poster_url": poster_url}, status=status.HTTP_200_OK)
                 else:
                     return Response({"error": "Poster not found for this movie on TMDB"}, status=status.HTTP_404_NOT_FOUND)
@@ -242,7 +316,7 @@ def get_movie_poster(request, query):
         else:
             return Response({"error": f"Movie '{query}' not found on TMDB"}, status=status.HTTP_404_NOT_FOUND)
 
-    except requests.exceptions.RequestException as e:
+    except TMDBUnavailable as e:
         return Response({"error": f"Error communicating with TMDB: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
         return Response({"error he": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -251,6 +325,9 @@ def get_movie_poster(request, query):
 from django.contrib.auth import get_user_model
 from api.models import UserProfile  # Adjust based on your actual model
 
+WATCHLIST_ORDERING = ['-added_on', '-id']
+
+
 # Replace the current view_watchlist function with this:
 @api_view(['POST'])  # <-- Changed from GET to POST to match your frontend
 @authentication_classes([SessionAuthentication])
@@ -268,8 +345,11 @@ def view_watchlist(request):
         except CustomUser.DoesNotExist:
             return Response({"error": f"User '{username}' not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # The rest stays the same
-        watchlist_items = Watchlist.objects.filter(user=user).select_related('movie')
+        # Newest first, one page at a time
+        watchlist_items, next_cursor = paginate(
+            Watchlist.objects.filter(user=user).select_related('movie'),
+            WATCHLIST_ORDERING, page_size(request), request_cursor(request, length=len(WATCHLIST_ORDERING)),
+        )
         
         result = []
         for item in watchlist_items:
@@ -280,10 +360,12 @@ def view_watchlist(request):
                 'added_on': item.added_on.isoformat() if item.added_on else None,
                 'description': item.movie.description,
                 'poster_url': item.movie.poster_url,
-                'genres': [genre.name for genre in item.movie.genres.all()]
+                'genres': item.movie.genre_names
             })
         
-        return Response(result)
+        return paginated_response(request, result, next_cursor)
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 from users.models import CustomUser
@@ -367,51 +449,23 @@ def remove_movie_from_watchlist(request, pk):
 @api_view(['GET'])
 @authentication_classes([SessionAuthentication])
 @permission_classes([IsAuthenticated])
+@cache_response(TRENDING_CACHE_TIMEOUT, tags=['catalog'], per_user=True, response_tags=movie_tags)
 def trending_movies(request):
     """
     Get trending movies with some randomization to avoid showing same movies every time
     """
-    from django.db.models import Count, Q
     from random import shuffle
     
-    # Get movies that have been rated recently (last 30 days) with rating counts
-    from datetime import datetime, timedelta
-    recent_date = datetime.now() - timedelta(days=30)
-    
-    # Get movies with recent ratings, ordered by rating count and add some randomness
-    trending_candidates = Movie.objects.filter(
-        ratings__created_at__gte=recent_date
-    ).annotate(
-        rating_count=Count('ratings')
-    ).filter(rating_count__gte=1).distinct()
-    
-    # Convert to list to allow shuffling
-    trending_list = list(trending_candidates)
-    
-    # Shuffle to add randomness while keeping trending movies
-    shuffle(trending_list)
+    # Up to 7 from the precomputed trending list (see api.trending), weighted by how hot they are
+    selected_trending = sample_trending(7)
     
-    # Take up to 7 from trending
-    selected_trending = trending_list[:7]
-    
-    # If we need more movies, get some random ones
-    if len(selected_trending) < 10:
-        existing_ids = [movie.id for movie in selected_trending]
-        remaining_needed = 10 - len(selected_trending)
-        
-        # Get random movies excluding the ones we already have
-        random_movies = list(Movie.objects.exclude(id__in=existing_ids).order_by('?')[:remaining_needed])
-        
-        # Combine both lists
-        movies_list = selected_trending + random_movies
-    else:
-        movies_list = selected_trending[:10]
+    # Pad with random movies up to 10
+    movies_list = selected_trending + random_movie_ids(10 - len(selected_trending), exclude=selected_trending)
     
     # Final shuffle to mix trending and random movies
     shuffle(movies_list)
     
-    serializer = MovieSerializer(movies_list, many=True)
-    return Response(serializer.data)
+    return Response(movie_cards_by_id(movies_list))
 
 
 @api_view(['POST'])
@@ -477,17 +531,22 @@ def add_rating(request):
     try:
         movie=Movie.objects.get(id=movie_id)
         if Ratings.objects.filter(user_id=userid,movie_id=movie_id).exists():
-            rating_obj=Ratings.objects.get(user_id=userid,movie_id=movie_id)
-            oldRating=rating_obj.rating
-            rating_obj.rating=rating
-            rating_obj.save()
+            # The Ratings signals update the taste profile in the same transaction
+            with transaction.atomic():
+                rating_obj=Ratings.objects.select_for_update().get(user_id=userid,movie_id=movie_id)
+                oldRating=rating_obj.rating
+                rating_obj.rating=rating
+                rating_obj.save()
+            bump_ratings_version(userid)
             noOfRaters=Ratings.objects.filter(movie=movie).count()
             movie.our_rating=(movie.our_rating+rating-oldRating)/(noOfRaters)
             movie.save()
             return Response({"message":"Rating updated successfully"},status=200)
         else:
-            rating_obj=Ratings(user_id=userid,movie=movie,rating=rating)
-            rating_obj.save()
+            with transaction.atomic():
+                rating_obj=Ratings(user_id=userid,movie=movie,rating=rating)
+                rating_obj.save()
+            bump_ratings_version(userid)
             noOfRaters=Ratings.objects.filter(movie=movie).count()
             movie.our_rating=(movie.our_rating+rating)/(noOfRaters)
             movie.save()
@@ -532,39 +591,62 @@ def get_user_recommendations(request):
         except CustomUser.DoesNotExist:
             return Response({"error": f"User '{username}' not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # Get user's recommended movies
-        recommended = RecommendedMovies.objects.filter(user=user).select_related('movie').order_by('-recommended_on')
-        
-        # If no recommendations, add some temporary ones
-        if not recommended.exists():
-            movies = Movie.objects.all().order_by('?')[:5]
-            for movie in movies:
-                RecommendedMovies.objects.create(user=user, movie=movie)
-            
-            # Get the newly created recommendations
-            recommended = RecommendedMovies.objects.filter(user=user).select_related('movie')
-        
-        # Format the response
-        result = []
-        for rec in recommended:
-            movie = rec.movie
-            result.append({
-                'id': movie.id,
-                'title': movie.title,
-                'description': movie.description,
-                'poster_url': "https://image.tmdb.org/t/p/original" + movie.poster_url or '',
-                'recommended_on': rec.recommended_on,
-                'genres': [genre.name for genre in movie.genres.all()]
-            })
+        size = page_size(request)
+        after = request_cursor(request, length=len(STORED_RECOMMENDATIONS_ORDERING))
         
-        return Response(result)
+        # Served from the per-user cache (one entry per page) until the user's ratings
+        # or stored recommendations change
+        result, next_cursor = cached_recommendations(
+            f'stored:{size}:{encode_cursor(after) if after else ""}', user.id,
+            lambda: stored_recommendations_payload(user, size, after)
+        )
+        return paginated_response(request, result, next_cursor)
         
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+STORED_RECOMMENDATIONS_ORDERING = ['-score', '-recommended_on', '-id']
+
+
+def stored_recommendations_payload(user, size, after=None):
+    """
+    Build one page of the get_user_recommendations payload for a user.
+    Returns ((results, next_cursor), cacheable).
+    """
+    # Get user's precomputed recommendations (see the precompute_recommendations command)
+    stored = RecommendedMovies.objects.filter(user=user).select_related('movie')
+    recommended, next_cursor = paginate(stored, STORED_RECOMMENDATIONS_ORDERING, size, after)
+    
+    # If nothing has been precomputed yet, show some random movies without storing them
+    if not recommended and after is None:
+        recommended = [
+            RecommendedMovies(user=user, movie=movie, recommended_on=None)
+            for movie in Movie.objects.filter(id__in=random_movie_ids(min(size, 5)))
+        ]
+    
+    # Format the response
+    result = []
+    for rec in recommended:
+        movie = rec.movie
+        result.append({
+            'id': movie.id,
+            'title': movie.title,
+            'description': movie.description,
+            'poster_url': poster_image_url(movie.poster_url),
+            'recommended_on': rec.recommended_on,
+            'genres': movie.genre_names
+        })
+    
+    return (result, next_cursor), True
+
+
 @api_view(['GET'])
 @authentication_classes([SessionAuthentication])
 @permission_classes([IsAuthenticated])
+@cache_response(MOVIE_INFO_CACHE_TIMEOUT, tags=movie_info_tags, private=True, response_tags=movie_tags)
 def fetch_movie_info(request, query):
     """
     Fetch detailed information about a specific movie by ID or title
@@ -579,211 +661,37 @@ def fetch_movie_info(request, query):
             
         if is_id_query:
             # Try to get the movie from our database by ID
-            try:
-                movie = Movie.objects.get(id=movie_id)
-                
-                # Prepare response data
-                response_data = {
-                    'id': movie.id,
-                    'title': movie.title,
-                    'movie_info': movie.description,
-                    'director': movie.director,
-                    'star1': movie.star1,
-                    'star2': movie.star2,
-                    'poster_url': "https://image.tmdb.org/t/p/original/" + movie.poster_url,
-                    'release_date': movie.release_date,
-                    'imdb_rating': movie.imdb_rating,
-                    'our_rating': movie.our_rating,
-                    'genres': [genre.name for genre in movie.genres.all()]
-                }
-                
+            # Cached detail blob: one query (movie and genres) on a miss
+            response_data = movie_detail(movie_id)
+            if response_data is not None:
                 return Response(response_data)
+            else:
+                # If not in our DB, import it from TMDB (one request, shared with concurrent lookups)
+                response_data = import_tmdb_movie(movie_id)
                 
-            except Movie.DoesNotExist:
-                # If not in our DB, try TMDB API
-                TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-                TMDB_BASE_URL = "https://api.themoviedb.org/3"
-                TMDB_BEARER_TOKEN = os.getenv("TMDB_BEARER_TOKEN")
-                
-                headers = {
-                    "Authorization": f"Bearer {TMDB_BEARER_TOKEN}",
-                    "accept": "application/json"
-                }
-                
-                # Get movie details from TMDB
-                movie_url = f"{TMDB_BASE_URL}/movie/{movie_id}?api_key={TMDB_API_KEY}"
-                movie_response = requests.get(movie_url, headers=headers)
-                
-                if movie_response.status_code != 200:
+                if response_data is None:
                     return Response({"error": "Movie not found"}, status=status.HTTP_404_NOT_FOUND)
-                    
-                movie_data = movie_response.json()
-                
-                # Get credits to find director and actors
-                credits_url = f"{TMDB_BASE_URL}/movie/{movie_id}/credits?api_key={TMDB_API_KEY}"
-                credits_response = requests.get(credits_url, headers=headers)
-                credits_data = credits_response.json() if credits_response.status_code == 200 else {"crew": [], "cast": []}
-                
-                # Find director
-                director = next((person["name"] for person in credits_data.get("crew", []) 
-                               if person.get("job", "").lower() == "director"), "Unknown")
-                
-                # Get top actors
-                cast = credits_data.get("cast", [])
-                star1 = cast[0]["name"] if len(cast) > 0 else "Unknown"
-                star2 = cast[1]["name"] if len(cast) > 1 else "Unknown"
-                
-                # Get poster URL
-                poster_path = movie_data.get("poster_path")
-                poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else ""
-                
-                # Get genres
-                genres = [genre["name"] for genre in movie_data.get("genres", [])]
-                
-                # Create a new Movie object in our database
-                new_movie = Movie(
-                    id=movie_id,
-                    title=movie_data.get("title", "Unknown"),
-                    description=movie_data.get("overview", ""),
-                    director=director,
-                    star1=star1,
-                    star2=star2,
-                    poster_url=poster_url,
-                    release_date=movie_data.get("release_date"),
-                    imdb_rating=movie_data.get("vote_average", 0.0)
-                )
-                new_movie.save()
-                
-                # Add genres
-                for genre_name in genres:
-                    genre, created = Genre.objects.get_or_create(name=genre_name)
-                    new_movie.genres.add(genre)
-                
-                # Prepare response data
-                response_data = {
-                    'id': movie_id,
-                    'title': movie_data.get("title", "Unknown"),
-                    'movie_info': movie_data.get("overview", ""),
-                    'director': director,
-                    'star1': star1,
-                    'star2': star2,
-                    'poster_url': poster_url,
-                    'release_date': movie_data.get("release_date"),
-                    'imdb_rating': movie_data.get("vote_average", 0.0),
-                    'our_rating': 0,
-                    'genres': genres
-                }
                 
                 return Response(response_data)
                 
         else:
             # Search by title
             # First check our database
-            movie = Movie.objects.filter(title__icontains=query).first()
-            if movie:
-                response_data = {
-                    'id': movie.id,
-                    'title': movie.title,
-                    'movie_info': movie.description,
-                    'director': movie.director,
-                    'star1': movie.star1,
-                    'star2': movie.star2,
-                    'poster_url': movie.poster_url,
-                    'release_date': movie.release_date,
-                    'imdb_rating': movie.imdb_rating,
-                    'our_rating': movie.our_rating,
-                    'genres': [genre.name for genre in movie.genres.all()]
-                }
-                
+            movie_id = find_movie_id(query)
+            response_data = movie_detail(movie_id) if movie_id is not None else None
+            if response_data is not None:
                 return Response(response_data)
                 
-            # If not found locally, search TMDB
-            TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-            TMDB_BASE_URL = "https://api.themoviedb.org/3"
-            TMDB_BEARER_TOKEN = os.getenv("TMDB_BEARER_TOKEN")
-            
-            headers = {
-                "Authorization": f"Bearer {TMDB_BEARER_TOKEN}",
-                "accept": "application/json"
-            }
+            # If not found locally, search TMDB and import its best match
+            response_data = import_movie_by_title(query)
             
-            # Search for movies by title
-            search_url = f"{TMDB_BASE_URL}/search/movie?api_key={TMDB_API_KEY}&query={query}"
-            search_response = requests.get(search_url, headers=headers)
-            
-            if search_response.status_code != 200 or not search_response.json().get('results'):
+            if response_data is None:
                 return Response({"error": f"Movie '{query}' not found"}, status=status.HTTP_404_NOT_FOUND)
-                
-            # Get first matching movie
-            first_result = search_response.json()['results'][0]
-            movie_id = first_result['id']
-            
-            # Now get detailed info using the movie ID
-            movie_url = f"{TMDB_BASE_URL}/movie/{movie_id}?api_key={TMDB_API_KEY}"
-            movie_response = requests.get(movie_url, headers=headers)
-            
-            if movie_response.status_code != 200:
-                return Response({"error": "Failed to get movie details"}, status=status.HTTP_404_NOT_FOUND)
-                
-            movie_data = movie_response.json()
-            
-            # Get credits to find director and actors
-            credits_url = f"{TMDB_BASE_URL}/movie/{movie_id}/credits?api_key={TMDB_API_KEY}"
-            credits_response = requests.get(credits_url, headers=headers)
-            credits_data = credits_response.json() if credits_response.status_code == 200 else {"crew": [], "cast": []}
-            
-            # Find director
-            director = next((person["name"] for person in credits_data.get("crew", []) 
-                           if person.get("job", "").lower() == "director"), "Unknown")
-            
-            # Get top actors
-            cast = credits_data.get("cast", [])
-            star1 = cast[0]["name"] if len(cast) > 0 else "Unknown"
-            star2 = cast[1]["name"] if len(cast) > 1 else "Unknown"
-            
-            # Get poster URL
-            poster_path = movie_data.get("poster_path")
-            poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else ""
-            
-            # Get genres
-            genres = [genre["name"] for genre in movie_data.get("genres", [])]
-            
-            # Create a new Movie in our DB
-            new_movie = Movie(
-                id=movie_id,
-                title=movie_data.get("title", "Unknown"),
-                description=movie_data.get("overview", ""),
-                director=director,
-                star1=star1,
-                star2=star2,
-                poster_url=poster_url,
-                release_date=movie_data.get("release_date"),
-                imdb_rating=movie_data.get("vote_average", 0.0)
-            )
-            new_movie.save()
-            
-            # Add genres
-            for genre_name in genres:
-                genre, created = Genre.objects.get_or_create(name=genre_name)
-                new_movie.genres.add(genre)
-            
-            # Prepare response data
-            response_data = {
-                'id': movie_id,
-                'title': movie_data.get("title", "Unknown"),
-                'movie_info': movie_data.get("overview", ""),
-                'director': director,
-                'star1': star1,
-                'star2': star2,
-                'poster_url': poster_url,
-                'release_date': movie_data.get("release_date"),
-                'imdb_rating': movie_data.get("vote_average", 0.0),
-                'our_rating': 0,
-                'genres': genres
-            }
             
             return Response(response_data)
                 
+    except TMDBUnavailable as e:
+        return Response({"error": f"Error communicating with TMDB: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -820,16 +728,21 @@ def rate_movie(request, movie_id):
         except Movie.DoesNotExist:
             return Response({"error": f"Movie with ID {movie_id} not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # Check if user already rated this movie
-        rating, created = Ratings.objects.get_or_create(
-            user=user,
-            movie=movie,
-            defaults={'rating': rating_value}
-        )
+        # The Ratings signals update the taste profile in the same transaction
+        with transaction.atomic():
+            # Check if user already rated this movie
+            rating, created = Ratings.objects.get_or_create(
+                user=user,
+                movie=movie,
+                defaults={'rating': rating_value}
+            )
+            
+            if not created:
+                rating.rating = rating_value
+                rating.save()
         
-        if not created:
-            rating.rating = rating_value
-            rating.save()
+        # Cached recommendations are rebuilt from the committed rating
+        bump_ratings_version(user.id)
         
         # Update movie's overall rating
         all_ratings = Ratings.objects.filter(movie=movie)
@@ -923,94 +836,63 @@ def get_ratings_based_recommendations(request):
         except CustomUser.DoesNotExist:
             return Response({"error": f"User '{username}' not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # Get all user ratings
-        user_ratings = Ratings.objects.filter(user=user)
+        size = page_size(request, default=10)
+        # The cursor is the (score, id) of the previous page's last recommendation
+        after = request_cursor(request, length=2, numeric=True)
         
-        if not user_ratings.exists():
-            # Fall back to trending movies if no ratings exist
-            movies = Movie.objects.all().order_by('?')[:10]
-            serializer = MovieSerializer(movies, many=True)
-            return Response({
-                "info": "No ratings found, showing trending movies instead",
-                "recommendations": serializer.data
-            })
-        
-        # Split into liked (≥ 5) and disliked (< 5) movies
-        liked_movie_ids = [rating.movie.id for rating in user_ratings if rating.rating >= 5]
-        disliked_movie_ids = [rating.movie.id for rating in user_ratings if rating.rating < 5]
-        
-        # Get the movie titles for the AI recommendation engine
-        liked_movies = []
-        disliked_movies = []
-        
-        if liked_movie_ids:
-            liked_movies = list(Movie.objects.filter(id__in=liked_movie_ids).values_list('title', flat=True))
-        
-        if disliked_movie_ids:
-            disliked_movies = list(Movie.objects.filter(id__in=disliked_movie_ids).values_list('title', flat=True))
-        
-        # If no liked movies, fall back to trending
-        if not liked_movies:
-            movies = Movie.objects.all().order_by('?')[:10]
-            serializer = MovieSerializer(movies, many=True)
-            return Response({
-                "info": "No liked movies found, showing trending movies instead",
-                "recommendations": serializer.data
-            })
+        # Served from the per-user cache (one entry per page) until the user's ratings or the model change
+        payload, next_cursor = cached_recommendations(
+            f'ratings:{size}:{encode_cursor(after) if after else ""}', user.id,
+            lambda: ratings_based_payload(user, size, after)
+        )
+        return paginated_response(request, payload, next_cursor)
         
-        # Use AI recommendation model
-        try:
-            # Import feature matrix and movie data
-            MODEL_DIR = os.path.join(settings.BASE_DIR, 'ai', 'model')
-            X = joblib.load(os.path.join(MODEL_DIR, 'features.pkl'))
-            df = pd.read_csv(os.path.join(MODEL_DIR, 'cleaned_movies.csv'))
-            
-            # Filter features for liked and disliked movies
-            liked_df = X[df['title'].isin(liked_movies)]
-            disliked_df = X[df['title'].isin(disliked_movies)]
-            
-            if liked_df.empty:
-                movies = Movie.objects.all().order_by('?')[:10]
-                serializer = MovieSerializer(movies, many=True)
-                return Response({
-                    "info": "No matching liked movies in model, showing trending instead",
-                    "recommendations": serializer.data
-                })
-            
-            # Create user profile
-            profile = liked_df.mean()
-            if not disliked_df.empty:
-                profile -= disliked_df.mean()
-            
-            # Calculate similarity
-            sim = cosine_similarity(X, profile.values.reshape(1, -1)).flatten()
-            df['sim'] = sim
-            
-            # Filter out movies user has already rated
-            all_rated_ids = liked_movie_ids + disliked_movie_ids
-            df_filtered = df[~df['title'].isin(liked_movies + disliked_movies)]
-            
-            # Sort by similarity and get top recommendations
-            recommendations_df = df_filtered.sort_values(by='sim', ascending=False).head(10)
-            
-            # Get our Movie objects for these recommendations
-            recommended_titles = recommendations_df['title'].tolist()
-            recommended_movies = Movie.objects.filter(title__in=recommended_titles)
-            
-            # Return as serialized data
-            serializer = MovieSerializer(recommended_movies, many=True)
-            return Response({
-                "recommendations": serializer.data
-            })
-            
-        except Exception as e:
-            # If ML fails, fall back to trending
-            movies = Movie.objects.all().order_by('?')[:10]
-            serializer = MovieSerializer(movies, many=True)
-            return Response({
-                "error": f"Error generating recommendations: {str(e)}",
-                "recommendations": serializer.data
-            })
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def ratings_based_payload(user, size=10, after=None):
+    """
+    Build one page of the get_ratings_based_recommendations payload for a user.
+    Returns ((payload, next_cursor), cacheable); error fallbacks are not cached.
+    The random fallbacks are a single page.
+    """
+    def fallback(**payload):
+        payload["recommendations"] = movie_cards_by_id(random_movie_ids(size)) if after is None else []
+        return payload, None
+    
+    # Get all user ratings
+    user_ratings = Ratings.objects.filter(user=user)
+    
+    if not user_ratings.exists():
+        # Fall back to trending movies if no ratings exist
+        return fallback(info="No ratings found, showing trending movies instead"), True
+    
+    # Use AI recommendation model
+    try:
+        # The user's taste vector is kept up to date on every rating write
+        bundle = get_bundle()
+        profile = get_profile_vector(user.id, bundle)
+        
+        # If no liked movies in the model, fall back to trending
+        if profile is None:
+            return fallback(info="No liked movies found, showing trending movies instead"), True
+        
+        # Only the rated ids are needed, to skip movies the user has already seen
+        rated_ids = list(user_ratings.values_list('movie_id', flat=True))
+        recommended_ids, scores = bundle.recommend_ids_for_profile(profile, rated_ids, k=size + 1, after=after)
+        next_cursor = None
+        if len(recommended_ids) > size:
+            recommended_ids, scores = recommended_ids[:size], scores[:size]
+            next_cursor = encode_cursor([scores[-1], recommended_ids[-1]])
+        
+        # Hydrate the recommended ids in one batch, keeping the ranking order
+        return ({
+            "recommendations": movie_cards_by_id(recommended_ids)
+        }, next_cursor), True
         
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        # If ML fails, fall back to trending
+        return fallback(error=f"Error generating recommendations: {str(e)}"), False
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # 3rd Party
     'rest_framework',
@@ -79,6 +80,8 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# Pagination cursors for the list endpoints (see api/pagination.py)
+CORS_EXPOSE_HEADERS = ['Link', 'X-Next-Cursor']
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'  # or 'None' if you're using HTTPS cross-origin
 SESSION_COOKIE_SECURE = False  # Set True only in HTTPS
@@ -117,6 +120,31 @@ DATABASES = {
     }
 }
 
+# Cache shared by every worker process. The response, detail and
+# recommendation caches, the version counters that invalidate them and the
+# single-flight locks (api.coalesce) all need one view across workers.
+# Deployments must set REDIS_URL: every request reads this cache, often more
+# than once. Without it the cache is a table in the database (created by
+# migration api.0011 or by `manage.py createcachetable`), which keeps
+# development and single-host setups working but turns each cache read into
+# a SQL query; `manage.py check --deploy` warns about it.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'api.cache_backends.DatabaseCache',
+            'LOCATION': 'movieverse_cache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
 # DRF Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -44,7 +44,7 @@ const WatchlistMovieCard: React.FC<WatchlistMovieCardProps> = ({
       <div css={containerStyle} onClick={handleMovieClick}> {/* Clickable div instead of Link */}
         <div css={posterWrapperStyle}>
           {posterUrl ? (
-            <img src={`https://image.tmdb.org/t/p/w500/${posterUrl}`} alt={title} css={posterImageStyle} />
+            <img src={posterUrl.startsWith('http') ? posterUrl : `https://image.tmdb.org/t/p/w500/${posterUrl}`} alt={title} css={posterImageStyle} />
           ) : (
             <div css={posterPlaceholderStyle}>
               <div css={tempPosterStyle}></div>